@@ -0,0 +1,69 @@
+"""
+Shots used by adaptive runs (utils/adaptive_shots.py) vs a fixed shot count,
+on the demo circuits users send most, and how far each histogram is from the
+exact distribution (total variation distance, averaged over trials).
+
+Provider time is roughly per-job overhead plus per-shot time, so the shots and
+jobs columns are what an adaptive run saves or costs. Run from backend/:
+    python -m benchmarks.bench_adaptive_shots --shots 4000 --tolerance 0.05 0.02
+"""
+import argparse
+import statistics
+
+import numpy as np
+
+from utils.adaptive_shots import run_adaptive
+from utils.local_simulator import evolve, get_local_results
+
+
+def measure_all(n):
+    return [{"name": "measure", "qubits": list(range(n)), "clbits": list(range(n))}]
+
+
+CIRCUITS = {
+    "bell": ([{"name": "h", "qubits": [0]}, {"name": "cx", "qubits": [0, 1]}] + measure_all(2), 2),
+    "ghz5": ([{"name": "h", "qubits": [0]}] + [{"name": "cx", "qubits": [q, q + 1]} for q in range(4)] + measure_all(5), 5),
+    "x": ([{"name": "x", "qubits": [0]}] + measure_all(1), 1),
+    "uniform3": ([{"name": "h", "qubits": [q]} for q in range(3)] + measure_all(3), 3),
+    "ry(1.0)": ([{"name": "ry", "qubits": [0], "params": [1.0]}] + measure_all(1), 1),
+}
+
+
+def exact_distribution(gates, n):
+    sv, _ = evolve(gates, n)
+    probabilities = sv.probabilities()[0]
+    return {format(i, f"0{n}b"): p for i, p in enumerate(probabilities) if p > 1e-12}
+
+
+def tvd(counts, shots, exact):
+    keys = set(counts) | set(exact)
+    return 0.5 * sum(abs(counts.get(k, 0) / shots - exact.get(k, 0.0)) for k in keys)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=4000)
+    parser.add_argument("--tolerance", type=float, nargs="+", default=[0.05, 0.02])
+    parser.add_argument("--trials", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'circuit':10} {'mode':>12} {'shots':>7} {'jobs':>5} {'tvd':>7}")
+    for name, (gates, n) in CIRCUITS.items():
+        exact = exact_distribution(gates, n)
+        fixed = [get_local_results(gates, n, n, args.shots, seed=t) for t in range(args.trials)]
+        print(f"{name:10} {'fixed':>12} {args.shots:7d} {1:5d} {statistics.mean(tvd(r['counts'], args.shots, exact) for r in fixed):7.4f}")
+        for tolerance in args.tolerance:
+            rng = np.random.default_rng(0)
+            runs = [
+                run_adaptive(lambda shots: get_local_results(gates, n, n, shots, seed=int(rng.integers(1 << 31))), args.shots, tolerance)
+                for _ in range(args.trials)
+            ]
+            print(
+                f"{'':10} {f'tol {tolerance}':>12} {statistics.mean(r['shots'] for r in runs):7.0f} "
+                f"{statistics.mean(r['adaptive']['chunks'] for r in runs):5.1f} "
+                f"{statistics.mean(tvd(r['counts'], r['shots'], exact) for r in runs):7.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
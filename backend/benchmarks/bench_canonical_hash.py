@@ -0,0 +1,64 @@
+"""
+Throughput of utils/canonical_circuit.py against the old raw-JSON hash (the
+equivalence corpus is in tests/test_canonical_circuit.py). Run from backend/:
+    python -m benchmarks.bench_canonical_hash --sizes 10 100 1000 10000
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+
+from utils.canonical_circuit import canonicalize_and_hash
+from utils.create_circuit import GATES
+
+NAMES = sorted(GATES)
+
+
+def json_hash(circuit):
+    """The previous circuit_id: sha256 of the JSON with sorted keys."""
+    return hashlib.sha256(json.dumps(circuit, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def random_circuit(rng, num_gates, n, m):
+    """Measure pairs are listed one per instruction; params lie on a 1e-6 grid."""
+    gates = []
+    for _ in range(num_gates):
+        if rng.random() < 0.1 and m:
+            gates.append({"name": "measure", "qubits": [rng.randrange(n)], "clbits": [rng.randrange(m)]})
+            continue
+        name = rng.choice([name for name in NAMES if GATES[name].num_qubits <= n])
+        gate_def = GATES[name]
+        gate = {"name": name, "qubits": rng.sample(range(n), gate_def.num_qubits)}
+        if gate_def.num_params:
+            gate["params"] = [round(rng.uniform(-3.2, 3.2), 6) for _ in range(gate_def.num_params)]
+        gates.append(gate)
+    return {"gates": gates, "num_qubits": n, "num_clbits": m}
+
+
+def throughput(sizes, seed):
+    rng = random.Random(seed)
+    print(f"{'gates':>7} {'canonical':>14} {'raw json':>14} {'canonical gates/s':>18}")
+    for size in sizes:
+        circuit = random_circuit(rng, size, 20, 20)
+        repeat = max(3, 20000 // max(size, 1))
+        rows = []
+        for fn in (canonicalize_and_hash, json_hash):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn(circuit)
+            rows.append((time.perf_counter() - start) / repeat)
+        print(f"{size:7d} {rows[0] * 1e6:11.1f} us {rows[1] * 1e6:11.1f} us {size / rows[0]:18,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    throughput(args.sizes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+API thread responsiveness while heavy transpiles run, inline vs on the compile pool.
+
+A heartbeat thread stands in for request handling: it sleeps 1 ms in a loop and
+records how late it wakes up, which is GIL contention from the compile threads.
+Uses a local fake backend, so no IBM account is needed. Run from backend/:
+    python -m benchmarks.bench_compile_pool --jobs 8 --workers 2
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from qiskit.providers.fake_provider import GenericBackendV2
+
+from benchmarks.bench_transpile_cache import layered_gates
+from utils.compile_pool import CompilePool
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run(pool, backend, gates, n, jobs):
+    lags = []
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.is_set():
+            start = time.perf_counter()
+            time.sleep(0.001)
+            lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+    def compile_one(i):
+        qc = pool.build(gates, n, n)
+        pool.transpile([qc], backend, 3, f"{backend.name}|bench")
+
+    beat = threading.Thread(target=heartbeat)
+    beat.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as threads:
+        list(threads.map(compile_one, range(jobs)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    beat.join()
+    return elapsed, percentile(lags, 50), percentile(lags, 99), max(lags)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--qubits", type=int, default=12)
+    parser.add_argument("--layers", type=int, default=8)
+    args = parser.parse_args()
+
+    backend = GenericBackendV2(num_qubits=27, seed=1)
+    gates = layered_gates(args.qubits, args.layers)
+
+    print(f"{args.jobs} transpiles of {len(gates)} gates, optimization_level=3")
+    print(f"{'mode':<12} {'total s':>8} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for label, workers in (("inline", 0), (f"{args.workers} procs", args.workers)):
+        pool = CompilePool(workers=workers)
+        pool.start()
+        try:
+            elapsed, p50, p99, worst = run(pool, backend, gates, args.qubits, args.jobs)
+        finally:
+            pool.shutdown()
+        print(f"{label:<12} {elapsed:8.2f} {p50:11.2f} {p99:11.2f} {worst:11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Build time of large circuits: the old per-gate method-call chain vs validate_gates()
++ build_circuit(), and a circuit_cache hit for a circuit built before.
+
+Run from backend/:
+    python -m benchmarks.bench_create_circuit --gates 10000 --qubits 20
+"""
+import argparse
+import random
+import statistics
+import time
+
+from qiskit import QuantumCircuit
+
+from utils.create_circuit import GATES, CircuitCache, build_circuit, create_circuit, validate_gates
+
+
+def random_gates(num_gates, n, seed):
+    rng = random.Random(seed)
+    names = sorted(name for name, gate_def in GATES.items() if gate_def.num_qubits <= n)
+    gates = []
+    for _ in range(num_gates):
+        name = rng.choice(names)
+        gate_def = GATES[name]
+        gate = {"name": name, "qubits": rng.sample(range(n), gate_def.num_qubits)}
+        if gate_def.num_params:
+            gate["params"] = [rng.uniform(-3.14, 3.14) for _ in range(gate_def.num_params)]
+        gates.append(gate)
+    gates.append({"name": "measure", "qubits": list(range(n)), "clbits": list(range(n))})
+    return gates
+
+
+def chained_create_circuit(gates, num_qubits, num_clbits):
+    """The previous builder: one QuantumCircuit method call per gate, each inside try/except."""
+    qc = QuantumCircuit(num_qubits, num_clbits)
+    for i, gate in enumerate(gates):
+        try:
+            name = gate["name"]
+            if name == "measure":
+                qc.measure(gate["qubits"], gate["clbits"])
+            else:
+                getattr(qc, name)(*gate.get("params", []), *gate["qubits"])
+        except Exception as e:
+            raise ValueError(f"Failed to apply gate '{gate.get('name', 'unknown')}' at index {i}: {str(e)}")
+    return qc
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gates", type=int, default=10000)
+    parser.add_argument("--qubits", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    n = args.qubits
+    gates = random_gates(args.gates, n, args.seed)
+    assert chained_create_circuit(gates, n, n) == create_circuit(gates, n, n)
+
+    instructions = validate_gates(gates, n, n)
+    cache = CircuitCache()
+    cache.get_or_build("bench", lambda: create_circuit(gates, n, n))
+
+    results = {
+        "chained (before)": median_ms(lambda: chained_create_circuit(gates, n, n), args.repeat),
+        "validate_gates": median_ms(lambda: validate_gates(gates, n, n), args.repeat),
+        "build_circuit": median_ms(lambda: build_circuit(instructions, n, n), args.repeat),
+        "create_circuit": median_ms(lambda: create_circuit(gates, n, n), args.repeat),
+        "circuit_cache hit": median_ms(lambda: cache.get_or_build("bench", None), args.repeat),
+    }
+
+    print(f"{len(gates)} gates on {n} qubits, median of {args.repeat}")
+    for label, ms in results.items():
+        print(f"{label + ':':20s} {ms:9.2f} ms")
+    print(f"create_circuit speedup: {results['chained (before)'] / results['create_circuit']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Throughput and tail latency of /fetch_results under many concurrent pollers,
+with Firestore reads made on the event loop (before) vs through run_io (after).
+
+By default it serves two copies of the endpoint that differ only in how the
+blocking read is made (simulated as a --read-ms sleep) with uvicorn in a
+separate process, and polls them over HTTP. With --url it polls a running API instead:
+    python -m benchmarks.bench_fetch_concurrency --pollers 500
+    python -m benchmarks.bench_fetch_concurrency --url http://localhost:8000 --run-request-id <id>
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from utils.io_pool import IOPool
+
+
+def build_app(read_s: float, pool: IOPool) -> FastAPI:
+    app = FastAPI()
+
+    def firestore_get():
+        time.sleep(read_s)
+        return {"status": "waiting for quantum computer"}
+
+    @app.get("/blocking/fetch_results")
+    async def fetch_results_blocking(run_request_id: str):
+        return firestore_get()
+
+    @app.get("/run_io/fetch_results")
+    async def fetch_results_run_io(run_request_id: str):
+        return await pool.run(firestore_get)
+
+    return app
+
+
+def _serve(port: int, read_s: float, io_workers: int):
+    app = build_app(read_s, IOPool(workers=io_workers))
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096, timeout_keep_alive=600)
+
+
+def start_server(read_s: float, io_workers: int) -> tuple:
+    """Start uvicorn in a separate process on a free local port; returns (process, base_url)."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.get_context("spawn").Process(target=_serve, args=(port, read_s, io_workers), daemon=True)
+    process.start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def poll(client: httpx.AsyncClient, path: str, run_request_id: str, pollers: int, requests_per_poller: int):
+    latencies = []
+
+    async def poller():
+        for _ in range(requests_per_poller):
+            start = time.perf_counter()
+            response = await client.get(path, params={"run_request_id": run_request_id})
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    # Open every connection before timing, so connection setup isn't counted as read latency
+    await asyncio.gather(*(client.get(path, params={"run_request_id": run_request_id}) for _ in range(pollers)))
+    start = time.perf_counter()
+    await asyncio.gather(*(poller() for _ in range(pollers)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def report(label, rps, p50, p99):
+    print(f"{label:<10} {rps:10.1f} {p50:10.1f} {p99:10.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pollers", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=4, help="Requests per poller")
+    parser.add_argument("--read-ms", type=float, default=20.0, help="Simulated Firestore read latency")
+    parser.add_argument("--io-workers", type=int, default=64)
+    parser.add_argument("--url", help="Base URL of a running API")
+    parser.add_argument("--run-request-id", default="bench")
+    args = parser.parse_args()
+
+    print(f"{args.pollers} concurrent pollers x {args.requests} requests")
+    print(f"{'mode':<10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    limits = httpx.Limits(max_connections=args.pollers)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+            report("api", *await poll(client, "/fetch_results", args.run_request_id, args.pollers, args.requests))
+        return
+
+    process, base_url = start_server(args.read_ms / 1000, args.io_workers)
+    try:
+        for mode in ("blocking", "run_io"):
+            # Fresh connections per mode, so idle keep-alives from one run don't leak into the next
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+                report(mode, *await poll(client, f"/{mode}/fetch_results", args.run_request_id, args.pollers, args.requests))
+    finally:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
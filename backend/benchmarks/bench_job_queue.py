@@ -0,0 +1,76 @@
+"""
+Throughput of the durable job queue (utils/job_queue.py).
+
+Run from backend/:
+    python -m benchmarks.bench_job_queue --jobs 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from utils.job_queue import JobQueue
+
+PAYLOAD = {
+    "run_request_id": "0J77V36f36AJqAT8MFIf",
+    "user_id": "user_01",
+    "circuit_id": "6d8fc29c2a6e5d38fa982cb418039810fcce60f77c887f0aeef1fc1856236573",
+    "circuit": {
+        "gates": [
+            {"name": "h", "qubits": [0]},
+            {"name": "cx", "qubits": [0, 1]},
+            {"name": "measure", "qubits": [0, 1], "clbits": [0, 1]},
+        ],
+        "num_qubits": 2,
+        "num_clbits": 2,
+    },
+    "quantum_computer_type": "ionq_simulator",
+    "shots": 1000,
+}
+
+
+def report(label, n, seconds):
+    print(f"{label:<28} {n:>8} jobs  {seconds:8.3f}s  {n / seconds:>12,.0f} jobs/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=20000)
+    args = parser.parse_args()
+    n = args.jobs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        q = JobQueue(os.path.join(tmp, "bench.sqlite3"))
+
+        start = time.perf_counter()
+        for _ in range(n):
+            q.enqueue("ionq", "send_circuit", PAYLOAD)
+        report("enqueue", n, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        claimed = 0
+        while True:
+            job = q.claim("ionq")
+            if job is None:
+                break
+            q.complete(job.id)
+            claimed += 1
+        report("claim + complete", claimed, time.perf_counter() - start)
+
+        for _ in range(n):
+            q.enqueue("ibm", "send_circuit", PAYLOAD)
+
+        start = time.perf_counter()
+        while q.claim("ibm") is not None:
+            pass
+        # A dead process stops renewing: expire every lease it held
+        q.lease_s, lease_s = -1.0, q.lease_s
+        q.renew(range(1, 3 * n + 1))
+        q.lease_s = lease_s
+        recovered = q.recover()
+        report("claim + recover (restart)", recovered, time.perf_counter() - start)
+        q.close()
+
+
+if __name__ == "__main__":
+    main()
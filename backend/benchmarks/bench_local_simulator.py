@@ -0,0 +1,62 @@
+"""
+Statevector vs stabilizer engine of the local simulator on Clifford circuits.
+
+Run from backend/:
+    python -m benchmarks.bench_local_simulator --shots 1000
+"""
+import argparse
+import random
+import time
+
+from utils.local_simulator import MAX_QUBITS, get_local_results
+
+CLIFFORD_1Q = ["h", "x", "y", "z"]
+CLIFFORD_2Q = ["cx", "cz"]
+
+
+def ghz(n):
+    gates = [{"name": "h", "qubits": [0]}]
+    gates += [{"name": "cx", "qubits": [q, q + 1]} for q in range(n - 1)]
+    gates.append({"name": "measure", "qubits": list(range(n)), "clbits": list(range(n))})
+    return gates
+
+
+def random_clifford(n, depth, rng):
+    gates = []
+    for _ in range(depth):
+        for q in range(n):
+            gates.append({"name": rng.choice(CLIFFORD_1Q), "qubits": [q]})
+        order = list(range(n))
+        rng.shuffle(order)
+        for a, b in zip(order[::2], order[1::2]):
+            gates.append({"name": rng.choice(CLIFFORD_2Q), "qubits": [a, b]})
+    gates.append({"name": "measure", "qubits": list(range(n)), "clbits": list(range(n))})
+    return gates
+
+
+def time_ms(gates, n, shots, method, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        get_local_results(gates, n, n, shots, seed=0, method=method)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'circuit':<18} {'qubits':>6} {'gates':>6} {'statevector ms':>15} {'stabilizer ms':>14}")
+    for n in (2, 4, 8, 12, 16, 20, 22, 50, 100, 200, 500):
+        for label, gates in (("ghz", ghz(n)), ("random depth 10", random_clifford(n, 10, rng))):
+            sv = f"{time_ms(gates, n, args.shots, 'statevector', args.repeat):15.2f}" if n <= min(MAX_QUBITS, 22) else f"{'-':>15}"
+            st = time_ms(gates, n, args.shots, "stabilizer", args.repeat)
+            print(f"{label:<18} {n:>6} {len(gates):>6} {sv} {st:14.2f}")
+
+
+if __name__ == "__main__":
+    main()
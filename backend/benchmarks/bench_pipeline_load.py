@@ -0,0 +1,342 @@
+"""
+End-to-end load test of POST /make_request -> /fetch_results (polling) or
+/results/stream, against the real FastAPI app and execution engine.
+
+Shakes arrive as a Poisson process at --rate per second for --duration seconds.
+Provider calls go to a fake provider with a configurable latency distribution,
+and storage is LocalStorage wrapped to count calls (each one is a Firestore
+round-trip in production). The report (throughput, per-endpoint latency
+percentiles, queue depth over time, storage calls) is printed and saved as
+JSON, so runs can be compared between commits. Run from backend/:
+    python -m benchmarks.bench_pipeline_load --rate 20 --duration 30 --latency lognormal:2:0.5
+    python -m benchmarks.bench_pipeline_load --mode stream --out stream.json --baseline poll.json
+
+Latency specs: const:S, uniform:A:B, exp:MEAN, lognormal:MEDIAN:SIGMA (seconds).
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+FAKE_QUANTUM_COMPUTER = "ionq_fake"
+
+
+def latency_sampler(spec: str, rng: random.Random) -> Callable[[], float]:
+    kind, *params = spec.split(":")
+    params = [float(p) for p in params]
+    if kind == "const":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1 / params[0])
+    if kind == "lognormal":
+        return lambda: rng.lognormvariate(math.log(params[0]), params[1])
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+def fake_provider(latency: Callable[[], float], failure_rate: float, rng: random.Random):
+    """
+    run_batch(circuits, shots, user_info) for install_fake_provider: one sleep per
+    provider job, an even split of |0..0> and |1..1>. Like a provider that doesn't report execution time, the
+    whole sleep is timed as the provider_wait stage.
+    """
+    from utils.metrics import add_provider_wait
+    lock = threading.Lock()
+
+    def run_batch(circuits, shots, user_info):
+        with lock:
+            delay, failed = latency(), rng.random() < failure_rate
+        time.sleep(delay)
+        add_provider_wait(delay, None)
+        if failed:
+            return [None] * len(circuits)
+        results = []
+        for circuit, n in zip(circuits, shots):
+            zeros, ones = "0" * circuit.num_clbits, "1" * circuit.num_clbits
+            counts = {zeros: n // 2, ones: n - n // 2}
+            results.append({
+                "provider": "fake",
+                "backend_name": FAKE_QUANTUM_COMPUTER,
+                "shots": n,
+                "n_qubits": circuit.num_qubits,
+                "counts": counts,
+                "probabilities": {k: v / n for k, v in counts.items()},
+            })
+        return results
+
+    return run_batch
+
+
+def install_fake_provider(run_batch: Callable[..., list]):
+    """
+    Serve FAKE_QUANTUM_COMPUTER runs from run_batch by patching the provider calls
+    quantum.py imported from utils/send_qc.py; other quantum_computers go through.
+    """
+    import quantum
+    get_one, get_batch = quantum.get_circuit_results, quantum.get_circuit_results_batch
+
+    def get_circuit_results(circuit, shots=1000, quantum_computer_type="ionq", **kwargs):
+        if quantum_computer_type != FAKE_QUANTUM_COMPUTER:
+            return get_one(circuit, shots, quantum_computer_type, **kwargs)
+        return run_batch([circuit], [shots], kwargs.get("user_info"))[0]
+
+    def get_circuit_results_batch(circuits, shots, quantum_computer_type="ionq", **kwargs):
+        if quantum_computer_type != FAKE_QUANTUM_COMPUTER:
+            return get_batch(circuits, shots, quantum_computer_type, **kwargs)
+        return run_batch(circuits, shots, kwargs.get("user_info"))
+
+    quantum.get_circuit_results = get_circuit_results
+    quantum.get_circuit_results_batch = get_circuit_results_batch
+
+
+class CountingStorage:
+    """Forwards to a Storage and counts calls per method."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.calls[name] += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+def bell_circuit(n: int) -> Dict[str, Any]:
+    gates = [{"name": "h", "qubits": [0]}]
+    gates += [{"name": "cx", "qubits": [q, q + 1]} for q in range(n - 1)]
+    gates.append({"name": "measure", "qubits": list(range(n)), "clbits": list(range(n))})
+    return {"gates": gates, "num_qubits": n, "num_clbits": n}
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+
+    def at(q):
+        return round(samples[min(len(samples) - 1, int(len(samples) * q))], 2)
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples), 2),
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": round(samples[-1], 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+async def run_load(api, args, rng: random.Random) -> Dict[str, Any]:
+    import httpx
+    from utils.execution_engine import provider_for
+
+    latencies_ms: Dict[str, List[float]] = {"make_request": [], "fetch_results": [], "results_stream": [], "end_to_end": []}
+    outcomes: Counter = Counter()
+    queue_depth: List[Dict[str, Any]] = []
+    circuits = [bell_circuit(2 + i % 4) for i in range(args.distinct_circuits)]
+    provider = provider_for(args.quantum_computer)
+    start = None
+
+    async def timed(client, method, url, **kwargs):
+        t0 = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        return response, (time.perf_counter() - t0) * 1000
+
+    async def shake(client, i):
+        payload = {
+            "user_id": f"user{i % args.users}",
+            "shots": args.shots,
+            "circuit": circuits[rng.randrange(len(circuits))],
+            "quantum_computer": args.quantum_computer,
+        }
+        t0 = time.perf_counter()
+        response, ms = await timed(client, "POST", "/make_request", json=payload)
+        latencies_ms["make_request"].append(ms)
+        if response.status_code != 200:
+            outcomes[f"make_request_{response.status_code}"] += 1
+            return
+        run_request_id = response.json()["run_request_id"]
+        deadline = t0 + args.drain_timeout
+
+        if args.mode == "stream":
+            # The stream ends after the terminal status, so the request lasts until completion
+            response, ms = await timed(client, "GET", f"/results/stream/{run_request_id}")
+            latencies_ms["results_stream"].append(ms)
+            completed = '"status": "COMPLETED"' in response.text
+        else:
+            completed = False
+            while time.perf_counter() < deadline:
+                response, ms = await timed(client, "GET", "/fetch_results", params={"run_request_id": run_request_id})
+                latencies_ms["fetch_results"].append(ms)
+                if response.status_code == 200:
+                    completed = True
+                    break
+                await asyncio.sleep(args.poll_interval)
+        if not completed:
+            outcomes["timed_out"] += 1
+            return
+        success = '"success": true' in response.text
+        outcomes["completed" if success else "failed"] += 1
+        latencies_ms["end_to_end"].append((time.perf_counter() - t0) * 1000)
+
+    async def sample_queue(stop: asyncio.Event):
+        while not stop.is_set():
+            stats = api.engine.stats()[provider]
+            queue_depth.append({
+                "t_s": round(time.perf_counter() - start, 2),
+                "queue_depth": stats["queue_depth"],
+                "active_workers": stats["active_workers"],
+            })
+            try:
+                await asyncio.wait_for(stop.wait(), args.sample_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    transport = httpx.ASGITransport(app=api.app)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with api.app.router.lifespan_context(api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", limits=limits, timeout=None) as client:
+            start = time.perf_counter()
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(sample_queue(stop))
+            shakes = []
+            i = 0
+            # Open-loop arrivals: shakes are sent on schedule whether or not earlier ones finished
+            next_arrival = time.perf_counter()
+            while next_arrival - start < args.duration:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                shakes.append(asyncio.create_task(shake(client, i)))
+                i += 1
+                next_arrival += rng.expovariate(args.rate)
+            sent_s = time.perf_counter() - start
+            await asyncio.gather(*shakes)
+            elapsed_s = time.perf_counter() - start
+            stop.set()
+            await sampler
+
+    return {
+        "shakes": i,
+        "offered_rate": round(i / sent_s, 2),
+        "elapsed_s": round(elapsed_s, 2),
+        "throughput": round(outcomes["completed"] / elapsed_s, 2),
+        "outcomes": dict(outcomes),
+        "latency_ms": {name: percentiles(samples) for name, samples in latencies_ms.items() if samples},
+        "queue_depth": {
+            "max": max((s["queue_depth"] for s in queue_depth), default=0),
+            "samples": queue_depth,
+        },
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\nvs {baseline.get('commit')} ({baseline['config']['mode']}, rate {baseline['config']['rate']}/s):")
+    print(f"{'metric':<28} {'baseline':>10} {'now':>10} {'change':>8}")
+    rows = [("throughput /s", baseline["throughput"], report["throughput"])]
+    for name, stats in report["latency_ms"].items():
+        old = baseline["latency_ms"].get(name, {})
+        for q in ("p50", "p99"):
+            if q in stats and q in old:
+                rows.append((f"{name} {q} ms", old[q], stats[q]))
+    rows.append(("storage calls / shake", baseline["storage"]["calls_per_shake"], report["storage"]["calls_per_shake"]))
+    for label, old, new in rows:
+        change = f"{(new - old) / old * 100:+.0f}%" if old else "-"
+        print(f"{label:<28} {old:10.2f} {new:10.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=10.0, help="Mean shake arrivals per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of arrivals")
+    parser.add_argument("--mode", choices=("poll", "stream"), default="poll")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--latency", default="lognormal:1.0:0.5", help="Fake provider latency per job")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of fake provider jobs that fail")
+    parser.add_argument("--quantum-computer", default=FAKE_QUANTUM_COMPUTER,
+                        help=f"'{FAKE_QUANTUM_COMPUTER}' for the fake provider, or e.g. 'local_simulator'")
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--distinct-circuits", type=int, default=20)
+    parser.add_argument("--drain-timeout", type=float, default=300.0, help="Give up on a shake after this many seconds")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Queue depth sampling interval")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="pipeline_load.json")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time
+    workdir = tempfile.mkdtemp(prefix="qubi-load-")
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["STORAGE_PATH"] = os.path.join(workdir, "storage.sqlite3")
+    os.environ["JOB_QUEUE_PATH"] = os.path.join(workdir, "job_queue.sqlite3")
+
+    import utils.storage
+    counting = CountingStorage(utils.storage.storage)
+    utils.storage.storage = counting
+    api = importlib.import_module("main")
+
+    provider_rng = random.Random(args.seed + 1)
+    install_fake_provider(fake_provider(latency_sampler(args.latency, provider_rng), args.failure_rate, provider_rng))
+
+    # Users exist in production, so get_user_info is served from its cache after the first run
+    for u in range(args.users):
+        counting.put_user(f"user{u}", {"name": f"user{u}"})
+    counting.calls.clear()
+
+    report = {"commit": git_commit(), "config": vars(args)}
+    report.update(asyncio.run(run_load(api, args, random.Random(args.seed))))
+    from utils.metrics import STAGE_SECONDS
+    stage_totals: Dict[str, List[float]] = {}
+    for series in STAGE_SECONDS.snapshot():
+        total = stage_totals.setdefault(series["labels"]["stage"], [0.0, 0])
+        total[0] += series["sum"]
+        total[1] += series["count"]
+    report["stages_mean_ms"] = {name: round(total / n * 1000, 2) for name, (total, n) in stage_totals.items()}
+    calls = dict(counting.calls)
+    report["storage"] = {
+        "calls": calls,
+        "calls_per_shake": round(sum(calls.values()) / max(1, report["shakes"]), 2),
+    }
+
+    print(f"{report['shakes']} shakes at {report['offered_rate']}/s offered ({args.mode}, {args.quantum_computer}, latency {args.latency})")
+    print(f"throughput {report['throughput']}/s completed, outcomes {report['outcomes']}, max queue depth {report['queue_depth']['max']}")
+    print(f"{'endpoint':<16} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, stats in report["latency_ms"].items():
+        print(f"{name:<16} {stats['count']:7d} {stats['p50']:9.1f} {stats['p90']:9.1f} {stats['p99']:9.1f} {stats['max']:9.1f}")
+    print(f"stage means (ms): {report['stages_mean_ms']}")
+    print(f"storage calls/shake {report['storage']['calls_per_shake']}: {calls}")
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Firestore reads and delivery latency per completed run: polling /fetch_results vs
+streaming from /results/stream.
+
+Runs are executed by worker threads that publish status transitions through the
+real RunEventBus; the "Firestore" here is an in-memory dict that counts document
+reads the way fetch_results/load_run_event do (run_results first, then
+run_requests). Run from backend/:
+    python -m benchmarks.bench_result_delivery --runs 500 --poll-interval 1.0
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+from utils.run_events import RunEventBus
+
+
+class CountingStore:
+    def __init__(self):
+        self.requests = {}
+        self.results = {}
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def read(self, collection, doc_id):
+        with self._lock:
+            self.reads += 1
+            return getattr(self, collection).get(doc_id)
+
+
+def fetch_results(store, run_request_id):
+    """Reads like GET /fetch_results (and load_run_event)."""
+    result = store.read("results", run_request_id)
+    if result is not None:
+        return {"run_request_id": run_request_id, "status": "COMPLETED", "run_result": result}
+    request = store.read("requests", run_request_id)
+    if request is not None:
+        return {"run_request_id": run_request_id, "status": request["status"]}
+    return None
+
+
+def execute(store, bus, run_request_id, duration, completed_at):
+    time.sleep(duration * 0.2)
+    store.requests[run_request_id]["status"] = "RUNNING"
+    bus.publish(run_request_id, "RUNNING")
+    time.sleep(duration * 0.8)
+    store.results[run_request_id] = {"counts": {"00": 500, "11": 500}}
+    store.requests[run_request_id]["status"] = "COMPLETED"
+    completed_at[run_request_id] = time.perf_counter()
+    bus.publish(run_request_id, "COMPLETED", run_result=store.results[run_request_id])
+
+
+async def poll_client(store, run_request_id, interval, seen_at):
+    while True:
+        event = fetch_results(store, run_request_id)
+        if event and event["status"] == "COMPLETED":
+            seen_at[run_request_id] = time.perf_counter()
+            return
+        await asyncio.sleep(interval)
+
+
+async def stream_client(store, bus, run_request_id, seen_at):
+    async def load_state():
+        return fetch_results(store, run_request_id)
+
+    async for chunk in bus.stream(run_request_id, load_state):
+        if '"status": "COMPLETED"' in chunk:
+            seen_at[run_request_id] = time.perf_counter()
+
+
+async def scenario(mode, runs, interval, max_duration, seed):
+    rng = random.Random(seed)
+    store = CountingStore()
+    bus = RunEventBus()
+    bus.bind(asyncio.get_running_loop())
+    completed_at, seen_at = {}, {}
+
+    ids = [f"run{i}" for i in range(runs)]
+    for run_request_id in ids:
+        store.requests[run_request_id] = {"status": "PENDING"}
+        bus.publish(run_request_id, "PENDING")
+
+    if mode == "poll":
+        clients = [poll_client(store, r, interval, seen_at) for r in ids]
+    else:
+        clients = [stream_client(store, bus, r, seen_at) for r in ids]
+    tasks = [asyncio.create_task(c) for c in clients]
+    await asyncio.sleep(0)
+
+    threads = [
+        threading.Thread(target=execute, args=(store, bus, r, rng.uniform(0.2, max_duration), completed_at))
+        for r in ids
+    ]
+    for t in threads:
+        t.start()
+    await asyncio.gather(*tasks)
+    for t in threads:
+        t.join()
+
+    lags = sorted((seen_at[r] - completed_at[r]) * 1000 for r in ids)
+    return store.reads / runs, lags[len(lags) // 2], lags[int(len(lags) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--max-duration", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{args.runs} runs lasting 0.2-{args.max_duration} s, poll interval {args.poll_interval} s")
+    print(f"{'mode':<8} {'reads/run':>10} {'lag p50 ms':>11} {'lag p99 ms':>11}")
+    for mode in ("poll", "stream"):
+        reads, p50, p99 = asyncio.run(scenario(mode, args.runs, args.poll_interval, args.max_duration, seed=0))
+        print(f"{mode:<8} {reads:10.2f} {p50:11.1f} {p99:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+A parameter sweep as one request (POST /make_sweep) vs one /make_request per point.
+
+Per point, the old way builds, transpiles and executes a separate circuit; a
+sweep builds and transpiles one parameterized circuit and runs every point in
+one job (on the local simulator, on the statevector's batch axis). Provider
+latency is not simulated: each provider job adds its queueing time per point
+to the left column and once to the right one. Run from backend/:
+    python -m benchmarks.bench_sweep --points 100 --qubits 10 --layers 10
+"""
+import argparse
+import math
+import random
+import time
+
+from qiskit import transpile
+
+from utils.create_circuit import create_circuit
+from utils.local_simulator import get_local_results, get_local_sweep_results
+
+BASIS_GATES = ["rz", "sx", "x", "cx"]
+
+
+def ansatz(num_qubits, layers, seed):
+    """Hardware-efficient ansatz: ry by a named angle per layer, a cx ladder, then rz."""
+    rng = random.Random(seed)
+    gates = []
+    for layer in range(layers):
+        for q in range(num_qubits):
+            gates.append({"name": "ry", "qubits": [q], "params": ["theta" if q % 2 == 0 else "phi"]})
+            gates.append({"name": "rz", "qubits": [q], "params": [rng.uniform(-math.pi, math.pi)]})
+        for q in range(num_qubits - 1):
+            gates.append({"name": "cx", "qubits": [q, q + 1]})
+    gates.append({"name": "measure", "qubits": list(range(num_qubits)), "clbits": list(range(num_qubits))})
+    return gates
+
+
+def bind(gates, parameters, i):
+    return [
+        dict(gate, params=[parameters[p][i] if isinstance(p, str) else p for p in gate["params"]]) if "params" in gate else gate
+        for gate in gates
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=100)
+    parser.add_argument("--qubits", type=int, default=10)
+    parser.add_argument("--layers", type=int, default=10)
+    parser.add_argument("--shots", type=int, default=1000)
+    args = parser.parse_args()
+
+    n, shots = args.qubits, args.shots
+    gates = ansatz(n, args.layers, seed=0)
+    parameters = {
+        "theta": [2 * math.pi * i / args.points for i in range(args.points)],
+        "phi": [math.pi * i / args.points for i in range(args.points)],
+    }
+    points = range(args.points)
+
+    rows = [
+        (
+            "build + transpile",
+            timed(lambda: [transpile(create_circuit(bind(gates, parameters, i), n, n), basis_gates=BASIS_GATES, optimization_level=1) for i in points]),
+            timed(lambda: transpile(create_circuit(gates, n, n, symbolic=True), basis_gates=BASIS_GATES, optimization_level=1)),
+        ),
+        (
+            "local_simulator",
+            timed(lambda: [get_local_results(bind(gates, parameters, i), n, n, shots, method="statevector") for i in points]),
+            timed(lambda: get_local_sweep_results(gates, n, n, shots, parameters)),
+        ),
+    ]
+
+    print(f"{args.points} points, {n} qubits, {len(gates)} gates")
+    print(f"{'stage':18} {'per point':>12} {'sweep':>12} {'speedup':>8}")
+    for label, per_point, sweep in rows:
+        print(f"{label:18} {per_point * 1000:10.1f}ms {sweep * 1000:10.1f}ms {per_point / sweep:7.1f}x")
+    print(f"{'provider jobs':18} {args.points:12d} {1:12d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Cold vs warm (memory and QPY disk) transpilation through the transpile cache.
+
+Uses a local fake backend, so no IBM account is needed. Run from backend/:
+    python -m benchmarks.bench_transpile_cache --qubits 10 --layers 5
+"""
+import argparse
+import tempfile
+import time
+
+from qiskit.providers.fake_provider import GenericBackendV2
+
+from utils.create_circuit import create_circuit
+from utils.transpile_cache import TranspileCache
+
+
+def layered_gates(n, layers):
+    gates = []
+    for _ in range(layers):
+        gates += [{"name": "h", "qubits": [q]} for q in range(n)]
+        gates += [{"name": "cx", "qubits": [q, q + 1]} for q in range(n - 1)]
+        gates += [{"name": "t", "qubits": [q]} for q in range(n)]
+    gates.append({"name": "measure", "qubits": list(range(n)), "clbits": list(range(n))})
+    return gates
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--qubits", type=int, default=10)
+    parser.add_argument("--layers", type=int, default=5)
+    parser.add_argument("--level", type=int, default=3)
+    args = parser.parse_args()
+
+    backend = GenericBackendV2(num_qubits=max(args.qubits, 5), seed=1)
+    gates = layered_gates(args.qubits, args.layers)
+    with tempfile.TemporaryDirectory() as path:
+        cache = TranspileCache(path=path)
+        cold = timed_ms(lambda: cache.transpile([create_circuit(gates, args.qubits, args.qubits)], backend, args.level))
+        warm = timed_ms(lambda: cache.transpile([create_circuit(gates, args.qubits, args.qubits)], backend, args.level))
+        restarted = TranspileCache(path=path)
+        disk = timed_ms(lambda: restarted.transpile([create_circuit(gates, args.qubits, args.qubits)], backend, args.level))
+
+    print(f"{len(gates)} gates on {args.qubits} qubits, optimization_level={args.level}")
+    print(f"cold (transpile):   {cold:9.2f} ms")
+    print(f"warm (memory hit):  {warm:9.2f} ms")
+    print(f"restart (QPY disk): {disk:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
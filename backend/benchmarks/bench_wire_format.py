@@ -0,0 +1,111 @@
+"""
+JSON vs packed (utils/wire_format.py) circuits through the stages of POST /make_request:
+request size, parsing and hashing in the API, the job payload the execution
+engine persists and keeps in memory, and decoding into the gate list in the worker.
+
+Run from backend/:
+    python -m benchmarks.bench_wire_format --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+# main.py connects nothing at import time, but builds its singletons from the environment
+_tmp = tempfile.mkdtemp(prefix="bench_wire_format_")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("JOB_QUEUE_PATH", os.path.join(_tmp, "jobs.db"))
+
+from main import MakeRequestDTO  # noqa: E402
+from utils.canonical_circuit import canonicalize_and_hash  # noqa: E402
+from utils.wire_format import OPCODES, hash_packed, pack_circuit, packed_document, read_packed, unpack_circuit  # noqa: E402
+
+QUERY = {"user_id": "bench-user", "shots": 1000, "quantum_computer": "ionq_simulator"}
+
+
+def random_circuit(num_gates, n, seed):
+    rng = random.Random(seed)
+    gates = []
+    for _ in range(num_gates):
+        name, num_qubits, num_params = rng.choice(OPCODES[1:])
+        gate = {"name": name, "qubits": rng.sample(range(n), num_qubits)}
+        if num_params:
+            gate["params"] = [rng.uniform(-3.14, 3.14) for _ in range(num_params)]
+        gates.append(gate)
+    gates += [{"name": "measure", "qubits": [q], "clbits": [q]} for q in range(n)]
+    return {"gates": gates, "num_qubits": n, "num_clbits": n}
+
+
+def parse_json(body):
+    dto = MakeRequestDTO.model_validate_json(body)
+    return dto, canonicalize_and_hash(dto.circuit)
+
+
+def parse_packed(body):
+    packed = read_packed(body)
+    dto = MakeRequestDTO(**QUERY, circuit=packed_document(body, packed))
+    return dto, hash_packed(packed)
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def retained_bytes(fn):
+    """Memory still allocated by the object fn() returns."""
+    tracemalloc.start()
+    value = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del value
+    return size
+
+
+def measure(body, parse, repeat):
+    dto, _ = parse(body)
+    job = json.dumps(dto.circuit)
+    return {
+        "request_bytes": len(body),
+        "api_parse_hash_ms": median_ms(lambda: parse(body), repeat),
+        "job_bytes": len(job),
+        "job_memory_bytes": retained_bytes(lambda: parse(body)[0].circuit),
+        "worker_decode_ms": median_ms(lambda: unpack_circuit(json.loads(job)), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--qubits", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'gates':>7} {'format':6} {'request':>10} {'parse+hash':>11} {'job':>10} {'job memory':>11} {'decode':>9}")
+    for size in args.sizes:
+        circuit = random_circuit(size, args.qubits, seed=size)
+        json_body = json.dumps({**QUERY, "circuit": circuit}).encode("utf-8")
+        packed_body = pack_circuit(circuit)
+        rows = {
+            "json": measure(json_body, parse_json, args.repeat),
+            "packed": measure(packed_body, parse_packed, args.repeat),
+        }
+        for label, r in rows.items():
+            print(
+                f"{size:7d} {label:6} {r['request_bytes'] / 1024:8.1f}KB {r['api_parse_hash_ms']:9.2f}ms "
+                f"{r['job_bytes'] / 1024:8.1f}KB {r['job_memory_bytes'] / 1024:9.1f}KB {r['worker_decode_ms']:7.2f}ms"
+            )
+        speedup = rows["json"]["api_parse_hash_ms"] / rows["packed"]["api_parse_hash_ms"]
+        print(f"{'':7} API parse+hash {speedup:.1f}x faster, request {rows['json']['request_bytes'] / rows['packed']['request_bytes']:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,12 @@ from typing import Any, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-
 from supabase import create_client, Client
 
-SERVICE_ACCOUNT_PATH = "service_account.json"
-CHAPTERS_COLLECTION = "chapters"
+from utils.storage import storage_from_env
+
+# Next to this file, whatever directory the dashboard is started from
+SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "service_account.json")
 
 load_dotenv()
 
@@ -24,11 +23,7 @@ supabase: Optional[Client] = None
 if SUPABASE_URL and SUPABASE_KEY:
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
-    firebase_admin.initialize_app(cred)
-
-_db = firestore.client()
+_storage = storage_from_env(credentials_path=SERVICE_ACCOUNT_PATH)
 
 
 def sanitize_chapter_for_storage(chapter: Dict[str, Any]) -> Dict[str, Any]:
@@ -50,13 +45,11 @@ def sanitize_chapter_for_storage(chapter: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def get_chapter_list() -> List[Dict[str, Any]]:
-    """Return all chapters from Firestore with 'id' field and sorted by 'number'."""
+    """Return all chapters from storage with 'id' field and sorted by 'number'."""
     chapters: List[Dict[str, Any]] = []
 
-    docs = _db.collection(CHAPTERS_COLLECTION).stream()
-    for doc in docs:
-        data = doc.to_dict() or {}
-        data["id"] = doc.id
+    for chapter_id, data in _storage.list_chapters():
+        data["id"] = chapter_id
         chapters.append(data)
 
     chapters.sort(key=lambda c: c.get("number", 0))
@@ -64,12 +57,10 @@ def get_chapter_list() -> List[Dict[str, Any]]:
 
 
 def load_chapter(chapter_id: str) -> Optional[Dict[str, Any]]:
-    """Load a chapter by Firestore document id."""
-    doc_ref = _db.collection(CHAPTERS_COLLECTION).document(chapter_id)
-    doc = doc_ref.get()
-    if not doc.exists:
+    """Load a chapter by document id."""
+    data = _storage.get_chapter(chapter_id)
+    if data is None:
         return None
-    data = doc.to_dict() or {}
     return ensure_chapter_structure(data)
 
 
@@ -350,47 +341,36 @@ def export_chapter_to_bytes(chapter: Dict[str, Any], chapter_id: Optional[str] =
 
 
 def save_chapter_to_firestore(chapter_id: Optional[str], chapter: Dict[str, Any]) -> str:
-    """Save a chapter to Firestore, incrementing version, and return the document id."""
+    """Save a chapter to storage, incrementing version, and return the document id."""
     chapter = ensure_chapter_structure(chapter)
 
     current_version = int(chapter.get("version", 0))
     chapter["version"] = current_version + 1
 
     clean_data = sanitize_chapter_for_storage(chapter)
-    chapters_coll = _db.collection(CHAPTERS_COLLECTION)
 
     if chapter_id:
-        doc_ref = chapters_coll.document(chapter_id)
-        doc = doc_ref.get()
-        if doc.exists:
-            existing = doc.to_dict() or {}
+        existing = _storage.get_chapter(chapter_id)
+        if existing is not None:
             if existing.get("status") == "archived":
-                new_ref = chapters_coll.document()
-                new_ref.set(clean_data)
-                return new_ref.id
+                return _storage.add_chapter(clean_data)
             else:
-                doc_ref.set(clean_data, merge=False)
+                _storage.set_chapter(chapter_id, clean_data, merge=False)
                 return chapter_id
         else:
-            new_ref = chapters_coll.document()
-            new_ref.set(clean_data)
-            return new_ref.id
+            return _storage.add_chapter(clean_data)
     else:
-        new_ref = chapters_coll.document()
-        new_ref.set(clean_data)
-        return new_ref.id
+        return _storage.add_chapter(clean_data)
 
 
 def soft_delete_chapter(chapter_id: str) -> None:
     """Soft-delete a chapter (mark status='archived')."""
-    doc_ref = _db.collection(CHAPTERS_COLLECTION).document(chapter_id)
-    doc_ref.set({"status": "archived"}, merge=True)
+    _storage.set_chapter(chapter_id, {"status": "archived"}, merge=True)
 
 
 def unarchive_chapter(chapter_id: str) -> None:
     """Unarchive a chapter (mark status='active')."""
-    doc_ref = _db.collection(CHAPTERS_COLLECTION).document(chapter_id)
-    doc_ref.set({"status": "active"}, merge=True)
+    _storage.set_chapter(chapter_id, {"status": "active"}, merge=True)
 
 
 def upload_image_to_supabase(uploaded_file, existing_url: Optional[str] = None) -> str:
@@ -1,7 +1,7 @@
 import streamlit as st
 from typing import Any, Dict, List, Optional
 
-from helpers import (
+from learn_content.helpers import (
     get_chapter_list,
     load_chapter,
     ensure_chapter_structure,
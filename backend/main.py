@@ -2,22 +2,39 @@
 #   - POST /make_request
 #   - GET  /fetch_results
 #   - GET  /fetch_run_history
+#   - POST /make_requests_batch
+#   - POST /make_sweep
+#   - GET  /execution_stats
+#   - GET  /metrics
+#   - GET  /results/stream/{run_request_id}
 import os
 import json
-import hashlib
+import asyncio
+import base64
+from contextlib import asynccontextmanager
 from typing import Any, Dict, Optional, List
 from datetime import datetime, timezone
-import firebase_admin
-from firebase_admin import credentials, firestore
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
-from google.cloud.firestore_v1 import DocumentSnapshot
-from google.cloud.firestore_v1._helpers import DatetimeWithNanoseconds
-from datetime import datetime
 # send_circuit()
-from quantum import send_circuit
+from quantum import send_circuit, send_circuits_batch, send_sweep, send_cached_result, fail_runs, result_cache, in_flight
+from utils.execution_engine import ExecutionEngine, QueueFullError, provider_for
+from utils.send_ibm import transpile_cache
+from utils.send_qc import client_pool
+from utils.compile_pool import compile_pool
+from utils.canonical_circuit import canonicalize_and_hash
+from utils.create_circuit import circuit_cache
+from utils.run_events import run_events
+from utils.doc_cache import doc_cache
+from utils.firebase_rw import RUN_SUMMARY_FIELDS, get_user_run_summary
+from utils.io_pool import io_pool, run_io
+from utils.storage import storage
+from utils.sweep import check_sweep
+from utils.metrics import render_metrics
+from utils.wire_format import CONTENT_TYPE as PACKED_CONTENT_TYPE, hash_packed, packed_document, read_packed
 
 # Models
 class MakeRequestDTO(BaseModel):
@@ -25,24 +42,60 @@ class MakeRequestDTO(BaseModel):
     shots: int = Field(gt=0)
     circuit: Dict[str, Any]               
     quantum_computer: str   
+    # Adaptive shots: stop once every outcome probability is known to +/- tolerance, shots is the ceiling
+    tolerance: Optional[float] = Field(None, gt=0, lt=1)
 
-# App & Firestore init
+# Max circuits accepted by /make_requests_batch
+MAX_BATCH_SIZE = 100
+
+class BatchRunDTO(BaseModel):
+    shots: int = Field(gt=0)
+    circuit: Dict[str, Any]
+
+class MakeRequestsBatchDTO(BaseModel):
+    user_id: str
+    quantum_computer: str
+    runs: List[BatchRunDTO] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class MakeSweepDTO(BaseModel):
+    user_id: str
+    shots: int = Field(gt=0)
+    circuit: Dict[str, Any]
+    quantum_computer: str
+    # Values of each parameter named in the circuit's gate params, one per point
+    parameters: Dict[str, List[float]]
+
+# App init
 load_dotenv()
-firebase_creds = os.getenv("FIREBASE_CREDENTIALS")
-if not firebase_creds:
-    raise RuntimeError("FIREBASE_CREDENTIALS env var is missing.")
-firebase_creds_dict = json.loads(firebase_creds)
-cred = credentials.Certificate(firebase_creds_dict)
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
-app = FastAPI(title="Qubi MVP API", version="0.1.0")
+
+# Per-provider worker pools that run send_circuit off the API threadpool
+engine = ExecutionEngine.from_env()
+engine.register("send_circuit", send_circuit, on_failed=fail_runs)
+engine.register("send_circuits_batch", send_circuits_batch, on_failed=fail_runs)
+engine.register("send_sweep", send_sweep, on_failed=fail_runs)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Status events published by the execution workers are delivered on this loop
+    run_events.bind(asyncio.get_running_loop())
+    # Fails at startup rather than on the first request if the credentials are missing
+    storage.connect()
+    # Requeues run_requests orphaned by a previous process before accepting work
+    engine.start()
+    # Spawns the compile worker processes and imports qiskit in them up front
+    compile_pool.start()
+    yield
+    engine.shutdown()
+    compile_pool.shutdown()
+    io_pool.shutdown()
+
+app = FastAPI(title="Qubi MVP API", version="0.1.0", lifespan=lifespan)
 
               
 # Helpers
 def serialize_value(value):
     """Recursively converts Firestore timestamps and nested objects into JSON-safe types."""
-    if isinstance(value, DatetimeWithNanoseconds):
+    if isinstance(value, datetime):
         return value.isoformat()
     elif isinstance(value, dict):
         return {k: serialize_value(v) for k, v in value.items()}
@@ -51,91 +104,275 @@ def serialize_value(value):
     else:
         return value
 
-def canonicalize_and_hash(circuit: Dict[str, Any]) -> str:
-    """Deterministically hash the circuit JSON (keys sorted) exactly as provided."""
-    canonical_json = json.dumps(circuit, sort_keys=True, separators=(",", ":"))
-    return hashlib.sha256(canonical_json.encode("utf-8")).hexdigest()
-
 def circuit_exists(circuit_id: str) -> bool:
     """Return True if circuits/{circuit_id} exists."""
-    return db.collection("circuits").document(circuit_id).get().exists
-
-def insert_circuit(circuit_dict: Dict[str, Any]) -> str:
-    circuit_id = canonicalize_and_hash(circuit_dict)
-    if not circuit_exists(circuit_id):
-        db.collection("circuits").document(circuit_id).set(circuit_dict)
+    if doc_cache.get("circuits", circuit_id) is not None:
+        return True
+    return storage.get_circuit(circuit_id) is not None
+
+def insert_circuit(circuit_dict: Dict[str, Any], circuit_id: Optional[str] = None) -> str:
+    circuit_id = circuit_id or canonicalize_and_hash(circuit_dict)
+    if doc_cache.get("circuits", circuit_id) is not None:
+        return circuit_id
+    # Create-if-absent in one round-trip instead of an exists read plus a write
+    stored = circuit_dict
+    if not storage.create_circuit(circuit_id, circuit_dict):
+        # Another listing of the same circuit got there first: cache the document that is stored
+        stored = storage.get_circuit(circuit_id) or circuit_dict
+    # Content-addressed, so the document can never change under this id
+    doc_cache.put("circuits", circuit_id, json.dumps(stored, default=str).encode("utf-8"))
     return circuit_id
 
+def json_bytes_response(body: bytes, status_code: int = 200) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
 
 # Endpoints
 
-@app.post("/make_request")
-async def make_request(dto: MakeRequestDTO, bg: BackgroundTasks):
+def queue_full_response(quantum_computer: str) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Execution queue for {provider_for(quantum_computer)} is full, retry later",
+        headers={"Retry-After": "5"},
+    )
+
+
+async def parse_make_request(request: Request):
+    """
+    MakeRequestDTO from a JSON body, or from a packed circuit body (Content-Type
+    application/x-qubi-circuit, see utils/wire_format.py) with user_id, shots and
+    quantum_computer as query parameters.
+
+    Returns:
+        (dto, circuit_id or None); packed circuits are hashed here, from their decoded gates
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").split(";")[0].strip() != PACKED_CONTENT_TYPE:
+            return MakeRequestDTO.model_validate_json(body), None
+        try:
+            packed = read_packed(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid circuit payload: {e}")
+        dto = MakeRequestDTO(
+            user_id=request.query_params.get("user_id"),
+            shots=request.query_params.get("shots"),
+            quantum_computer=request.query_params.get("quantum_computer"),
+            tolerance=request.query_params.get("tolerance"),
+            circuit=packed_document(body, packed),
+        )
+        return dto, hash_packed(packed)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+
+@app.post("/make_request", openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": MakeRequestDTO.model_json_schema()},
+    PACKED_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+}}})
+async def make_request(request: Request):
     """
     1) Insert circuit into circuits/{circuit_id}
     2) Create run_requests/{run_request_id} and write to db
-    3) Asynchronously call send_circuit function
-    4) Return run_request_id
+    3) Complete it from the result cache if possible (cache-enabled simulators only, not adaptive runs)
+    4) Otherwise queue send_circuit on the execution engine (429 if the provider queue is full)
+    5) Return run_request_id
     """
+    dto, circuit_id = await parse_make_request(request)
+    cacheable = result_cache.enabled_for(dto.quantum_computer) and dto.tolerance is None
+    if not cacheable and not engine.has_capacity(dto.quantum_computer):
+        raise queue_full_response(dto.quantum_computer)
+
     try:
-        circuit_id = insert_circuit(dto.circuit)
+        circuit_id = await run_io(insert_circuit, dto.circuit, circuit_id)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid circuit payload: {e}")
 
-    req_ref = db.collection("run_requests").document()
-    run_request_id = req_ref.id
-
-    req_ref.set({
+    run_request = {
         "user_id": dto.user_id,
         "shots": dto.shots,
         "circuit_id": circuit_id,
         "quantum_computer": dto.quantum_computer,
-        "created_at": firestore.SERVER_TIMESTAMP,
         "status": "PENDING",
-    })
-
-    bg.add_task(
-        send_circuit,                 
-        run_request_id,               
-        dto.user_id,                 
-        circuit_id,                      
-        dto.circuit,                  
-        dto.quantum_computer,         
-        dto.shots,                 
-    )
+    }
+    if dto.tolerance is not None:
+        run_request["tolerance"] = dto.tolerance
+    run_request_id, = await run_io(storage.create_run_requests, [run_request])
+    run_events.publish(run_request_id, "PENDING", quantum_computer=dto.quantum_computer, shots=dto.shots)
+
+    if cacheable and await run_io(
+        send_cached_result, run_request_id, dto.user_id, circuit_id, dto.quantum_computer, dto.shots
+    ):
+        return {"run_request_id": run_request_id, "cached": True}
+
+    try:
+        engine.submit(
+            dto.quantum_computer,
+            "send_circuit",
+            run_request_id=run_request_id,
+            user_id=dto.user_id,
+            circuit_id=circuit_id,
+            circuit=dto.circuit,
+            quantum_computer_type=dto.quantum_computer,
+            shots=dto.shots,
+            tolerance=dto.tolerance,
+        )
+    except QueueFullError:
+        # Lost the race for the last queue slot
+        await run_io(storage.set_run_request_status, [run_request_id], "REJECTED")
+        run_events.publish(run_request_id, "REJECTED")
+        raise queue_full_response(dto.quantum_computer)
     print("run_request_id" + str(run_request_id))
     return {"run_request_id": run_request_id}
 
 
+@app.post("/make_requests_batch")
+async def make_requests_batch(dto: MakeRequestsBatchDTO):
+    """
+    Same as /make_request for many circuits of one user on one quantum computer.
+    Cache misses are executed together as one multi-circuit provider job.
+    Returns run_request_ids in the order of dto.runs.
+    """
+    cacheable = result_cache.enabled_for(dto.quantum_computer)
+    if not cacheable and not engine.has_capacity(dto.quantum_computer):
+        raise queue_full_response(dto.quantum_computer)
+
+    try:
+        circuit_ids = await run_io(lambda: [insert_circuit(run.circuit) for run in dto.runs])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid circuit payload: {e}")
+
+    run_request_ids = await run_io(storage.create_run_requests, [
+        {
+            "user_id": dto.user_id,
+            "shots": run.shots,
+            "circuit_id": circuit_id,
+            "quantum_computer": dto.quantum_computer,
+            "status": "PENDING",
+        }
+        for run, circuit_id in zip(dto.runs, circuit_ids)
+    ])
+    for run, run_request_id in zip(dto.runs, run_request_ids):
+        run_events.publish(run_request_id, "PENDING", quantum_computer=dto.quantum_computer, shots=run.shots)
+
+    pending = []
+    for run, circuit_id, run_request_id in zip(dto.runs, circuit_ids, run_request_ids):
+        if cacheable and await run_io(
+            send_cached_result, run_request_id, dto.user_id, circuit_id, dto.quantum_computer, run.shots
+        ):
+            continue
+        pending.append({
+            "run_request_id": run_request_id,
+            "circuit_id": circuit_id,
+            "circuit": run.circuit,
+            "shots": run.shots,
+        })
+
+    if pending:
+        try:
+            engine.submit(
+                dto.quantum_computer,
+                "send_circuits_batch",
+                user_id=dto.user_id,
+                quantum_computer_type=dto.quantum_computer,
+                runs=pending,
+            )
+        except QueueFullError:
+            await run_io(storage.set_run_request_status, [run["run_request_id"] for run in pending], "REJECTED")
+            for run in pending:
+                run_events.publish(run["run_request_id"], "REJECTED")
+            raise queue_full_response(dto.quantum_computer)
+
+    return {"run_request_ids": run_request_ids}
+
+
+@app.post("/make_sweep")
+async def make_sweep(dto: MakeSweepDTO):
+    """
+    Run one circuit at every point of a parameter sweep as a single provider job.
+    Gate params may name a parameter (e.g. {"name": "rz", "qubits": [0], "params": ["theta"]})
+    and dto.parameters gives each name one value per point.
+
+    The result is one run_results document (poll /fetch_results as for /make_request)
+    whose 'sweep' field holds the parameters and the counts of every point.
+    Returns run_request_id and the number of points.
+    """
+    try:
+        num_points = check_sweep(dto.circuit, dto.parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid sweep: {e}")
+    if not engine.has_capacity(dto.quantum_computer):
+        raise queue_full_response(dto.quantum_computer)
+
+    try:
+        circuit_id = await run_io(insert_circuit, dto.circuit)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid circuit payload: {e}")
+
+    run_request_id, = await run_io(storage.create_run_requests, [{
+        "user_id": dto.user_id,
+        "shots": dto.shots,
+        "circuit_id": circuit_id,
+        "quantum_computer": dto.quantum_computer,
+        "sweep_points": num_points,
+        "status": "PENDING",
+    }])
+    run_events.publish(run_request_id, "PENDING", quantum_computer=dto.quantum_computer, shots=dto.shots)
+
+    try:
+        engine.submit(
+            dto.quantum_computer,
+            "send_sweep",
+            run_request_id=run_request_id,
+            user_id=dto.user_id,
+            circuit_id=circuit_id,
+            circuit=dto.circuit,
+            quantum_computer_type=dto.quantum_computer,
+            shots=dto.shots,
+            parameters=dto.parameters,
+        )
+    except QueueFullError:
+        await run_io(storage.set_run_request_status, [run_request_id], "REJECTED")
+        run_events.publish(run_request_id, "REJECTED")
+        raise queue_full_response(dto.quantum_computer)
+    return {"run_request_id": run_request_id, "points": num_points}
+
+
 @app.get("/fetch_results")
 async def fetch_results(run_request_id: str):
     '''
     Fetch results of a request with id run_request_id
     '''
 
+    # Completed results never change, and pending answers are reused for a short TTL
+    body = doc_cache.get("run_results", run_request_id)
+    if body is not None:
+        return json_bytes_response(body, 200)
+    body = doc_cache.get_pending("run_results", run_request_id)
+    if body is not None:
+        return json_bytes_response(body, 202)
+
     # If result completed 
-    result_snap = db.collection("run_results").document(run_request_id).get()
-    if result_snap.exists:
-        result = serialize_value(result_snap.to_dict())
-        return JSONResponse(
-            status_code=200,
-            content={"status": "completed", "run_result": result}
-        )
+    run_result = await run_io(storage.get_run_result, run_request_id)
+    if run_result is not None:
+        result = serialize_value(run_result)
+        body = json.dumps({"status": "completed", "run_result": result}).encode("utf-8")
+        doc_cache.put("run_results", run_request_id, body)
+        return json_bytes_response(body, 200)
 
     # If request created but result not completed yet 
-    request_snap = db.collection("run_requests").document(run_request_id).get()
-    if request_snap.exists:
-        request_data = serialize_value(request_snap.to_dict())
+    run_request = await run_io(storage.get_run_request, run_request_id)
+    if run_request is not None:
+        request_data = serialize_value(run_request)
         qc = request_data.get("quantum_computer")
         shots = request_data.get("shots")
-        return JSONResponse(
-            status_code=202,
-            content={
-                "status": "waiting for quantum computer",
-                "quantum_computer": qc,
-                "shots": shots
-            }
-        )
+        body = json.dumps({
+            "status": "waiting for quantum computer",
+            "quantum_computer": qc,
+            "shots": shots
+        }).encode("utf-8")
+        doc_cache.put_pending("run_results", run_request_id, body)
+        return json_bytes_response(body, 202)
 
     # Not found at all
     return JSONResponse(
@@ -144,56 +381,184 @@ async def fetch_results(run_request_id: str):
     )
 
 
-@app.get("/fetch_run_history")
-async def fetch_run_history(user_id: str, limit: int = 20):
+def load_run_event(run_request_id: str) -> Optional[Dict[str, Any]]:
+    """Current state of a run from storage, as a run_events event (None if it doesn't exist)."""
+    run_result = storage.get_run_result(run_request_id)
+    if run_result is not None:
+        return {
+            "run_request_id": run_request_id,
+            "status": "COMPLETED",
+            "run_result": serialize_value(run_result),
+        }
+    request_data = storage.get_run_request(run_request_id)
+    if request_data is not None:
+        return {
+            "run_request_id": run_request_id,
+            "status": request_data.get("status", "PENDING"),
+            "quantum_computer": request_data.get("quantum_computer"),
+            "shots": request_data.get("shots"),
+        }
+    return None
+
+
+@app.get("/results/stream/{run_request_id}")
+async def stream_results(run_request_id: str):
     """
-    Fetches completed runs for a given user from run_results.
-    Returns all fields, fully serialized for frontend display.
+    Server-Sent Events alternative to polling /fetch_results: one `status` event per
+    transition (PENDING -> RUNNING -> COMPLETED, FAILED or REJECTED), a COMPLETED one
+    carrying run_result, then the stream ends. Unknown ids get a single `error` event.
     """
-    q = (
-        db.collection("run_results")
-        .where("user_id", "==", user_id)
-        .order_by("created_at", direction=firestore.Query.DESCENDING)
-        .limit(limit)
+    return StreamingResponse(
+        run_events.stream(run_request_id, lambda: run_io(load_run_event, run_request_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-    docs = list(q.stream())
+
+def encode_history_cursor(created_at: datetime, doc_id: str) -> str:
+    """Cursor token for the page after the run doc_id, created at created_at."""
+    raw = {"id": doc_id, "created_at": created_at.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps(raw).encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(token: str) -> Dict[str, Any]:
+    """
+    start_after token -> storage cursor {'id', 'created_at'}. created_at is None for
+    id-only tokens, which cost storage one document read to resolve.
+    """
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        created_at = raw.get("created_at")
+        return {"id": raw["id"], "created_at": datetime.fromisoformat(created_at) if created_at else None}
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid start_after token")
+
+@app.get("/fetch_run_history")
+async def fetch_run_history(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    start_after: Optional[str] = None,
+    fields: str = "full",
+):
+    """
+    Fetches completed runs for a given user from run_results, newest first.
+
+    Args:
+        start_after: next_start_after from the previous page
+        fields: 'full' for whole documents, 'summary' for RUN_SUMMARY_FIELDS only
+                (histograms can then be fetched per run with /fetch_results)
+
+    Returns:
+        history, plus next_start_after (None on the last page)
+    """
+    if fields not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="fields must be 'full' or 'summary'")
+
+    # First page of summaries: one read of the user's summary document, when it
+    # holds the whole page or all of the user's runs
+    if fields == "summary" and not start_after:
+        summary = await run_io(get_user_run_summary, user_id)
+        recent = (summary or {}).get("recent", [])
+        complete = bool(summary and summary["complete"])
+        if len(recent) >= limit or complete:
+            page = recent[:limit]
+            next_start_after = None
+            if len(recent) > limit or (len(recent) == limit and not complete):
+                next_start_after = encode_history_cursor(page[-1]["created_at"], page[-1]["run_request_id"])
+            return JSONResponse(
+                status_code=200,
+                content={"history": [serialize_value(entry) for entry in page], "next_start_after": next_start_after},
+            )
+
+    try:
+        docs = await run_io(
+            storage.list_run_results,
+            user_id,
+            limit,
+            after=decode_history_cursor(start_after) if start_after else None,
+            fields=RUN_SUMMARY_FIELDS if fields == "summary" else None,
+        )
+    except ValueError:
+        # The cursor's run doesn't exist
+        raise HTTPException(status_code=400, detail="Invalid start_after token")
     history: List[Dict[str, Any]] = []
 
-    for d in docs:
-        obj = serialize_value(d.to_dict() or {})
-        # Append the entire serialized document, keeping consistent shape
+    for doc_id, data in docs:
+        obj = serialize_value(data)
+        obj["run_request_id"] = doc_id
         history.append(obj)
 
-    return JSONResponse(status_code=200, content={"history": history})
+    next_start_after = None
+    if len(docs) == limit:
+        last_id, last = docs[-1]
+        created_at = last.get("created_at")
+        if created_at is not None:
+            next_start_after = encode_history_cursor(created_at, last_id)
+
+    return JSONResponse(
+        status_code=200,
+        content={"history": history, "next_start_after": next_start_after},
+    )
+
+@app.get("/execution_stats")
+async def execution_stats():
+    """
+    Queue depth, active workers and job counters for each provider pool.
+    """
+    return JSONResponse(
+        status_code=200,
+        content={
+            "providers": engine.stats(),
+            "result_cache": result_cache.stats(),
+            "coalescing": in_flight.stats(),
+            "transpile_cache": transpile_cache.stats(),
+            "compile_pool": compile_pool.stats(),
+            "circuit_cache": circuit_cache.stats(),
+            "provider_clients": client_pool.stats(),
+            "run_events": run_events.stats(),
+            "doc_cache": doc_cache.stats(),
+            "io_pool": io_pool.stats(),
+        },
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus histograms of per-stage run timings (qubi_run_stage_seconds) and
+    total run time (qubi_run_seconds), labeled by provider and backend.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 @app.get("/fetch_last_shake/{user_id}")
 async def fetch_last_shake(user_id: str):
     """
     Returns the most recent run_result document for a given user.
-    Includes all fields exactly as stored in Firestore.
+    Includes all fields exactly as stored.
     """
 
     try:
+        # Served from the user's summary document when add_results has recorded a shake
+        summary = await run_io(get_user_run_summary, user_id)
+        last_shake = (summary or {}).get("last_shake")
+        if last_shake:
+            if "success" in last_shake:
+                return serialize_value(last_shake)
+            run_result = await run_io(storage.get_run_result, last_shake["run_result_id"])
+            if run_result is not None:
+                data = serialize_value(run_result)
+                data["run_result_id"] = last_shake["run_result_id"]
+                return data
+
         # Query the latest run_result by creation time
         print('trying')
-        query = (
-            db.collection("run_results")
-            .where("user_id", "==", user_id)
-            .where("success", "==", True)
-            .order_by("created_at", direction=firestore.Query.DESCENDING)
-            .limit(1)
-            .stream()
-        )
-        doc = next(query, None)
+        docs = await run_io(storage.list_run_results, user_id, 1, success=True)
         print('trying1')
-        if not doc:
+        if not docs:
             return {"status": "NONE", "message": "No completed runs found"}
 
-        data = doc.to_dict()
-        data["run_result_id"] = doc.id  # Optional helper field
+        doc_id, data = docs[0]
+        data["run_result_id"] = doc_id  # Optional helper field
 
-        # Convert Firestore timestamp to ISO string
+        # Convert the stored timestamp to an ISO string
         created_at = data.get("created_at")
         if created_at:
             try:
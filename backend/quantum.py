@@ -1,13 +1,21 @@
+import hashlib
 import time
 import os
 
-from utils.firebase_rw import add_results, get_user_info
-from utils.create_circuit import create_circuit
-from utils.send_qc import get_circuit_results
+from utils.firebase_rw import add_results, get_user_info, mark_failed, mark_running
+from utils.compile_pool import compile_pool
+from utils.send_qc import get_circuit_results, get_circuit_results_batch, get_circuit_results_sweep
+from utils.local_simulator import LOCAL_SIMULATOR, get_local_results, get_local_sweep_results
+from utils.sweep import sweep_document
+from utils.adaptive_shots import run_adaptive
+from utils.wire_format import unpack_circuit
+from utils.optimize_circuit import ENABLED as OPTIMIZER_ENABLED, optimize_gates
+from utils.result_cache import ResultCache
+from utils.single_flight import SingleFlight
+from utils.execution_engine import RetryableError, is_final_attempt
+from utils.metrics import CREATE_CIRCUIT, OPTIMIZE, PROVIDER_EXECUTION, STORAGE_WRITE, USER_INFO, observe_run, record_stages, stage
 
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
 import json
 import os
 import time
@@ -16,59 +24,99 @@ import time
 
 load_dotenv()
 
-# Initialize Firebase Admin (local or env-based)
-try:
-    cred_dict = json.loads(os.getenv('FIREBASE_CREDENTIALS'))
-    cred = credentials.Certificate(cred_dict)
-except:
-    cred = credentials.Certificate('service-account-key.json')
+processed_docs = set()
 
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Opt-in cache of simulator results, see RESULT_CACHE_BACKENDS
+result_cache = ResultCache.from_env()
 
-processed_docs = set()
+# Identical (circuit_id, quantum_computer, shots) runs in flight on the same account share one provider job
+in_flight = SingleFlight()
 
-def send_circuit(
+def _account_key(quantum_computer_type: str, user_info: dict[str, any]):
+    """
+    sha256 of the provider tokens a run would be submitted with (None for the local
+    simulator), so a run is only coalesced onto a job billed to the same account.
+    """
+    if quantum_computer_type == LOCAL_SIMULATOR:
+        return None
+    tokens = {k: v for k, v in (user_info or {}).items() if k.endswith("_api_tok")}
+    return hashlib.sha256(json.dumps(tokens, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def fail_runs(error: str, run_request_id: str = None, runs: list[dict[str, any]] = None, **payload):
+    """
+    on_failed handler of send_circuit, send_sweep and send_circuits_batch jobs: the
+    job raised on its last attempt (e.g. saving the result failed), so its runs are
+    marked FAILED rather than left RUNNING.
+    """
+    run_request_ids = [run_request_id] if run_request_id else [run["run_request_id"] for run in runs or []]
+    mark_failed(run_request_ids, error)
+
+def send_cached_result(
     run_request_id: str,
     user_id: str,
     circuit_id: str,
-    circuit: dict[str, any],
     quantum_computer_type: str,
     shots: int
 ):
-    success = True
-    start_time = time.perf_counter()
-    try:
-        user_info = get_user_info(user_id)
-        print(f"User info: {user_info}")
+    """
+    Complete a run straight from the result cache.
 
-        gates = circuit.get("gates")
-        num_qubits = circuit.get("num_qubits")
-        num_clbits = circuit.get("num_clbits")
+    Returns:
+        run_id if a cached result was written, None on a cache miss
+    """
+    start_time = time.perf_counter()
+    res = result_cache.get(circuit_id, quantum_computer_type, shots)
+    if res is None:
+        return None
 
-        print(f"Creating circuit...")
-        qc = create_circuit(gates, num_qubits, num_clbits)
+    res.update({
+        "success": True,
+        "cached": True,
+        "elapsed_time": time.perf_counter() - start_time,
+        "run_request_id": run_request_id,
+        "user_id": user_id,
+        "circuit_id": circuit_id
+    })
+    return add_results(res)
 
-        db.collection("run_requests").document(run_request_id).update({
-            "status": "RUNNING"
-        })
+def _save_results(res: dict[str, any], timings: dict[str, float], quantum_computer_type: str):
+    """
+    Store a run's result with its stage timings (stage_timings_s), then record the
+    timings, including the storage write itself, in the /metrics histograms.
+    """
+    timings = dict(timings)
+    res["stage_timings_s"] = {name: round(seconds, 6) for name, seconds in timings.items()}
+    write_start = time.perf_counter()
+    run_id = add_results(res)
+    timings[STORAGE_WRITE] = time.perf_counter() - write_start
+    provider = res.get("provider") or quantum_computer_type
+    observe_run(timings, res["elapsed_time"], provider, res.get("backend_name") or quantum_computer_type, res["success"])
+    return run_id
 
-        print(f"Running circuit on {quantum_computer_type}...")
-        res = get_circuit_results(qc, shots=shots, quantum_computer_type=quantum_computer_type, user_info=user_info)
+def send_circuit(
+    run_request_id: str,
+    user_id: str,
+    circuit_id: str,
+    circuit: dict[str, any],
+    quantum_computer_type: str,
+    shots: int,
+    tolerance: float = None
+):
+    """
+    Args:
+        tolerance: Run shots adaptively (utils/adaptive_shots.py), with shots as the ceiling
+    """
+    start_time = time.perf_counter()
+    # Stages run by another caller's coalesced execution are timed in that caller's run
+    with record_stages() as timings:
+        res, success, coalesced = _execute_circuit(run_request_id, user_id, circuit_id, circuit, quantum_computer_type, shots, tolerance)
 
-        if res is None:
-            print("Failed to get results from quantum computer")
-            raise ValueError("Invalid quantum computer type")
-    
-    except Exception as e:
-        success = False
-        res = {}
-    
     elapsed_time = time.perf_counter() - start_time
 
     res.update({
         "success": success,
+        "cached": False,
+        "coalesced": coalesced,
         "elapsed_time": elapsed_time,
         "run_request_id": run_request_id,
         "user_id": user_id,
@@ -77,11 +125,254 @@ def send_circuit(
 
     print(f"Results: {res}")
     print(f"Saving results to Firebase...")
-    run_id = add_results(res)
+    run_id = _save_results(res, timings, quantum_computer_type)
     print("run_id: ", run_id)
 
     return run_id
 
+def _prepare_circuit(circuit: dict[str, any]):
+    """
+    Decode a packed circuit and optimize its gate list (see utils/optimize_circuit.py).
+
+    Returns:
+        (gates, num_qubits, num_clbits, optimization report or None)
+    """
+    # Packed circuits are decoded here, in the worker, rather than in the API
+    circuit = unpack_circuit(circuit)
+    gates = circuit.get("gates")
+    num_qubits = circuit.get("num_qubits")
+    num_clbits = circuit.get("num_clbits")
+    report = None
+    if OPTIMIZER_ENABLED:
+        with stage(OPTIMIZE):
+            gates, report = optimize_gates(gates, num_qubits, num_clbits)
+    return gates, num_qubits, num_clbits, report
+
+def _execute_circuit(run_request_id, user_id, circuit_id, circuit, quantum_computer_type, shots, tolerance=None):
+    """
+    Returns:
+        (result, success, coalesced)
+    """
+    coalesced = False
+    try:
+        with stage(USER_INFO):
+            user_info = get_user_info(user_id)
+        print(f"User info: {user_info}")
+
+        gates, num_qubits, num_clbits, optimization = _prepare_circuit(circuit)
+
+        mark_running([run_request_id])
+
+        def execute():
+            if quantum_computer_type == LOCAL_SIMULATOR:
+                # Simulated straight from the gate list, no QuantumCircuit needed
+                def run(n):
+                    with stage(PROVIDER_EXECUTION):
+                        return get_local_results(gates, num_qubits, num_clbits, n)
+            else:
+                print(f"Creating circuit...")
+                with stage(CREATE_CIRCUIT):
+                    qc = compile_pool.build(gates, num_qubits, num_clbits, circuit_id)
+
+                def run(n):
+                    print(f"Running circuit on {quantum_computer_type}...")
+                    return get_circuit_results(qc, shots=n, quantum_computer_type=quantum_computer_type, user_info=user_info)
+
+            # Adaptive runs send one provider job per chunk of shots
+            res = run(shots) if tolerance is None else run_adaptive(run, shots, tolerance)
+
+            if res is None:
+                print("Failed to get results from quantum computer")
+                raise RetryableError(f"No result from {quantum_computer_type}")
+
+            # An adaptive result may hold fewer shots than its key says
+            if tolerance is None:
+                result_cache.put(circuit_id, quantum_computer_type, shots, res)
+            return res
+
+        # Each caller gets its own copy of the shared result and its own run_results document
+        key = (circuit_id, quantum_computer_type, shots, tolerance, _account_key(quantum_computer_type, user_info))
+        res, coalesced = in_flight.do(key, execute)
+        if optimization is not None:
+            res["optimization"] = optimization
+        return res, True, coalesced
+
+    except RetryableError:
+        # Provider or network failure: let the engine retry the job, until its last attempt
+        if not is_final_attempt():
+            raise
+        return {}, False, coalesced
+    except Exception as e:
+        return {}, False, coalesced
+
+def _simulate_run_locally(run: dict[str, any]):
+    try:
+        gates, num_qubits, num_clbits, optimization = _prepare_circuit(run["circuit"])
+        with stage(PROVIDER_EXECUTION):
+            res = get_local_results(gates, num_qubits, num_clbits, run["shots"])
+        if optimization is not None:
+            res["optimization"] = optimization
+        return res
+    except Exception as e:
+        print(f"Local simulation of {run['run_request_id']} failed: {e}")
+        return None
+
+def send_circuits_batch(
+    user_id: str,
+    quantum_computer_type: str,
+    runs: list[dict[str, any]]
+):
+    """
+    Execute several run_requests of one user as a single multi-circuit provider job
+    and write one run_results document per request.
+
+    Args:
+        runs: dicts with run_request_id, circuit_id, circuit and shots
+
+    Returns:
+        List of run_ids, in the order of runs
+    """
+    start_time = time.perf_counter()
+    # One set of stage timings for the whole batch, stored on every run
+    with record_stages() as timings:
+        results = _execute_batch(user_id, quantum_computer_type, runs)
+
+    elapsed_time = time.perf_counter() - start_time
+
+    run_ids = []
+    for run, res in zip(runs, results):
+        success = res is not None
+        if success:
+            # Cached in the same shape as send_circuit's: the optimization report belongs to this request
+            result_cache.put(run["circuit_id"], quantum_computer_type, run["shots"], {k: v for k, v in res.items() if k != "optimization"})
+        res = dict(res) if success else {}
+        res.update({
+            "success": success,
+            "cached": False,
+            "batched": True,
+            "elapsed_time": elapsed_time,
+            "run_request_id": run["run_request_id"],
+            "user_id": user_id,
+            "circuit_id": run["circuit_id"]
+        })
+        run_ids.append(_save_results(res, timings, quantum_computer_type))
+
+    return run_ids
+
+def _execute_batch(user_id: str, quantum_computer_type: str, runs: list[dict[str, any]]):
+    """
+    Returns:
+        One unified result (or None) per run
+    """
+    results = [None] * len(runs)
+    try:
+        with stage(USER_INFO):
+            user_info = get_user_info(user_id)
+
+        if quantum_computer_type == LOCAL_SIMULATOR:
+            mark_running([run["run_request_id"] for run in runs])
+            results = [_simulate_run_locally(run) for run in runs]
+        else:
+            circuits = []
+            optimizations = []
+            for run in runs:
+                gates, num_qubits, num_clbits, optimization = _prepare_circuit(run["circuit"])
+                with stage(CREATE_CIRCUIT):
+                    circuits.append(compile_pool.build(gates, num_qubits, num_clbits, run["circuit_id"]))
+                optimizations.append(optimization)
+
+            mark_running([run["run_request_id"] for run in runs])
+
+            print(f"Running batch of {len(circuits)} circuits on {quantum_computer_type}...")
+            results = get_circuit_results_batch(
+                circuits,
+                shots=[run["shots"] for run in runs],
+                quantum_computer_type=quantum_computer_type,
+                user_info=user_info,
+            )
+            if all(res is None for res in results):
+                raise RetryableError(f"No results from {quantum_computer_type}")
+            for res, optimization in zip(results, optimizations):
+                if res is not None and optimization is not None:
+                    res["optimization"] = optimization
+    except RetryableError:
+        if not is_final_attempt():
+            raise
+        print("Batch execution failed on its last attempt")
+    except Exception as e:
+        print(f"Batch execution failed: {e}")
+
+    return results
+
+def send_sweep(
+    run_request_id: str,
+    user_id: str,
+    circuit_id: str,
+    circuit: dict[str, any],
+    quantum_computer_type: str,
+    shots: int,
+    parameters: dict[str, list[float]]
+):
+    """
+    Execute a parameter sweep (see utils/sweep.py) as one provider job and write
+    one run_results document holding every point.
+
+    Args:
+        parameters: Values of each named parameter, one per point
+    """
+    start_time = time.perf_counter()
+    with record_stages() as timings:
+        res = _execute_sweep(run_request_id, user_id, circuit_id, circuit, quantum_computer_type, shots, parameters)
+
+    success = res is not None
+    res = res if success else {}
+    res.update({
+        "success": success,
+        "cached": False,
+        "elapsed_time": time.perf_counter() - start_time,
+        "run_request_id": run_request_id,
+        "user_id": user_id,
+        "circuit_id": circuit_id
+    })
+    return _save_results(res, timings, quantum_computer_type)
+
+def _execute_sweep(run_request_id, user_id, circuit_id, circuit, quantum_computer_type, shots, parameters):
+    """
+    Returns:
+        The sweep result, or None if it failed
+    """
+    try:
+        with stage(USER_INFO):
+            user_info = get_user_info(user_id)
+
+        gates, num_qubits, num_clbits, optimization = _prepare_circuit(circuit)
+        mark_running([run_request_id])
+
+        if quantum_computer_type == LOCAL_SIMULATOR:
+            with stage(PROVIDER_EXECUTION):
+                results = get_local_sweep_results(gates, num_qubits, num_clbits, shots, parameters)
+        else:
+            # Built (and transpiled) once, with one Parameter per name
+            with stage(CREATE_CIRCUIT):
+                qc = compile_pool.build(gates, num_qubits, num_clbits, circuit_id, symbolic=True)
+            print(f"Running sweep of {len(next(iter(parameters.values())))} points on {quantum_computer_type}...")
+            results = get_circuit_results_sweep(qc, parameters, shots=shots, quantum_computer_type=quantum_computer_type, user_info=user_info)
+            if results is None or any(r is None for r in results):
+                raise RetryableError(f"No sweep results from {quantum_computer_type}")
+
+        res = sweep_document(parameters, results or [])
+        if res is not None and optimization is not None:
+            res["optimization"] = optimization
+        return res
+    except RetryableError:
+        if not is_final_attempt():
+            raise
+        print(f"Sweep {run_request_id} failed on its last attempt")
+        return None
+    except Exception as e:
+        print(f"Sweep {run_request_id} failed: {e}")
+        return None
+
 # Example usage
 
 # send_circuit(
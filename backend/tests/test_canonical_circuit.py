@@ -0,0 +1,189 @@
+"""
+canonicalize_and_hash() must give every listing of the same circuit DAG the same
+circuit_id, and different circuits different ids. For each random circuit,
+rewrites that keep its DAG keep its id:
+  - another topological order (independent gates on disjoint wires reordered)
+  - measurements split into pairs or merged into one measure
+  - extra keys on gates and on the circuit
+  - symmetric qubits (cz, swap, ccx controls) permuted
+  - params perturbed below PARAM_DECIMALS, ints written as floats, ignored extra params
+and rewrites that change the circuit change it: two dependent instructions
+swapped, a qubit, clbit or param changed, a gate dropped. Run from backend/:
+    python -m pytest tests
+"""
+import copy
+import random
+
+import pytest
+
+from utils.canonical_circuit import canonicalize_and_hash
+from utils.create_circuit import GATES
+from utils.wire_format import hash_packed, pack_circuit, read_packed
+
+NAMES = sorted(GATES)
+SYMMETRIC = {"cz", "swap"}
+
+
+def random_circuit(rng, num_gates, n, m):
+    """Measure pairs are listed one per instruction; params lie on a 1e-6 grid."""
+    gates = []
+    for _ in range(num_gates):
+        if rng.random() < 0.1 and m:
+            gates.append({"name": "measure", "qubits": [rng.randrange(n)], "clbits": [rng.randrange(m)]})
+            continue
+        name = rng.choice([name for name in NAMES if GATES[name].num_qubits <= n])
+        gate_def = GATES[name]
+        gate = {"name": name, "qubits": rng.sample(range(n), gate_def.num_qubits)}
+        if gate_def.num_params:
+            gate["params"] = [round(rng.uniform(-3.2, 3.2), 6) for _ in range(gate_def.num_params)]
+        gates.append(gate)
+    return {"gates": gates, "num_qubits": n, "num_clbits": m}
+
+
+def _wires(gate, n):
+    return gate["qubits"] + [n + c for c in gate.get("clbits", [])]
+
+
+def reorder(rng, circuit):
+    """Random topological order of the circuit's single-pair instructions."""
+    n = circuit["num_qubits"]
+    gates = circuit["gates"]
+    queues = {}
+    for i, gate in enumerate(gates):
+        for w in _wires(gate, n):
+            queues.setdefault(w, []).append(i)
+    heads = {w: 0 for w in queues}
+
+    def ready(i):
+        return all(queues[w][heads[w]] == i for w in _wires(gates[i], n))
+
+    candidates = {i for i in range(len(gates)) if ready(i)}
+    order = []
+    while candidates:
+        i = rng.choice(sorted(candidates))
+        candidates.remove(i)
+        order.append(gates[i])
+        for w in _wires(gates[i], n):
+            heads[w] += 1
+            if heads[w] < len(queues[w]) and ready(queues[w][heads[w]]):
+                candidates.add(queues[w][heads[w]])
+    return {**circuit, "gates": order}
+
+
+def merge_measures(rng, circuit):
+    """Merge runs of adjacent measures on disjoint wires into one measure, pairs shuffled."""
+    gates = []
+    for gate in circuit["gates"]:
+        prev = gates[-1] if gates else None
+        if (
+            gate["name"] == "measure" and prev is not None and prev["name"] == "measure"
+            and gate["qubits"][0] not in prev["qubits"] and gate["clbits"][0] not in prev["clbits"]
+        ):
+            pairs = list(zip(prev["qubits"], prev["clbits"])) + [(gate["qubits"][0], gate["clbits"][0])]
+            rng.shuffle(pairs)
+            gates[-1] = {"name": "measure", "qubits": [q for q, _ in pairs], "clbits": [c for _, c in pairs]}
+        else:
+            gates.append(dict(gate))
+    return {**circuit, "gates": gates}
+
+
+def decorate(rng, circuit):
+    """Extra keys, permuted symmetric qubits, perturbed and extra params."""
+    gates = []
+    for gate in circuit["gates"]:
+        gate = copy.deepcopy(gate)
+        name = gate["name"]
+        if rng.random() < 0.3:
+            gate["label"] = f"g{rng.randrange(1000)}"
+        if name in SYMMETRIC:
+            rng.shuffle(gate["qubits"])
+        elif name == "ccx" and rng.random() < 0.5:
+            gate["qubits"][0], gate["qubits"][1] = gate["qubits"][1], gate["qubits"][0]
+        if "params" in gate:
+            gate["params"] = [p + rng.uniform(-1e-13, 1e-13) for p in gate["params"]]
+            if rng.random() < 0.3:
+                gate["params"].append(rng.random())
+        elif name != "measure" and rng.random() < 0.2:
+            gate["params"] = []
+        gates.append(gate)
+    return {**circuit, "gates": gates, "metadata": {"author": "fuzz", "seed": rng.random()}}
+
+
+def mutate(rng, circuit):
+    """A rewrite that changes the circuit, or None if this circuit offers none of the chosen kind."""
+    n = circuit["num_qubits"]
+    gates = copy.deepcopy(circuit["gates"])
+    if not gates:
+        return None
+    kind = rng.choice(["swap_dependent", "qubit", "param", "clbit", "drop"])
+    if kind == "swap_dependent":
+        pairs = [
+            i for i in range(len(gates) - 1)
+            if set(_wires(gates[i], n)) & set(_wires(gates[i + 1], n)) and gates[i] != gates[i + 1]
+            and not (gates[i]["name"] == gates[i + 1]["name"] == "measure")
+            and (gates[i]["name"], gates[i + 1]["name"]) not in {("cz", "cz"), ("z", "z")}
+        ]
+        pairs = [i for i in pairs if not _commute_trivially(gates[i], gates[i + 1])]
+        if not pairs:
+            return None
+        i = rng.choice(pairs)
+        gates[i], gates[i + 1] = gates[i + 1], gates[i]
+    elif kind == "qubit":
+        i = rng.randrange(len(gates))
+        gate = gates[i]
+        free = [q for q in range(n) if q not in gate["qubits"]]
+        if not free:
+            return None
+        gate["qubits"][rng.randrange(len(gate["qubits"]))] = rng.choice(free)
+    elif kind == "param":
+        with_params = [g for g in gates if g.get("params")]
+        if not with_params:
+            return None
+        rng.choice(with_params)["params"][0] += 1e-6
+    elif kind == "clbit":
+        measures = [g for g in gates if g["name"] == "measure"]
+        if not measures or circuit["num_clbits"] < 2:
+            return None
+        gate = rng.choice(measures)
+        gate["clbits"][0] = (gate["clbits"][0] + 1) % circuit["num_clbits"]
+    else:
+        del gates[rng.randrange(len(gates))]
+    return {**circuit, "gates": gates}
+
+
+def _commute_trivially(a, b):
+    """Identical instructions swapped are the same circuit."""
+    return a["name"] == b["name"] and a["qubits"] == b["qubits"] and a.get("params") == b.get("params") and a.get("clbits") == b.get("clbits")
+
+
+def corpus_circuit(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 6)
+    return rng, random_circuit(rng, rng.randint(0, 40), n, rng.randint(0, n))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_equivalent_rewrites_keep_the_id(seed):
+    rng, circuit = corpus_circuit(seed)
+    expected = canonicalize_and_hash(circuit)
+    assert canonicalize_and_hash(reorder(rng, circuit)) == expected
+    assert canonicalize_and_hash(merge_measures(rng, reorder(rng, circuit))) == expected
+    assert canonicalize_and_hash(decorate(rng, merge_measures(rng, reorder(rng, circuit)))) == expected
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_mutations_change_the_id(seed):
+    rng, circuit = corpus_circuit(seed)
+    # mutate() picks a kind at random and returns None when the circuit offers none of it
+    mutant = next((m for m in (mutate(rng, circuit) for _ in range(20)) if m is not None), None)
+    if mutant is None:
+        pytest.skip("circuit has no gates")
+    assert canonicalize_and_hash(mutant) != canonicalize_and_hash(circuit)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_packed_circuit_gets_the_json_id(seed):
+    rng, circuit = corpus_circuit(seed)
+    assert hash_packed(read_packed(pack_circuit(circuit))) == canonicalize_and_hash(circuit)
+    merged = merge_measures(rng, reorder(rng, circuit))
+    assert hash_packed(read_packed(pack_circuit(merged))) == canonicalize_and_hash(circuit)
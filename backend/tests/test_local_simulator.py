@@ -0,0 +1,97 @@
+"""
+local_simulator against qiskit's Statevector on random circuits. Run from backend/:
+    python -m pytest tests
+"""
+import random
+
+import numpy as np
+import pytest
+from qiskit.quantum_info import Statevector
+
+from utils.create_circuit import create_circuit
+from utils.local_simulator import evolve, get_local_results
+
+GATES_1Q = ["h", "x", "y", "z", "s", "sdg", "t", "tdg"]
+ROTATIONS = ["rx", "ry", "rz"]
+MULTI_QUBIT = ["cx", "cz", "swap", "ccx"]
+
+
+def random_circuit(rng, num_gates, num_qubits, num_clbits):
+    """Random unitary gates, then every qubit measured into a random distinct clbit (if there are enough)."""
+    gates = []
+    for _ in range(num_gates):
+        kind = rng.random()
+        if kind < 0.5:
+            gates.append({"name": rng.choice(GATES_1Q), "qubits": [rng.randrange(num_qubits)]})
+        elif kind < 0.75 or num_qubits < 2:
+            gates.append({"name": rng.choice(ROTATIONS), "qubits": [rng.randrange(num_qubits)], "params": [rng.uniform(-np.pi, np.pi)]})
+        else:
+            name = rng.choice(MULTI_QUBIT if num_qubits >= 3 else MULTI_QUBIT[:-1])
+            gates.append({"name": name, "qubits": rng.sample(range(num_qubits), 3 if name == "ccx" else 2)})
+    qubits = rng.sample(range(num_qubits), min(num_qubits, num_clbits))
+    clbits = rng.sample(range(num_clbits), len(qubits))
+    gates.append({"name": "measure", "qubits": qubits, "clbits": clbits})
+    return gates
+
+
+def expected_distribution(gates, num_qubits, num_clbits):
+    """Exact clbit outcome probabilities from qiskit (qubit and clbit 0 are the rightmost bit)."""
+    unitary = [gate for gate in gates if gate["name"] != "measure"]
+    probabilities = Statevector(create_circuit(unitary, num_qubits, 0)).probabilities()
+    measure = gates[-1]
+    distribution = {}
+    for index, p in enumerate(probabilities):
+        key = 0
+        for q, c in zip(measure["qubits"], measure["clbits"]):
+            key |= ((index >> q) & 1) << c
+        outcome = format(key, f"0{num_clbits}b")
+        distribution[outcome] = distribution.get(outcome, 0.0) + p
+    return distribution
+
+
+def total_variation(counts, shots, distribution):
+    keys = set(counts) | set(distribution)
+    return 0.5 * sum(abs(counts.get(k, 0) / shots - distribution.get(k, 0.0)) for k in keys)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_probabilities_match_statevector(seed):
+    rng = random.Random(seed)
+    num_qubits = rng.randint(1, 5)
+    gates = random_circuit(rng, 30, num_qubits, num_qubits)
+    sv, _ = evolve(gates, num_qubits)
+    reference = Statevector(create_circuit(gates[:-1], num_qubits, 0)).probabilities()
+    np.testing.assert_allclose(sv.probabilities()[0], reference, atol=1e-5)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_counts_match_statevector(seed):
+    rng = random.Random(seed)
+    num_qubits = rng.randint(1, 5)
+    num_clbits = rng.randint(1, 6)
+    gates = random_circuit(rng, 30, num_qubits, num_clbits)
+    shots = 20000
+    res = get_local_results(gates, num_qubits, num_clbits, shots, seed=seed, method="statevector")
+    assert sum(res["counts"].values()) == shots
+    assert all(len(k) == num_clbits for k in res["counts"])
+    assert total_variation(res["counts"], shots, expected_distribution(gates, num_qubits, num_clbits)) < 0.03
+
+
+@pytest.mark.parametrize("prepared, gate, expected", [
+    ([0], {"name": "swap", "qubits": [0, 2]}, "100"),
+    ([0], {"name": "swap", "qubits": [2, 1]}, "001"),
+    ([0, 1], {"name": "ccx", "qubits": [0, 1, 2]}, "111"),
+    ([0], {"name": "ccx", "qubits": [0, 2, 1]}, "001"),
+])
+def test_swap_and_ccx(prepared, gate, expected):
+    gates = [{"name": "x", "qubits": [q]} for q in prepared]
+    gates += [gate, {"name": "measure", "qubits": [0, 1, 2], "clbits": [0, 1, 2]}]
+    res = get_local_results(gates, 3, 3, 100)
+    assert res["counts"] == {expected: 100}
+
+
+@pytest.mark.parametrize("clbits", [[2], [-1], ["0"]])
+def test_measure_into_invalid_clbit_is_rejected(clbits):
+    gates = [{"name": "h", "qubits": [0]}, {"name": "measure", "qubits": [0], "clbits": clbits}]
+    with pytest.raises(ValueError, match="invalid clbit"):
+        get_local_results(gates, 1, 2, 100)
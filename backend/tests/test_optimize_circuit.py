@@ -0,0 +1,107 @@
+"""
+optimize_gates() must not change what a circuit does: the unitary (up to global
+phase) without measurements, the measured distribution with them. Run from backend/:
+    python -m pytest tests
+"""
+import random
+
+import numpy as np
+import pytest
+from qiskit.quantum_info import Operator, Statevector
+
+from utils.create_circuit import GATES, create_circuit
+from utils.local_simulator import get_local_results
+from utils.optimize_circuit import optimize_gates
+
+# Few qubits and many repeated gates, so cancellations and merges happen often
+NAMES = sorted(GATES)
+ANGLES = [np.pi / 4, np.pi / 2, np.pi, -np.pi / 2, 0.3, -1.1]
+
+
+def random_gates(rng, num_gates, num_qubits):
+    gates = []
+    for _ in range(num_gates):
+        name = rng.choice([name for name in NAMES if GATES[name].num_qubits <= num_qubits])
+        gate = {"name": name, "qubits": rng.sample(range(num_qubits), GATES[name].num_qubits)}
+        if GATES[name].num_params:
+            gate["params"] = [rng.choice(ANGLES)]
+        gates.append(gate)
+    return gates
+
+
+def measured_distribution(gates, num_qubits, num_clbits):
+    """Exact clbit outcome probabilities of a unitary gate list followed by final measures."""
+    unitary = [gate for gate in gates if gate["name"] != "measure"]
+    probabilities = Statevector(create_circuit(unitary, num_qubits, 0)).probabilities()
+    distribution = np.zeros(1 << num_clbits)
+    for index, p in enumerate(probabilities):
+        key = 0
+        for gate in gates:
+            if gate["name"] == "measure":
+                for q, c in zip(gate["qubits"], gate["clbits"]):
+                    key |= ((index >> q) & 1) << c
+        distribution[key] += p
+    return distribution
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_unitary_is_unchanged(seed):
+    rng = random.Random(seed)
+    num_qubits = rng.randint(1, 3)
+    gates = random_gates(rng, 40, num_qubits)
+    optimized, report = optimize_gates(gates, num_qubits, 0)
+    assert report is not None and report["gates_after"] <= report["gates_before"]
+    assert Operator(create_circuit(optimized, num_qubits, 0)).equiv(Operator(create_circuit(gates, num_qubits, 0)))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_measured_distribution_is_unchanged(seed):
+    rng = random.Random(seed)
+    num_qubits = rng.randint(1, 4)
+    gates = random_gates(rng, 40, num_qubits)
+    # A subset of the qubits measured: gates only feeding the others may be dropped
+    qubits = rng.sample(range(num_qubits), rng.randint(1, num_qubits))
+    gates.append({"name": "measure", "qubits": qubits, "clbits": list(range(len(qubits)))})
+    optimized, report = optimize_gates(gates, num_qubits, len(qubits))
+    assert report is not None
+    np.testing.assert_allclose(
+        measured_distribution(optimized, num_qubits, len(qubits)),
+        measured_distribution(gates, num_qubits, len(qubits)),
+        atol=1e-9,
+    )
+
+
+def test_cancellations_and_merges():
+    gates = [
+        {"name": "h", "qubits": [0]},
+        {"name": "x", "qubits": [1]},
+        {"name": "x", "qubits": [1]},
+        {"name": "h", "qubits": [0]},
+        {"name": "t", "qubits": [0]},
+        {"name": "t", "qubits": [0]},
+        {"name": "rx", "qubits": [1], "params": [0.5]},
+        {"name": "rx", "qubits": [1], "params": [0.25]},
+        {"name": "measure", "qubits": [0, 1], "clbits": [0, 1]},
+    ]
+    optimized, report = optimize_gates(gates, 2, 2)
+    assert optimized == [
+        {"name": "s", "qubits": [0]},
+        {"name": "rx", "qubits": [1], "params": [0.75]},
+        {"name": "measure", "qubits": [0, 1], "clbits": [0, 1]},
+    ]
+    assert report["gates_before"] == 10 and report["gates_after"] == 4
+
+
+@pytest.mark.parametrize("param", [True, False, None, [1.0], float("nan")])
+def test_invalid_rotation_angles_are_left_for_validation(param):
+    gates = [
+        {"name": "rz", "qubits": [0], "params": [param]},
+        {"name": "rz", "qubits": [0], "params": [param]},
+        {"name": "measure", "qubits": [0], "clbits": [0]},
+    ]
+    optimized, report = optimize_gates(gates, 1, 1)
+    assert optimized is gates and report is None
+    with pytest.raises(ValueError):
+        create_circuit(optimized, 1, 1)
+    with pytest.raises(ValueError):
+        get_local_results(optimized, 1, 1, 100)
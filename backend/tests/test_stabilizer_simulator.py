@@ -0,0 +1,79 @@
+"""
+The stabilizer path of local_simulator against qiskit's Statevector on random
+Clifford circuits. Run from backend/:
+    python -m pytest tests
+"""
+import random
+
+import pytest
+from qiskit.quantum_info import Statevector
+
+from utils.create_circuit import create_circuit
+from utils.local_simulator import get_local_results
+from utils.stabilizer_simulator import CLIFFORD_GATES
+
+GATES_1Q = sorted(CLIFFORD_GATES - {"cx", "cz", "measure"})
+
+
+def random_clifford_circuit(rng, num_gates, num_qubits, num_clbits):
+    """Random Clifford gates, then a random subset of the qubits measured into distinct clbits."""
+    gates = []
+    for _ in range(num_gates):
+        if num_qubits < 2 or rng.random() < 0.6:
+            gates.append({"name": rng.choice(GATES_1Q), "qubits": [rng.randrange(num_qubits)]})
+        else:
+            gates.append({"name": rng.choice(["cx", "cz"]), "qubits": rng.sample(range(num_qubits), 2)})
+    qubits = rng.sample(range(num_qubits), rng.randint(1, min(num_qubits, num_clbits)))
+    clbits = rng.sample(range(num_clbits), len(qubits))
+    gates.append({"name": "measure", "qubits": qubits, "clbits": clbits})
+    return gates
+
+
+def expected_distribution(gates, num_qubits, num_clbits):
+    """Exact clbit outcome probabilities from qiskit (qubit and clbit 0 are the rightmost bit)."""
+    probabilities = Statevector(create_circuit(gates[:-1], num_qubits, 0)).probabilities()
+    measure = gates[-1]
+    distribution = {}
+    for index, p in enumerate(probabilities):
+        if p < 1e-12:
+            continue
+        key = 0
+        for q, c in zip(measure["qubits"], measure["clbits"]):
+            key |= ((index >> q) & 1) << c
+        outcome = format(key, f"0{num_clbits}b")
+        distribution[outcome] = distribution.get(outcome, 0.0) + p
+    return distribution
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_counts_match_statevector(seed):
+    rng = random.Random(seed)
+    num_qubits = rng.randint(1, 8)
+    num_clbits = rng.randint(1, 8)
+    gates = random_clifford_circuit(rng, 40, num_qubits, num_clbits)
+    shots = 20000
+    res = get_local_results(gates, num_qubits, num_clbits, shots, seed=seed, method="stabilizer")
+    distribution = expected_distribution(gates, num_qubits, num_clbits)
+
+    assert res["simulation_method"] == "stabilizer"
+    assert sum(res["counts"].values()) == shots
+    # Stabilizer states are uniform over their support: never an impossible outcome
+    assert set(res["counts"]) <= set(distribution)
+    keys = set(res["counts"]) | set(distribution)
+    assert 0.5 * sum(abs(res["counts"].get(k, 0) / shots - distribution.get(k, 0.0)) for k in keys) < 0.03
+
+
+def test_ghz_beyond_statevector_size():
+    n = 200
+    gates = [{"name": "h", "qubits": [0]}] + [{"name": "cx", "qubits": [q, q + 1]} for q in range(n - 1)]
+    gates.append({"name": "measure", "qubits": list(range(n)), "clbits": list(range(n))})
+    res = get_local_results(gates, n, n, 1000, seed=0)
+    assert res["simulation_method"] == "stabilizer"
+    assert set(res["counts"]) <= {"0" * n, "1" * n}
+    assert 400 < res["counts"].get("0" * n, 0) < 600
+
+
+def test_non_clifford_gate_is_rejected():
+    gates = [{"name": "t", "qubits": [0]}, {"name": "measure", "qubits": [0], "clbits": [0]}]
+    with pytest.raises(ValueError, match="Clifford"):
+        get_local_results(gates, 1, 1, 100, method="stabilizer")
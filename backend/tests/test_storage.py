@@ -0,0 +1,52 @@
+"""
+LocalStorage.complete_run() keeps the user's summary document bounded and knows
+when it holds all of the user's runs. Run from backend/:
+    python -m pytest tests
+"""
+from utils.storage import LocalStorage
+
+
+def complete_runs(storage, user_id, count, max_recent):
+    ids = storage.create_run_requests([{"user_id": user_id, "status": "PENDING"} for _ in range(count)])
+    for run_request_id in ids:
+        storage.complete_run(
+            run_request_id, {"user_id": user_id, "success": True},
+            user_id=user_id, summary_entry={"run_request_id": run_request_id}, max_recent=max_recent,
+        )
+    return ids
+
+
+def test_recent_is_trimmed_on_write():
+    storage = LocalStorage(":memory:")
+    ids = complete_runs(storage, "u", 7, max_recent=3)
+    summary = storage.get_user_summary("u")
+    assert [entry["run_request_id"] for entry in summary["recent"]] == ids[::-1][:3]
+    assert summary["complete"] is False
+
+
+def test_summary_of_a_new_user_is_complete():
+    storage = LocalStorage(":memory:")
+    complete_runs(storage, "u", 3, max_recent=3)
+    assert storage.get_user_summary("u")["complete"] is True
+
+
+def test_summary_created_after_earlier_runs_is_partial():
+    storage = LocalStorage(":memory:")
+    complete_runs(storage, "u", 2, max_recent=None)
+    storage._conn.execute("DELETE FROM documents WHERE collection = 'user_run_summaries'")
+    complete_runs(storage, "u", 1, max_recent=3)
+    assert storage.get_user_summary("u")["complete"] is False
+
+
+def test_retried_write_replaces_its_entry_and_shares_created_at():
+    storage = LocalStorage(":memory:")
+    (run_request_id,) = complete_runs(storage, "u", 1, max_recent=3)
+    created_at = storage.complete_run(
+        run_request_id, {"user_id": "u", "success": True},
+        user_id="u", summary_entry={"run_request_id": run_request_id}, last_shake={"run_result_id": run_request_id},
+        max_recent=3,
+    )
+    summary = storage.get_user_summary("u")
+    assert len(summary["recent"]) == 1 and summary["complete"] is True
+    assert summary["recent"][0]["created_at"] == created_at == summary["last_shake"]["created_at"]
+    assert storage.get_run_result(run_request_id)["created_at"] == created_at
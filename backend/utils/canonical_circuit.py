@@ -0,0 +1,155 @@
+"""
+Canonical form and hash (circuit_id) of JSON circuits.
+
+Hashing the raw JSON gives two circuits different ids when they differ only
+in the order of independent gates, how measurements are listed or in extra
+keys, which defeats insert_circuit's dedup and every cache keyed by
+circuit_id. The canonical form is computed from the circuit's DAG instead:
+
+  - each gate keeps only its name, qubits, clbits and the params its gate
+    takes; params are rounded to PARAM_DECIMALS, qubits of symmetric gates
+    (cz, swap, the controls of ccx) are sorted and a measure over several
+    qubits becomes one measure per (qubit, clbit) pair,
+  - each instruction is placed in the earliest layer after every earlier
+    instruction on its qubits and clbits. The layer depends only on the DAG,
+    and instructions in one layer touch disjoint wires, so sorting by
+    (layer, qubits) gives one topological order for every listing of the
+    same DAG.
+
+Gates on shared qubits are never reordered, even when they would commute.
+"""
+import hashlib
+import json
+import math
+import numbers
+from typing import Any, Dict, List, Tuple
+
+from utils.create_circuit import GATES, check_register_sizes
+
+# Params closer than this many decimal places hash the same
+PARAM_DECIMALS = 10
+
+# Bumped whenever the canonical form changes, so old and new ids never collide
+_VERSION = "qubi-circuit-v1"
+
+_SYMMETRIC = {"cz", "swap"}
+# Gates whose leading qubits are interchangeable controls: name -> number of controls
+_SYMMETRIC_CONTROLS = {"ccx": 2}
+
+
+def normalize_qubits(name: str, qubits: List[int]) -> List[int]:
+    """Qubits in canonical order: sorted for symmetric gates, controls sorted for ccx."""
+    if name in _SYMMETRIC:
+        return sorted(qubits)
+    controls = _SYMMETRIC_CONTROLS.get(name)
+    if controls:
+        return sorted(qubits[:controls]) + qubits[controls:]
+    return qubits
+
+
+def _param(value: Any) -> str:
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"Parameter {value} is not finite")
+        # + 0.0 turns -0.0 into 0.0
+        return repr(round(value, PARAM_DECIMALS) + 0.0)
+    if isinstance(value, str):
+        # Symbolic parameters (sweeps) are names, kept apart from numbers by the quotes
+        return json.dumps(value)
+    raise ValueError(f"Parameter {value!r} is neither a number nor a name")
+
+
+def _indices(values: Any, size: int, kind: str, i: int) -> List[int]:
+    if not isinstance(values, list):
+        raise ValueError(f"Gate at index {i} is missing its '{kind}' list")
+    for value in values:
+        if type(value) is not int or not 0 <= value < size:
+            raise ValueError(f"Gate at index {i} has invalid {kind[:-1]} {value!r}")
+    return values
+
+
+def canonical_instructions(circuit: Dict[str, Any]) -> List[Tuple[int, Tuple[int, ...], Tuple[int, ...], str]]:
+    """
+    The circuit as (layer, qubits, clbits, 'name(params)') tuples in canonical order.
+
+    Raises:
+        ValueError: if the circuit is not a well-formed gate list
+    """
+    num_qubits = circuit.get("num_qubits")
+    num_clbits = circuit.get("num_clbits")
+    gates = circuit.get("gates")
+    check_register_sizes(num_qubits, num_clbits)
+    if not isinstance(gates, list):
+        raise ValueError("Circuit is missing its 'gates' list")
+
+    # Latest layer on each wire: qubits first, then clbits
+    levels = [0] * (num_qubits + num_clbits)
+    instructions = []
+    append = instructions.append
+    for i, gate in enumerate(gates):
+        if not isinstance(gate, dict):
+            raise ValueError(f"Gate at index {i} is not an object")
+        name = gate.get("name")
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"Gate at index {i} is missing 'name' field")
+        qubits = _indices(gate.get("qubits"), num_qubits, "qubits", i)
+
+        if name == "measure":
+            clbits = _indices(gate.get("clbits"), num_clbits, "clbits", i)
+            if len(clbits) != len(qubits):
+                raise ValueError(f"Measure gate at index {i} needs matching 'qubits' and 'clbits' lists")
+            for q, c in zip(qubits, clbits):
+                layer = max(levels[q], levels[num_qubits + c]) + 1
+                levels[q] = levels[num_qubits + c] = layer
+                append((layer, (q,), (c,), "measure"))
+            continue
+
+        gate_def = GATES.get(name)
+        params = gate.get("params") or []
+        if not isinstance(params, list):
+            raise ValueError(f"Gate at index {i} has invalid 'params'")
+        if gate_def is not None:
+            # create_circuit ignores params beyond what the gate takes
+            params = params[:gate_def.num_params]
+        op = f"{name if name.isidentifier() else json.dumps(name)}({','.join(map(_param, params))})" if params else name
+
+        qubits = normalize_qubits(name, qubits)
+        if len(qubits) == 1:
+            layer = levels[qubits[0]] + 1
+            levels[qubits[0]] = layer
+        else:
+            layer = max([levels[q] for q in qubits]) + 1
+            for q in qubits:
+                levels[q] = layer
+        append((layer, tuple(qubits), (), op))
+
+    instructions.sort()
+    return instructions
+
+
+def canonical_form(circuit: Dict[str, Any]) -> str:
+    """Canonical text of the circuit; equal for circuits with the same DAG."""
+    parts = [f"{_VERSION}|{circuit.get('num_qubits')}|{circuit.get('num_clbits')}"]
+    for _, qubits, clbits, op in canonical_instructions(circuit):
+        if clbits:
+            parts.append(f"{op}{list(qubits)}{list(clbits)}")
+        else:
+            parts.append(f"{op}{list(qubits)}")
+    return ";".join(parts)
+
+
+def canonicalize_and_hash(circuit: Dict[str, Any]) -> str:
+    """
+    circuit_id of a JSON circuit: sha256 of its canonical form, so logically
+    identical circuits share one document and one cache key.
+
+    Raises:
+        ValueError: if the circuit is not a well-formed gate list
+    """
+    return hashlib.sha256(canonical_form(circuit).encode("utf-8")).hexdigest()
+
+
+def circuit_key(gates: List[Dict[str, Any]], num_qubits: int, num_clbits: int) -> str:
+    """canonicalize_and_hash of the circuit document holding this gate list."""
+    return canonicalize_and_hash({"gates": gates, "num_qubits": num_qubits, "num_clbits": num_clbits})
@@ -0,0 +1,186 @@
+"""
+Process pool for the CPU-bound compile stage: building QuantumCircuits from gate
+lists and transpiling them.
+
+Both are pure Python and hold the GIL for their whole duration, so running them
+on the API's threads stalls request handling. Worker processes are spawned and
+pre-warmed with qiskit imported at startup; circuits cross the process boundary
+as QPY bytes. With COMPILE_POOL_WORKERS=0 everything runs inline instead.
+"""
+import io
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from qiskit import QuantumCircuit, qpy, transpile
+
+from utils.canonical_circuit import circuit_key
+from utils.create_circuit import circuit_cache, create_circuit
+from utils.lru import LRUCache
+
+load_dotenv()
+
+DEFAULT_WORKERS = 2
+
+# Backend targets are large (about 1 MB pickled for 127 qubits), so each is
+# pickled once here and unpickled once per worker process
+_MAX_TARGETS = 8
+
+
+def dumps_circuits(circuits: List[QuantumCircuit]) -> bytes:
+    buffer = io.BytesIO()
+    qpy.dump(circuits, buffer)
+    return buffer.getvalue()
+
+
+def loads_circuits(data: bytes) -> List[QuantumCircuit]:
+    return qpy.load(io.BytesIO(data))
+
+
+# --- Worker process side ---
+
+_worker_targets: "Dict[str, Any]" = {}
+
+
+def _warm_up_worker():
+    # Importing qiskit and running one small transpile loads the passes the real jobs need
+    qc = QuantumCircuit(2, 2)
+    qc.h(0)
+    qc.cx(0, 1)
+    qc.measure([0, 1], [0, 1])
+    transpile(qc, basis_gates=["rz", "sx", "x", "cx"], optimization_level=1)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _build(gates: list, num_qubits: int, num_clbits: int, symbolic: bool) -> bytes:
+    return dumps_circuits([create_circuit(gates, num_qubits, num_clbits, symbolic)])
+
+
+def _transpile(data: bytes, target_key: str, target_data: bytes, optimization_level: int) -> bytes:
+    target = _worker_targets.get(target_key)
+    if target is None:
+        target = pickle.loads(target_data)
+        if len(_worker_targets) >= _MAX_TARGETS:
+            _worker_targets.pop(next(iter(_worker_targets)))
+        _worker_targets[target_key] = target
+    circuits = loads_circuits(data)
+    return dumps_circuits(transpile(circuits, target=target, optimization_level=optimization_level))
+
+
+# --- API process side ---
+
+class CompilePool:
+    """
+    Args:
+        workers: Number of worker processes (0 = compile inline in the calling thread)
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = max(0, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._targets = LRUCache(max_entries=_MAX_TARGETS)
+        self.submitted = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls) -> "CompilePool":
+        """Build a pool from COMPILE_POOL_WORKERS."""
+        return cls(workers=int(os.getenv("COMPILE_POOL_WORKERS", DEFAULT_WORKERS)))
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the API process has live threads and Firestore connections
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up_worker,
+                )
+            return self._executor
+
+    def start(self):
+        """Spawn and warm up every worker so the first requests don't pay for it."""
+        if not self.workers:
+            return
+        executor = self._get_executor()
+        pids = {f.result() for f in [executor.submit(_ping) for _ in range(self.workers)]}
+        print(f"Compile pool started with {len(pids)} worker processes")
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, fn, *args):
+        executor = self._get_executor()
+        with self._lock:
+            self.submitted += 1
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool for the next jobs
+            with self._lock:
+                self.failed += 1
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+
+    def build(self, gates: list, num_qubits: int, num_clbits: int, circuit_id: Optional[str] = None, symbolic: bool = False) -> QuantumCircuit:
+        """
+        create_circuit() in a worker process, through circuit_cache: a circuit
+        built before is copied in this process without a round trip to a worker.
+
+        Args:
+            circuit_id: canonicalize_and_hash of the circuit document, if the caller already has it
+            symbolic: Build parameter names as qiskit Parameters (sweeps)
+        """
+        def build():
+            if not self.workers:
+                return create_circuit(gates, num_qubits, num_clbits, symbolic)
+            return loads_circuits(self._run(_build, gates, num_qubits, num_clbits, symbolic))[0]
+
+        return circuit_cache.get_or_build(circuit_id or circuit_key(gates, num_qubits, num_clbits), build)
+
+    def transpile(self, circuits: List[QuantumCircuit], backend, optimization_level: int, target_key: str) -> List[QuantumCircuit]:
+        """
+        transpile() in a worker process, against backend.target.
+
+        Args:
+            target_key: Identifies backend.target (name and version), so each
+                        target is only pickled and shipped to a worker once
+        """
+        if not self.workers:
+            return transpile(circuits, backend=backend, optimization_level=optimization_level)
+        target_data = self._targets.get(target_key)
+        if target_data is None:
+            target_data = pickle.dumps(backend.target)
+            self._targets.put(target_key, target_data)
+        return loads_circuits(self._run(_transpile, dumps_circuits(circuits), target_key, target_data, optimization_level))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "started": self._executor is not None,
+                "submitted": self.submitted,
+                "failed": self.failed,
+            }
+
+
+# Shared by quantum.py (circuit building) and utils/transpile_cache.py (transpiling)
+compile_pool = CompilePool.from_env()
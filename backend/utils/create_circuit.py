@@ -1,50 +1,318 @@
+"""
+Builds QuantumCircuits from the gate lists stored in circuits/{circuit_id}.
+
+Every gate name maps to an entry in GATES (its qiskit gate class, qubit count
+and parameter count), so supporting a new gate is one register_gate() call.
+The whole gate list is validated in one pass before the circuit is created;
+the checked instructions are then appended directly, skipping the argument
+conversion and broadcasting every QuantumCircuit.h()/cx()/... call repeats.
+That fast path uses qiskit internals (QuantumCircuit._append and
+CircuitInstruction.from_standard, tested on the range pinned in
+requirements.txt); without them circuits are built with the public
+QuantumCircuit.append instead.
+Sweeps (POST /make_sweep) may name a parameter instead of giving its value;
+with symbolic=True such names become qiskit Parameters, bound per sweep point.
+Built circuits are kept in an LRU keyed by circuit_id (see
+utils/canonical_circuit.py), so a circuit built before is only copied.
+"""
+import math
+import numbers
+import os
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
 from qiskit import QuantumCircuit
+from qiskit.circuit import CircuitInstruction, Gate, Parameter
+from qiskit.circuit.library import (
+    CCXGate, CXGate, CZGate, HGate, Measure, RXGate, RYGate, RZGate, SdgGate, SGate,
+    SwapGate, TdgGate, TGate, XGate, YGate, ZGate,
+)
+
+from utils.lru import LRUCache
+
+load_dotenv()
+
+DEFAULT_CACHE_MAX_ENTRIES = 256
+
+# A bad gate list reports at most this many problems in its error message
+MAX_REPORTED_ERRORS = 10
+
+# Private qiskit APIs behind build_circuit's fast path
+FAST_APPEND = hasattr(QuantumCircuit, "_append") and hasattr(CircuitInstruction, "from_standard")
+
+# Largest quantum and classical register a circuit may declare, JSON or packed
+MAX_CIRCUIT_QUBITS = int(os.getenv("MAX_CIRCUIT_QUBITS", 1024))
+
+
+class GateDef(NamedTuple):
+    gate_class: Callable[..., Gate]
+    num_qubits: int
+    num_params: int = 0
+
+
+GATES: Dict[str, GateDef] = {}
+
+
+def register_gate(name: str, gate_class: Callable[..., Gate], num_qubits: int, num_params: int = 0):
+    """
+    Accept `name` in gate lists.
+
+    Args:
+        gate_class: Called with the gate's params to create the qiskit operation
+        num_qubits: Number of entries the gate's 'qubits' list must have
+        num_params: Number of numeric entries the gate's 'params' list must have
+    """
+    GATES[name] = GateDef(gate_class, num_qubits, num_params)
+
+
+for _name, _gate_class, _num_qubits, _num_params in (
+    ("h", HGate, 1, 0),
+    ("x", XGate, 1, 0),
+    ("y", YGate, 1, 0),
+    ("z", ZGate, 1, 0),
+    ("s", SGate, 1, 0),
+    ("sdg", SdgGate, 1, 0),
+    ("t", TGate, 1, 0),
+    ("tdg", TdgGate, 1, 0),
+    ("rx", RXGate, 1, 1),
+    ("ry", RYGate, 1, 1),
+    ("rz", RZGate, 1, 1),
+    ("cx", CXGate, 2, 0),
+    ("cz", CZGate, 2, 0),
+    ("swap", SwapGate, 2, 0),
+    ("ccx", CCXGate, 3, 0),
+):
+    register_gate(_name, _gate_class, _num_qubits, _num_params)
+
+
+def _valid_indices(indices: Any, size: int) -> bool:
+    if type(indices) is not list:
+        return False
+    for index in indices:
+        if type(index) is not int or not 0 <= index < size:
+            return False
+    return True
+
+
+def _valid_params(params: Any, count: int) -> bool:
+    if type(params) is not list or len(params) < count:
+        return False
+    for param in params[:count]:
+        if isinstance(param, bool) or not isinstance(param, numbers.Real) or not math.isfinite(param):
+            return False
+    return True
+
+
+def _valid_symbolic_params(params: Any, count: int) -> bool:
+    """Like _valid_params, but parameter names are accepted too."""
+    if type(params) is not list or len(params) < count:
+        return False
+    for param in params[:count]:
+        if type(param) is str:
+            if not param:
+                return False
+        elif isinstance(param, bool) or not isinstance(param, numbers.Real) or not math.isfinite(param):
+            return False
+    return True
+
+
+def parameter_names(gates: List[Dict[str, Any]]) -> List[str]:
+    """Sorted names of the symbolic parameters used by registered gates in the gate list."""
+    names = set()
+    for gate in gates:
+        gate_def = GATES.get(gate.get("name"))
+        if gate_def is not None and gate_def.num_params and isinstance(gate.get("params"), list):
+            names.update(p for p in gate["params"][:gate_def.num_params] if type(p) is str)
+    return sorted(names)
+
 
-def create_circuit(gates, num_qubits, num_clbits):
-    try:
-        qc = QuantumCircuit(num_qubits, num_clbits)
-    except Exception as e:
-        raise ValueError(f"Failed to create quantum circuit with {num_qubits} qubits and {num_clbits} classical bits: {str(e)}")
+def _gate_error(i: int, gate: Any, num_qubits: int, num_clbits: int, symbolic: bool = False) -> str:
+    """Why gates[i] failed validate_gates()."""
+    if not isinstance(gate, dict):
+        return f"Gate at index {i} is not an object"
+    name = gate.get("name")
+    if not name:
+        return f"Gate at index {i} is missing 'name' field"
+    qubits = gate.get("qubits")
+    if not isinstance(qubits, list):
+        return f"Gate at index {i} ('{name}') needs a 'qubits' list"
+    if not _valid_indices(qubits, num_qubits):
+        return f"Gate at index {i} ('{name}') has invalid qubits {qubits} for a {num_qubits}-qubit circuit"
+    if name == "measure":
+        clbits = gate.get("clbits")
+        if clbits is None:
+            return f"Measure gate at index {i} is missing 'clbits' field"
+        return f"Measure gate at index {i} has invalid clbits {clbits} for qubits {qubits}"
+    gate_def = GATES.get(name)
+    if gate_def is None:
+        return f"Unsupported gate '{name}' at index {i}"
+    if len(qubits) != gate_def.num_qubits or len(set(qubits)) != len(qubits):
+        return f"Gate at index {i} ('{name}') needs {gate_def.num_qubits} distinct qubit(s), got {qubits}"
+    params = gate.get("params")
+    if not isinstance(params, list) or len(params) < gate_def.num_params:
+        return f"{name.upper()} gate at index {i} is missing required parameter"
+    if not symbolic and any(type(p) is str for p in params[:gate_def.num_params]):
+        return f"{name.upper()} gate at index {i} has symbolic parameters {params[:gate_def.num_params]}, which only sweeps bind"
+    return f"{name.upper()} gate at index {i} has non-numeric parameters {params[:gate_def.num_params]}"
+
+
+# (operation, qubit indices, clbit indices, params); operation is a StandardGate when
+# params is a tuple (of floats and Parameters), otherwise an operation instance appended as is
+Instruction = Tuple[Any, Tuple[int, ...], Tuple[int, ...], Optional[Tuple[float, ...]]]
+
+
+def check_register_sizes(num_qubits: Any, num_clbits: Any):
+    """
+    Raises:
+        ValueError: unless both sizes are ints from 0 to MAX_CIRCUIT_QUBITS
+    """
+    if not all(type(n) is int and 0 <= n <= MAX_CIRCUIT_QUBITS for n in (num_qubits, num_clbits)):
+        raise ValueError(
+            f"Failed to create quantum circuit with {num_qubits} qubits and {num_clbits} classical bits "
+            f"(at most {MAX_CIRCUIT_QUBITS} each)"
+        )
+
+
+def validate_gates(gates: List[Dict[str, Any]], num_qubits: int, num_clbits: int, symbolic: bool = False) -> List[Instruction]:
+    """
+    Check the whole gate list against GATES and the register sizes.
+
+    Args:
+        symbolic: Accept parameter names in 'params' (one Parameter per distinct name)
+
+    Returns:
+        The instructions to append, for build_circuit()
+
+    Raises:
+        ValueError: listing every invalid gate (up to MAX_REPORTED_ERRORS)
+    """
+    check_register_sizes(num_qubits, num_clbits)
+    if not isinstance(gates, list):
+        raise ValueError(f"'gates' must be a list, got {type(gates).__name__}")
+
+    # name -> (operation, num_qubits, num_params, standard gate?)
+    dispatch = {}
+    for name, gate_def in GATES.items():
+        standard = getattr(gate_def.gate_class, "_standard_gate", None) if FAST_APPEND else None
+        operation = standard if standard is not None else (None if gate_def.num_params else gate_def.gate_class())
+        dispatch[name] = (operation, gate_def.num_qubits, gate_def.num_params, standard is not None)
+    measure = Measure()
+    no_params = ()
+    symbols: Dict[str, Parameter] = {}
+
+    def symbol(param):
+        if type(param) is not str:
+            return param
+        parameter = symbols.get(param)
+        if parameter is None:
+            parameter = symbols[param] = Parameter(param)
+        return parameter
+
+    instructions: List[Instruction] = []
+    append = instructions.append
+    errors: List[str] = []
 
     for i, gate in enumerate(gates):
-        try:
-            gate_name = gate.get('name')
-
-            if not gate_name:
-                raise ValueError(f"Gate at index {i} is missing 'name' field")
-
-            if gate_name == "h":
-                qc.h(*gate['qubits'])
-            elif gate_name == "x":
-                qc.x(*gate['qubits'])
-            elif gate_name == "y":
-                qc.y(*gate['qubits'])
-            elif gate_name == "z":
-                qc.z(*gate['qubits'])
-            elif gate_name == "t":
-                qc.t(*gate['qubits'])
-            elif gate_name == "tdg":
-                qc.tdg(*gate['qubits'])
-            elif gate_name == "cx":
-                qc.cx(*gate['qubits'])
-            elif gate_name == "cz":
-                qc.cz(*gate['qubits'])
-            elif gate_name == "rz":
-                if 'params' not in gate or len(gate['params']) == 0:
-                    raise ValueError(f"RZ gate at index {i} is missing required parameter")
-                qc.rz(gate['params'][0], *gate['qubits'])
-            elif gate_name == "measure":
-                if 'clbits' not in gate:
-                    raise ValueError(f"Measure gate at index {i} is missing 'clbits' field")
-                qc.measure(gate['qubits'], gate['clbits'])
+        if type(gate) is not dict:
+            errors.append(_gate_error(i, gate, num_qubits, num_clbits))
+        else:
+            name = gate.get("name")
+            qubits = gate.get("qubits")
+            entry = dispatch.get(name)
+            if entry is not None:
+                operation, arity, num_params, standard = entry
+                if (
+                    not _valid_indices(qubits, num_qubits)
+                    or len(qubits) != arity
+                    or (arity > 1 and len(set(qubits)) != arity)
+                ):
+                    errors.append(_gate_error(i, gate, num_qubits, num_clbits))
+                elif num_params:
+                    params = gate.get("params")
+                    if not _valid_params(params, num_params) and not (symbolic and _valid_symbolic_params(params, num_params)):
+                        errors.append(_gate_error(i, gate, num_qubits, num_clbits, symbolic))
+                    else:
+                        values = tuple(map(symbol, params[:num_params])) if symbolic else tuple(params[:num_params])
+                        if standard:
+                            append((operation, tuple(qubits), no_params, values))
+                        else:
+                            append((GATES[name].gate_class(*values), tuple(qubits), no_params, None))
+                else:
+                    append((operation, tuple(qubits), no_params, no_params if standard else None))
+            elif name == "measure":
+                clbits = gate.get("clbits")
+                if (
+                    _valid_indices(qubits, num_qubits)
+                    and _valid_indices(clbits, num_clbits)
+                    and len(clbits) == len(qubits)
+                ):
+                    instructions.extend((measure, (q,), (c,), None) for q, c in zip(qubits, clbits))
+                else:
+                    errors.append(_gate_error(i, gate, num_qubits, num_clbits))
             else:
-                raise ValueError(f"Unsupported gate '{gate_name}' at index {i}")
+                errors.append(_gate_error(i, gate, num_qubits, num_clbits))
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+
+    if errors:
+        raise ValueError("Invalid circuit: " + "; ".join(errors))
+    return instructions
+
+
+def build_circuit(instructions: List[Instruction], num_qubits: int, num_clbits: int) -> QuantumCircuit:
+    """Append instructions already checked by validate_gates() to a new circuit."""
+    qc = QuantumCircuit(num_qubits, num_clbits)
+    qubit, clbit = qc.qubits.__getitem__, qc.clbits.__getitem__
+    if not FAST_APPEND:
+        for operation, qargs, cargs, _ in instructions:
+            qc.append(operation, list(map(qubit, qargs)), list(map(clbit, cargs)), copy=False)
+        return qc
+    append = qc._append
+    from_standard = CircuitInstruction.from_standard
+    for operation, qargs, cargs, params in instructions:
+        if params is not None:
+            append(from_standard(operation, tuple(map(qubit, qargs)), params), _standard_gate=True)
+        else:
+            append(CircuitInstruction(operation, tuple(map(qubit, qargs)), tuple(map(clbit, cargs))))
+    return qc
+
+
+def create_circuit(gates, num_qubits, num_clbits, symbolic=False):
+    return build_circuit(validate_gates(gates, num_qubits, num_clbits, symbolic), num_qubits, num_clbits)
+
+
+class CircuitCache:
+    """
+    Args:
+        max_entries: Number of built circuits kept
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        self._cache = LRUCache(max_entries=max_entries)
+
+    @classmethod
+    def from_env(cls) -> "CircuitCache":
+        """Build a cache from CIRCUIT_CACHE_MAX_ENTRIES."""
+        return cls(max_entries=int(os.getenv("CIRCUIT_CACHE_MAX_ENTRIES", DEFAULT_CACHE_MAX_ENTRIES)))
+
+    def get_or_build(self, key: str, build: Callable[[], QuantumCircuit]) -> QuantumCircuit:
+        """
+        Return a copy of the circuit cached under key, calling build() on a miss.
+        Callers may modify the copy; the cached circuit is never handed out.
+        """
+        qc = self._cache.get(key)
+        if qc is None:
+            qc = build()
+            self._cache.put(key, qc)
+        return qc.copy()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
 
-        except KeyError as e:
-            raise ValueError(f"Gate at index {i} ('{gate.get('name', 'unknown')}') is missing required field: {str(e)}")
-        except TypeError as e:
-            raise ValueError(f"Gate at index {i} ('{gate.get('name', 'unknown')}') has invalid qubit/clbit specification: {str(e)}")
-        except Exception as e:
-            raise ValueError(f"Failed to apply gate '{gate.get('name', 'unknown')}' at index {i}: {str(e)}")
+# Shared by compile_pool.build() and anything else building circuits in the API process
+circuit_cache = CircuitCache.from_env()
 
-    return qc
\ No newline at end of file
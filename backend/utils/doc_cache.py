@@ -0,0 +1,78 @@
+"""
+Read-through cache for immutable Firestore documents.
+
+run_results/{id} never changes once written and circuits/{circuit_id} is
+content-addressed, so both can be cached indefinitely. Values are the
+serialized JSON bytes that endpoints send back, so a hit skips both the
+Firestore read and serialize_value. Runs that are not completed yet are
+negatively cached for a short TTL, which bounds how often pollers hit Firestore.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from utils.lru import LRUCache
+
+load_dotenv()
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_PENDING_TTL_S = 1.0
+
+
+class DocCache:
+    """
+    Args:
+        max_entries: Size of the LRU of immutable documents
+        max_bytes: Memory limit of the LRU (None = no limit)
+        pending_ttl_s: How long a "not completed yet" answer is reused
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+        pending_ttl_s: float = DEFAULT_PENDING_TTL_S,
+    ):
+        self._docs = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._pending = LRUCache(max_entries=max_entries, ttl_s=pending_ttl_s)
+
+    @classmethod
+    def from_env(cls) -> "DocCache":
+        """
+        Build a cache from DOC_CACHE_MAX_ENTRIES, DOC_CACHE_MAX_BYTES (0 = no limit)
+        and DOC_CACHE_PENDING_TTL_S.
+        """
+        max_bytes = int(os.getenv("DOC_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        return cls(
+            max_entries=int(os.getenv("DOC_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            max_bytes=max_bytes or None,
+            pending_ttl_s=float(os.getenv("DOC_CACHE_PENDING_TTL_S", DEFAULT_PENDING_TTL_S)),
+        )
+
+    def get(self, collection: str, doc_id: str) -> Optional[bytes]:
+        """Cached JSON bytes of an immutable document, or None."""
+        return self._docs.get((collection, doc_id))
+
+    def put(self, collection: str, doc_id: str, body: bytes):
+        self._pending.invalidate((collection, doc_id))
+        self._docs.put((collection, doc_id), body)
+
+    def get_pending(self, collection: str, doc_id: str) -> Optional[bytes]:
+        """Cached response for a document that didn't exist yet, or None."""
+        return self._pending.get((collection, doc_id))
+
+    def put_pending(self, collection: str, doc_id: str, body: bytes):
+        self._pending.put((collection, doc_id), body)
+
+    def invalidate_pending(self, collection: str, doc_id: str):
+        """Called when the document gets written, so the next read sees it."""
+        self._pending.invalidate((collection, doc_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": self._docs.stats(), "pending": self._pending.stats()}
+
+
+# Shared by main.py and utils/firebase_rw.py
+doc_cache = DocCache.from_env()
@@ -0,0 +1,355 @@
+"""
+Bounded per-provider worker pools for circuit execution.
+
+Every provider (ionq, ibm, rigetti, ...) gets its own fixed number of worker
+threads and a bounded share of the durable job queue, so a slow provider can
+only tie up its own workers and never the threadpool that serves the API
+endpoints. Jobs are persisted in utils/job_queue.py and survive restarts; a
+heartbeat thread renews the lease of every running job, so a job waiting on a
+provider queue for longer than the lease is never handed to a second worker.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Set
+
+from dotenv import load_dotenv
+
+from utils.job_queue import Job, JobQueue
+
+load_dotenv()
+
+DEFAULT_PROVIDER = "default"
+
+# Provider -> max concurrent jobs. Overridable with EXECUTION_WORKERS_<PROVIDER>.
+DEFAULT_WORKER_LIMITS = {
+    "ionq": 4,
+    "ibm": 4,
+    "rigetti": 2,
+    "local": 2,
+    DEFAULT_PROVIDER: 2,
+}
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_JOB_QUEUE_PATH = "job_queue.sqlite3"
+
+# How often idle workers look for jobs whose retry backoff or lease has expired
+POLL_INTERVAL_S = 1.0
+# Backoff of a worker whose job queue calls fail (e.g. "database is locked"), doubled up to the max
+QUEUE_ERROR_BACKOFF_S = 0.5
+QUEUE_ERROR_BACKOFF_MAX_S = 30.0
+
+
+class QueueFullError(Exception):
+    """Raised when a provider's execution queue cannot accept more work."""
+
+
+class RetryableError(Exception):
+    """
+    Raised by a handler for a failure worth another attempt, e.g. a provider or
+    network error. Handlers check is_final_attempt() first and record the
+    failure themselves on the last attempt.
+    """
+
+
+# The job the current worker thread is running
+_current = threading.local()
+
+
+def is_final_attempt() -> bool:
+    """
+    True if a job raising now would not be retried. Calls made outside the
+    engine (no job) are always on their final attempt.
+    """
+    job = getattr(_current, "job", None)
+    return job is None or job.attempts >= _current.max_attempts
+
+
+def provider_for(quantum_computer: str) -> str:
+    """
+    Map a quantum_computer string (e.g. 'ionq', 'ionq_simulator', 'ibm', 'local_simulator') to its provider pool.
+    """
+    name = (quantum_computer or "").lower()
+    for provider in DEFAULT_WORKER_LIMITS:
+        if name == provider or name.startswith(provider + "_"):
+            return provider
+    return DEFAULT_PROVIDER
+
+
+class _ProviderPool:
+    """A fixed number of worker threads draining one provider's jobs."""
+
+    def __init__(self, engine: "ExecutionEngine", provider: str, max_workers: int, queue_size: int):
+        self.engine = engine
+        self.provider = provider
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+        self.active = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.max_workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    name=f"exec-{self.provider}-{i}",
+                    daemon=True,
+                )
+                t.start()
+                self._threads.append(t)
+
+    def has_capacity(self) -> bool:
+        return self.engine.job_queue.depth(self.provider) < self.queue_size
+
+    def submit(self, handler: str, payload: Dict[str, Any]) -> bool:
+        if not self.has_capacity():
+            with self._lock:
+                self.rejected += 1
+            return False
+        self.engine.job_queue.enqueue(self.provider, handler, payload)
+        with self._lock:
+            self.submitted += 1
+            self._wakeup.notify()
+        return True
+
+    def _sleep(self, seconds: float):
+        with self._lock:
+            if not self._stopping:
+                self._wakeup.wait(timeout=seconds)
+
+    def _queue_call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call a job queue method, retrying with backoff while it raises, so a locked
+        or briefly unavailable queue file doesn't kill the worker thread. Gives up
+        (returning None) only when the pool is stopping.
+        """
+        backoff = QUEUE_ERROR_BACKOFF_S
+        while True:
+            try:
+                return fn(*args)
+            except Exception as e:
+                print(f"Execution worker ({self.provider}) job queue {fn.__name__} failed: {e}; retrying in {backoff:.1f}s")
+            with self._lock:
+                if self._stopping:
+                    return None
+            self._sleep(backoff)
+            backoff = min(backoff * 2, QUEUE_ERROR_BACKOFF_MAX_S)
+
+    def _worker(self):
+        job_queue = self.engine.job_queue
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+            job = self._queue_call(job_queue.claim, self.provider)
+            if job is None:
+                self._queue_call(job_queue.requeue_expired)
+                self._sleep(POLL_INTERVAL_S)
+                continue
+
+            with self._lock:
+                self.active += 1
+            ok, retry = False, None
+            self.engine._track(job.id)
+            _current.job, _current.max_attempts = job, job_queue.max_attempts
+            try:
+                self.engine.handler(job.handler)(**job.payload)
+                ok = True
+            except Exception as e:
+                print(f"Execution worker ({self.provider}) job {job.id} failed: {e}")
+                error = str(e)
+                # None if the pool stopped first: the job's lease then expires and it is retried
+                retry = self._queue_call(job_queue.fail, job, error)
+                if retry is False:
+                    self.engine._job_failed(job, error)
+            finally:
+                _current.job = None
+                if ok:
+                    self._queue_call(job_queue.complete, job.id)
+                # Renewed until recorded, so a slow complete() or fail() doesn't hand the job to another worker
+                self.engine._untrack(job.id)
+                with self._lock:
+                    self.active -= 1
+                    if ok:
+                        self.completed += 1
+                    elif retry is False:
+                        self.failed += 1
+                    else:
+                        self.retried += 1
+
+    def stats(self) -> Dict[str, int]:
+        depth = self.engine.job_queue.depth(self.provider)
+        with self._lock:
+            return {
+                "queue_depth": depth,
+                "queue_capacity": self.queue_size,
+                "active_workers": self.active,
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "retried": self.retried,
+                "failed": self.failed,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            self._stopping = True
+            threads = list(self._threads)
+            self._threads = []
+            self._wakeup.notify_all()
+        for t in threads:
+            t.join(timeout=5)
+
+
+class ExecutionEngine:
+    """
+    Dispatches execution jobs to per-provider pools.
+
+    Jobs name a handler registered with register() instead of carrying a
+    callable, so they can be stored in the job queue and replayed after a restart.
+
+    Args:
+        job_queue: Durable queue the jobs are stored in
+        worker_limits: Mapping of provider -> number of worker threads
+        queue_size: Max number of queued (not yet running) jobs per provider
+    """
+
+    def __init__(self, job_queue: JobQueue, worker_limits: Dict[str, int], queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.job_queue = job_queue
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._failure_handlers: Dict[str, Callable[..., Any]] = {}
+        # Ids of the jobs this process is running, renewed by the heartbeat thread
+        self._running: Set[int] = set()
+        self._running_lock = threading.Lock()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        limits = dict(worker_limits)
+        limits.setdefault(DEFAULT_PROVIDER, DEFAULT_WORKER_LIMITS[DEFAULT_PROVIDER])
+        self._pools = {
+            provider: _ProviderPool(self, provider, max(1, limit), max(1, queue_size))
+            for provider, limit in limits.items()
+        }
+
+    @classmethod
+    def from_env(cls) -> "ExecutionEngine":
+        """
+        Build an engine from EXECUTION_WORKERS_<PROVIDER>, EXECUTION_QUEUE_SIZE,
+        JOB_QUEUE_PATH, JOB_LEASE_S and JOB_MAX_ATTEMPTS.
+        """
+        limits = {
+            provider: int(os.getenv(f"EXECUTION_WORKERS_{provider.upper()}", default))
+            for provider, default in DEFAULT_WORKER_LIMITS.items()
+        }
+        queue_size = int(os.getenv("EXECUTION_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        job_queue = JobQueue(
+            os.getenv("JOB_QUEUE_PATH", DEFAULT_JOB_QUEUE_PATH),
+            lease_s=float(os.getenv("JOB_LEASE_S", 120)),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", 3)),
+        )
+        return cls(job_queue, limits, queue_size)
+
+    def register(self, name: str, fn: Callable[..., Any], on_failed: Optional[Callable[..., Any]] = None):
+        """
+        Make fn available to jobs submitted under name.
+
+        Args:
+            on_failed: Called as on_failed(error, **payload) when such a job raised on
+                       its last attempt and is parked as FAILED, e.g. to mark its runs failed
+        """
+        self._handlers[name] = fn
+        if on_failed is not None:
+            self._failure_handlers[name] = on_failed
+
+    def _job_failed(self, job: Job, error: str):
+        on_failed = self._failure_handlers.get(job.handler)
+        if on_failed is None:
+            return
+        try:
+            on_failed(error, **job.payload)
+        except Exception as e:
+            print(f"Failure handler of job {job.id} ({job.handler}) failed: {e}")
+
+    def handler(self, name: str) -> Callable[..., Any]:
+        if name not in self._handlers:
+            raise ValueError(f"No execution handler registered as '{name}'")
+        return self._handlers[name]
+
+    def _pool(self, quantum_computer: str) -> _ProviderPool:
+        provider = provider_for(quantum_computer)
+        return self._pools.get(provider) or self._pools[DEFAULT_PROVIDER]
+
+    def start(self) -> int:
+        """
+        Requeue jobs orphaned by a previous process and start every pool.
+
+        Returns:
+            Number of recovered jobs
+        """
+        recovered = self.job_queue.recover()
+        if recovered:
+            print(f"Recovered {recovered} orphaned job(s) from the job queue")
+        if self._heartbeat is None:
+            self._heartbeat_stop.clear()
+            self._heartbeat = threading.Thread(target=self._renew_leases, name="exec-heartbeat", daemon=True)
+            self._heartbeat.start()
+        for pool in self._pools.values():
+            pool.start()
+        return recovered
+
+    def _track(self, job_id: int):
+        with self._running_lock:
+            self._running.add(job_id)
+
+    def _untrack(self, job_id: int):
+        with self._running_lock:
+            self._running.discard(job_id)
+
+    def _renew_leases(self):
+        # Three renewals per lease, so one late heartbeat doesn't lose a job
+        while not self._heartbeat_stop.wait(self.job_queue.lease_s / 3):
+            with self._running_lock:
+                running = list(self._running)
+            if running:
+                try:
+                    self.job_queue.renew(running)
+                except Exception as e:
+                    print(f"Renewing job leases failed: {e}")
+
+    def has_capacity(self, quantum_computer: str) -> bool:
+        """Return True if the pool for quantum_computer can queue another job."""
+        return self._pool(quantum_computer).has_capacity()
+
+    def submit(self, quantum_computer: str, handler: str, **payload: Any) -> None:
+        """
+        Persist a job calling handler(**payload) on the pool that serves quantum_computer.
+        The payload must be JSON-serializable.
+
+        Raises:
+            QueueFullError: if that pool's queue is full
+        """
+        pool = self._pool(quantum_computer)
+        if not pool.submit(handler, payload):
+            raise QueueFullError(f"Execution queue for '{pool.provider}' is full")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Queue depth, active workers and counters for every provider pool."""
+        return {provider: pool.stats() for provider, pool in self._pools.items()}
+
+    def shutdown(self):
+        """Stop all worker threads once their current job finishes."""
+        for pool in self._pools.values():
+            pool.shutdown()
+        self._heartbeat_stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join(timeout=5)
+            self._heartbeat = None
@@ -2,55 +2,116 @@ from dotenv import load_dotenv
 
 import json
 import os
-import time
-
-import firebase_admin
-from firebase_admin import credentials, firestore
 
 load_dotenv()
 
-try:
-    # Option 1: Use environment variable (requires FIREBASE_CREDENTIALS to be set)
-    cred_dict = json.loads(os.getenv('FIREBASE_CREDENTIALS'))
-    cred = credentials.Certificate(cred_dict)
-except:
-    # Option 2: Use service account key file (recommended)
-    cred = credentials.Certificate('service-account-key.json')
-
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
 processed_docs = set()
 
 from collections import Counter
 import numpy as np
 
+from utils.run_events import run_events
+from utils.doc_cache import doc_cache
+from utils.storage import storage
+from utils.wire_format import unpack_circuit
+
+# Per-user document (user_run_summaries/{user_id}) with the most recent run summaries
+# and the last successful shake, so the home screen needs one read instead of a query
+# over run_results. 'recent' is appended to without a read, and trimmed back to
+# RECENT_RUNS when a read finds it has grown to 2 * RECENT_RUNS entries
+RECENT_RUNS = int(os.getenv('USER_RECENT_RUNS', 20))
+# The last shake is stored whole if its histogram has at most this many outcomes, else by id only
+LAST_SHAKE_INLINE_MAX_OUTCOMES = 256
+
+# Fields kept for each run in the summary document (and by /fetch_run_history?fields=summary)
+RUN_SUMMARY_FIELDS = ['provider', 'backend_name', 'shots', 'success', 'created_at', 'circuit_id', 'elapsed_time']
+
 def get_user_info(user_id):
     """
     Get user information from the 'users' collection.
+
+    Read on every run, not cached: the document holds the provider tokens, and a
+    token the user just replaced must not be used for another run.
+    """
+    return storage.get_user(user_id)
+
+def mark_running(run_request_ids):
+    """
+    Set run_requests to RUNNING, in one batch, and publish it to stream subscribers.
+    The status is informational: a failed write is logged and the run goes on.
+    """
+    try:
+        storage.set_run_request_status(run_request_ids, "RUNNING")
+    except Exception as e:
+        print(f"Error setting run_requests {list(run_request_ids)} to RUNNING: {e}")
+    for run_request_id in run_request_ids:
+        run_events.publish(run_request_id, "RUNNING")
+
+def mark_failed(run_request_ids, error):
     """
-    users_ref = db.collection('Users')
-    user = users_ref.document(user_id).get()
-    return user.to_dict()
+    Set run_requests whose job was given up on to FAILED and publish it, so streams
+    end instead of waiting on a RUNNING run forever. Runs whose result was already
+    stored (e.g. earlier runs of a batch) are left COMPLETED. A failed write is logged.
+    """
+    try:
+        run_request_ids = [i for i in run_request_ids if storage.get_run_result(i) is None]
+        storage.set_run_request_status(run_request_ids, "FAILED")
+    except Exception as e:
+        print(f"Error setting run_requests {list(run_request_ids)} to FAILED: {e}")
+    for run_request_id in run_request_ids:
+        run_events.publish(run_request_id, "FAILED", error=error)
 
 def add_results(results):
     """
-    Add results to the 'runs_results' collection.
+    Add results to the 'run_results' collection.
+
+    The result, the run_request's COMPLETED status and the user's summary
+    document are written in one batch, so a result is never visible while
+    its request still looks unfinished.
     """
-    #runs_ref = db.collection('runs_results')
-    runs_ref = db.collection('run_results')
-    
     doc_id = results.pop('run_request_id')
-    new_run = runs_ref.document(doc_id)
+    user_id = results.get('user_id')
+
+    summary_entry, last_shake = None, None
+    if user_id:
+        summary_entry, last_shake = _summary_update(results, doc_id)
+    created_at = storage.complete_run(
+        doc_id, results, user_id=user_id, summary_entry=summary_entry, last_shake=last_shake, max_recent=RECENT_RUNS,
+    )
 
-    results.update({
-        'created_at': firestore.SERVER_TIMESTAMP,
-    })
-    new_run.set(results)
-    db.collection("run_requests").document(doc_id).update({
-        "status": "COMPLETED"
-    })
-    return new_run.id
+    doc_cache.invalidate_pending("run_results", doc_id)
+    # Streamed to waiting clients
+    run_events.publish(doc_id, "COMPLETED", run_result=dict(results, created_at=created_at.isoformat()))
+    return doc_id
+
+def _summary_update(results, run_request_id):
+    """
+    The run's entry for the user's 'recent' list, and the new last_shake (None if the
+    run failed). storage.complete_run() stamps both with the result's created_at.
+    """
+    entry = {field: results.get(field) for field in RUN_SUMMARY_FIELDS}
+    entry['run_request_id'] = run_request_id
+    last_shake = None
+    # A sweep's points aren't one shake
+    if results.get('success') and 'sweep' not in results:
+        last_shake = {'run_result_id': run_request_id}
+        if len(results.get('counts') or {}) <= LAST_SHAKE_INLINE_MAX_OUTCOMES:
+            last_shake.update({k: v for k, v in results.items() if k != 'created_at'})
+    return entry, last_shake
+
+def get_user_run_summary(user_id):
+    """
+    Get the user's summary document: {'recent': [...newest first], 'last_shake': {...},
+    'complete': True if 'recent' holds all of the user's runs}, or None.
+    """
+    data = storage.get_user_summary(user_id)
+    if data is None:
+        return None
+    stored = data.get('recent', [])
+    data['recent'] = stored[:RECENT_RUNS]
+    # Summaries written before the flag existed are treated as partial
+    data['complete'] = bool(data.get('complete')) and len(stored) <= RECENT_RUNS
+    return data
 
 def get_circuit_by_id(circuit_id):
     """
@@ -62,14 +123,20 @@ def get_circuit_by_id(circuit_id):
     Returns:
         A tuple of (gates, num_qubits, num_clbits) or None if not found
     """
-    doc_ref = db.collection('circuits').document(circuit_id)
-    doc = doc_ref.get()
+    # Circuits are content-addressed, so a cached copy is never stale
+    cached = doc_cache.get('circuits', circuit_id)
+    if cached is not None:
+        data = json.loads(cached)
+    else:
+        data = storage.get_circuit(circuit_id)
 
-    if not doc.exists:
-        print(f"Error: Circuit with ID '{circuit_id}' not found")
-        return None
+        if data is None:
+            print(f"Error: Circuit with ID '{circuit_id}' not found")
+            return None
+
+        doc_cache.put('circuits', circuit_id, json.dumps(data, default=str).encode('utf-8'))
 
-    data = doc.to_dict()
+    data = unpack_circuit(data)
     gates = data.get('gates')
     num_qubits = data.get('num_qubits')
     num_clbits = data.get('num_clbits')
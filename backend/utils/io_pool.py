@@ -0,0 +1,65 @@
+"""
+Dedicated thread pool for blocking I/O (Firestore reads and writes) made from async endpoints.
+
+The Firestore client is synchronous: calling it directly inside an `async def`
+endpoint blocks the event loop for the whole network round-trip, stalling every
+other request on the worker. Endpoints `await run_io(fn, ...)` instead, which
+runs fn on this pool and leaves the loop free.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_WORKERS = 64
+
+
+class IOPool:
+    """
+    Args:
+        workers: Maximum number of blocking calls in flight at once
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="io")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+
+    @classmethod
+    def from_env(cls) -> "IOPool":
+        """Build a pool from IO_POOL_WORKERS."""
+        return cls(workers=int(os.getenv("IO_POOL_WORKERS", DEFAULT_WORKERS)))
+
+    def _call(self, fn: Callable[..., Any]) -> Any:
+        with self._lock:
+            self.in_flight += 1
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run fn(*args, **kwargs) on the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"workers": self.workers, "in_flight": self.in_flight, "completed": self.completed}
+
+
+io_pool = IOPool.from_env()
+run_io = io_pool.run
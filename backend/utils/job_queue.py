@@ -0,0 +1,169 @@
+"""
+Durable SQLite-backed job queue for run_requests.
+
+Jobs survive a process restart: workers claim a job under a lease that is
+renewed while the job runs, finished jobs are deleted, failed jobs are retried
+with exponential backoff, and jobs whose lease ran out (their process died)
+are put back on the queue.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+FAILED = "FAILED"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider TEXT NOT NULL,
+    handler TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (provider, status, id);
+"""
+
+
+class Job:
+    """A claimed job: which handler to call and with what keyword arguments."""
+
+    __slots__ = ("id", "provider", "handler", "payload", "attempts")
+
+    def __init__(self, id: int, provider: str, handler: str, payload: Dict[str, Any], attempts: int):
+        self.id = id
+        self.provider = provider
+        self.handler = handler
+        self.payload = payload
+        self.attempts = attempts
+
+
+class JobQueue:
+    """
+    Args:
+        path: SQLite file (":memory:" for a throwaway queue)
+        lease_s: How long a claimed job stays leased without a renew() before it is considered orphaned
+        max_attempts: Attempts before a job is parked as FAILED
+        backoff_s: Base retry delay, doubled after every failed attempt
+    """
+
+    def __init__(self, path: str, lease_s: float = 120.0, max_attempts: int = 3, backoff_s: float = 2.0):
+        self.path = path
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self.backoff_s = backoff_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def enqueue(self, provider: str, handler: str, payload: Dict[str, Any]) -> int:
+        """Add one job and return its id."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO jobs (provider, handler, payload, status, available_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, handler, json.dumps(payload), QUEUED, now, now),
+            )
+            return cur.lastrowid
+
+    def claim(self, provider: str) -> Optional[Job]:
+        """Lease the oldest runnable job for provider, or return None if there is none."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, handler, payload, attempts FROM jobs "
+                    "WHERE provider = ? AND status = ? AND available_at <= ? "
+                    "ORDER BY id LIMIT 1",
+                    (provider, QUEUED, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id, handler, payload, attempts = row
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, lease_until = ? WHERE id = ?",
+                    (RUNNING, attempts + 1, now + self.lease_s, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Job(job_id, provider, handler, json.loads(payload), attempts + 1)
+
+    def renew(self, job_ids: Iterable[int]) -> int:
+        """Extend the lease of jobs that are still running. Returns the number renewed."""
+        lease_until = time.time() + self.lease_s
+        with self._lock:
+            cur = self._conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?",
+                [(lease_until, job_id, RUNNING) for job_id in job_ids],
+            )
+            return cur.rowcount
+
+    def complete(self, job_id: int):
+        """Remove a finished job."""
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job: Job, error: str) -> bool:
+        """
+        Record a failed attempt. The job is requeued after a backoff unless it
+        has used up max_attempts, in which case it is parked as FAILED.
+
+        Returns:
+            True if the job will be retried
+        """
+        retry = job.attempts < self.max_attempts
+        delay = self.backoff_s * (2 ** (job.attempts - 1))
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_until = NULL, last_error = ? WHERE id = ?",
+                (QUEUED if retry else FAILED, time.time() + delay, error, job.id),
+            )
+        return retry
+
+    def recover(self) -> int:
+        """
+        Requeue jobs orphaned by a dead process; called at startup. Only expired
+        leases are reclaimed: other processes sharing the file renew the leases
+        of the jobs they are still running, so a job orphaned by a crash waits
+        up to lease_s before it runs again.
+        """
+        return self.requeue_expired()
+
+    def requeue_expired(self) -> int:
+        """Requeue RUNNING jobs whose lease has run out."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_until = NULL "
+                "WHERE status = ? AND lease_until < ?",
+                (QUEUED, now, RUNNING, now),
+            )
+            return cur.rowcount
+
+    def depth(self, provider: str) -> int:
+        """Number of jobs for provider waiting to be claimed."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE provider = ? AND status = ?",
+                (provider, QUEUED),
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
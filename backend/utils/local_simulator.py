@@ -0,0 +1,430 @@
+"""
+In-process NumPy statevector simulator for the 'local_simulator' quantum computer.
+
+Works directly on the gate list accepted by utils/create_circuit.py (no qiskit,
+no network) and returns the same unified result dict as the provider modules.
+Measurements must come after every other gate on the measured qubit.
+Clifford-only circuits are routed to the tableau sampler in
+utils/stabilizer_simulator.py; everything else runs on the statevector engine.
+
+The amplitudes live in one flat buffer and every gate is applied as a few
+vectorized operations on reshaped views of it. Before touching the buffer the
+gate list is simplified without changing the measured distribution:
+  - single-qubit gates before a qubit's first two-qubit gate are folded into a
+    product state that is expanded once,
+  - runs of single-qubit gates on the same qubit are fused into one matrix,
+  - diagonal gates (z, s, sdg, t, tdg, rz, cz) followed only by other diagonal gates
+    and measurements are dropped, since they cannot change Z-basis probabilities.
+
+Sweeps bind each named parameter to one value per point: rotations by a named
+parameter become a stack of matrices, and every point is evolved at once on
+the buffer's batch axis (get_local_sweep_results).
+"""
+import math
+import numbers
+import os
+import time
+
+import numpy as np
+
+from utils.stabilizer_simulator import is_clifford, sample_clifford
+
+LOCAL_SIMULATOR = "local_simulator"
+
+# 2^24 amplitudes * 8 bytes = 128 MB
+MAX_QUBITS = int(os.getenv("LOCAL_SIMULATOR_MAX_QUBITS", 24))
+
+# Single precision halves memory traffic; sampling only needs ~1e-6 accurate probabilities
+STATE_DTYPE = np.complex64
+
+_SQRT1_2 = 1 / np.sqrt(2)
+
+SINGLE_QUBIT_MATRICES = {
+    "h": np.array([[_SQRT1_2, _SQRT1_2], [_SQRT1_2, -_SQRT1_2]], dtype=complex),
+    "x": np.array([[0, 1], [1, 0]], dtype=complex),
+    "y": np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "z": np.array([[1, 0], [0, -1]], dtype=complex),
+    "s": np.array([[1, 0], [0, 1j]], dtype=complex),
+    "sdg": np.array([[1, 0], [0, -1j]], dtype=complex),
+    "t": np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex),
+    "tdg": np.array([[1, 0], [0, np.exp(-1j * np.pi / 4)]], dtype=complex),
+}
+TWO_QUBIT_GATES = ("cx", "cz", "swap")
+THREE_QUBIT_GATES = ("ccx",)
+
+
+def rx_matrix(theta: float) -> np.ndarray:
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]], dtype=complex)
+
+
+def ry_matrix(theta: float) -> np.ndarray:
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=complex)
+
+
+def rz_matrix(theta: float) -> np.ndarray:
+    return np.array([[np.exp(-0.5j * theta), 0], [0, np.exp(0.5j * theta)]], dtype=complex)
+
+
+ROTATION_MATRICES = {"rx": rx_matrix, "ry": ry_matrix, "rz": rz_matrix}
+
+
+def _is_diagonal(matrix: np.ndarray) -> bool:
+    """Also for (batch, 2, 2) stacks: diagonal at every sweep point."""
+    return not matrix[..., 0, 1].any() and not matrix[..., 1, 0].any()
+
+
+class _Statevector:
+    """
+    Amplitudes stored as a flat (batch, 2^n) STATE_DTYPE buffer indexed like
+    qiskit (qubit 0 = least significant bit).
+    """
+
+    def __init__(self, data: np.ndarray, num_qubits: int):
+        self.n = num_qubits
+        self.data = data
+
+    @classmethod
+    def product(cls, factors: list[np.ndarray]) -> "_Statevector":
+        """
+        Expand per-qubit 2-vectors (factors[q] for qubit q) into the full state.
+        A (batch, 2) factor gives every sweep point its own state.
+        """
+        state = np.ones((1, 1), dtype=STATE_DTYPE)
+        for factor in reversed(factors):
+            factor = np.atleast_2d(factor).astype(STATE_DTYPE)
+            state = state[:, :, None] * factor[:, None, :]
+            state = state.reshape(state.shape[0], -1)
+        return cls(state, len(factors))
+
+    def _pair(self, qubit: int) -> tuple[np.ndarray, np.ndarray]:
+        view = self.data.reshape(self.data.shape[0], -1, 2, 1 << qubit)
+        return view[:, :, 0, :], view[:, :, 1, :]
+
+    def _controlled_pair(self, control: int, target: int) -> tuple[np.ndarray, np.ndarray]:
+        hi, lo = max(control, target), min(control, target)
+        view = self.data.reshape(self.data.shape[0], -1, 2, 1 << (hi - lo - 1), 2, 1 << lo)
+        if control == hi:
+            view = view[:, :, 1]
+            return view[:, :, :, 0], view[:, :, :, 1]
+        view = view[:, :, :, :, 1]
+        return view[:, :, 0], view[:, :, 1]
+
+    def apply_1q(self, matrix: np.ndarray, qubit: int):
+        """matrix is (2, 2), or (batch, 2, 2) with one matrix per sweep point."""
+        if matrix.ndim == 3 and self.data.shape[0] == 1:
+            self.data = np.repeat(self.data, matrix.shape[0], axis=0)
+        a0, a1 = self._pair(qubit)
+        if matrix.ndim == 3:
+            _apply_to_pair_batched(matrix.astype(self.data.dtype), a0, a1)
+        else:
+            _apply_to_pair(matrix.astype(self.data.dtype), a0, a1)
+
+    def cx(self, control: int, target: int):
+        a0, a1 = self._controlled_pair(control, target)
+        tmp = a0.copy()
+        a0[...] = a1
+        a1[...] = tmp
+
+    def cz(self, a: int, b: int):
+        _, a1 = self._controlled_pair(a, b)
+        a1 *= -1
+
+    def _bits(self, bits: dict[int, int]) -> np.ndarray:
+        """View of the amplitudes whose qubit q is bits[q] for every listed qubit."""
+        view = self.data.reshape((self.data.shape[0],) + (2,) * self.n)
+        index = [slice(None)] * view.ndim
+        for q, bit in bits.items():
+            index[self.n - q] = bit
+        return view[tuple(index)]
+
+    def swap(self, a: int, b: int):
+        a01, a10 = self._bits({a: 0, b: 1}), self._bits({a: 1, b: 0})
+        tmp = a01.copy()
+        a01[...] = a10
+        a10[...] = tmp
+
+    def ccx(self, c0: int, c1: int, target: int):
+        a0, a1 = self._bits({c0: 1, c1: 1, target: 0}), self._bits({c0: 1, c1: 1, target: 1})
+        tmp = a0.copy()
+        a0[...] = a1
+        a1[...] = tmp
+
+    def probabilities(self) -> np.ndarray:
+        """(batch, 2^n) outcome probabilities in double precision."""
+        real = self.data.real.astype(np.float64)
+        imag = self.data.imag.astype(np.float64)
+        return real * real + imag * imag
+
+
+def _apply_to_pair(matrix: np.ndarray, a0: np.ndarray, a1: np.ndarray):
+    m00, m01, m10, m11 = matrix[0, 0], matrix[0, 1], matrix[1, 0], matrix[1, 1]
+    if m01 == 0 and m10 == 0:
+        if m00 != 1:
+            a0 *= m00
+        if m11 != 1:
+            a1 *= m11
+        return
+    if m00 == 0 and m11 == 0:
+        new1 = a0 * m10
+        np.multiply(a1, m01, out=a0)
+        a1[...] = new1
+        return
+    new0 = a0 * m00
+    new0 += a1 * m01
+    a1 *= m11
+    a1 += a0 * m10
+    a0[...] = new0
+
+
+def _apply_to_pair_batched(matrix: np.ndarray, a0: np.ndarray, a1: np.ndarray):
+    m = matrix[:, :, :, None, None]
+    new0 = a0 * m[:, 0, 0]
+    new0 += a1 * m[:, 0, 1]
+    a1 *= m[:, 1, 1]
+    a1 += a0 * m[:, 1, 0]
+    a0[...] = new0
+
+
+def _check_qubits(gate: dict, i: int, count: int, num_qubits: int) -> list[int]:
+    qubits = gate.get("qubits")
+    if not isinstance(qubits, list) or len(qubits) != count:
+        raise ValueError(f"Gate at index {i} ('{gate.get('name')}') needs {count} qubit(s), got {qubits}")
+    for q in qubits:
+        if not isinstance(q, int) or not 0 <= q < num_qubits:
+            raise ValueError(f"Gate at index {i} ('{gate.get('name')}') has invalid qubit {q}")
+    if len(set(qubits)) != len(qubits):
+        raise ValueError(f"Gate at index {i} ('{gate.get('name')}') repeats a qubit: {qubits}")
+    return qubits
+
+
+def parse_gates(gates: list[dict], num_qubits: int, parameters: dict[str, np.ndarray] = None, num_clbits: int = None) -> tuple[list[tuple], dict[int, int]]:
+    """
+    Validate the gate list and split it into unitary ops and final measurements.
+
+    Args:
+        parameters: Sweep values of each named parameter, one per point
+        num_clbits: Size of the classical register measures must write into (None = unchecked)
+
+    Returns:
+        (ops, {clbit: qubit}) where ops are (name, qubits, matrix or None);
+        rotations by a named parameter get a (points, 2, 2) matrix stack
+    """
+    ops = []
+    measured: dict[int, int] = {}
+    measured_qubits: set[int] = set()
+
+    for i, gate in enumerate(gates):
+        name = gate.get("name")
+        if not name:
+            raise ValueError(f"Gate at index {i} is missing 'name' field")
+
+        if name == "measure":
+            qubits = gate.get("qubits")
+            clbits = gate.get("clbits")
+            if clbits is None:
+                raise ValueError(f"Measure gate at index {i} is missing 'clbits' field")
+            if not isinstance(qubits, list) or not isinstance(clbits, list) or len(qubits) != len(clbits):
+                raise ValueError(f"Measure gate at index {i} needs matching 'qubits' and 'clbits' lists")
+            for q, c in zip(qubits, clbits):
+                if not isinstance(q, int) or not 0 <= q < num_qubits:
+                    raise ValueError(f"Measure gate at index {i} has invalid qubit {q}")
+                if not isinstance(c, int) or c < 0 or (num_clbits is not None and c >= num_clbits):
+                    raise ValueError(f"Measure gate at index {i} has invalid clbit {c}")
+                measured[c] = q
+                measured_qubits.add(q)
+            continue
+
+        if name in SINGLE_QUBIT_MATRICES or name in ROTATION_MATRICES:
+            qubits = _check_qubits(gate, i, 1, num_qubits)
+        elif name in TWO_QUBIT_GATES:
+            qubits = _check_qubits(gate, i, 2, num_qubits)
+        elif name in THREE_QUBIT_GATES:
+            qubits = _check_qubits(gate, i, 3, num_qubits)
+        else:
+            raise ValueError(f"Unsupported gate '{name}' at index {i}")
+
+        if measured_qubits.intersection(qubits):
+            raise ValueError(f"Gate at index {i} ('{name}') acts on a measured qubit; mid-circuit measurement is not supported")
+
+        if name in ROTATION_MATRICES:
+            params = gate.get("params")
+            if not params:
+                raise ValueError(f"{name.upper()} gate at index {i} is missing required parameter")
+            theta = params[0]
+            if isinstance(theta, str):
+                if parameters is None or theta not in parameters:
+                    raise ValueError(f"{name.upper()} gate at index {i} has unbound parameter '{theta}'")
+                matrix = np.stack([ROTATION_MATRICES[name](t) for t in parameters[theta]])
+            elif isinstance(theta, bool) or not isinstance(theta, numbers.Real) or not math.isfinite(theta):
+                raise ValueError(f"{name.upper()} gate at index {i} has invalid parameter {theta!r}")
+            else:
+                matrix = ROTATION_MATRICES[name](float(theta))
+        else:
+            matrix = SINGLE_QUBIT_MATRICES.get(name)
+        ops.append((name, qubits, matrix))
+
+    return ops, measured
+
+
+def _drop_trailing_diagonals(ops: list[tuple], num_qubits: int) -> list[tuple]:
+    """Remove diagonal ops that only have diagonal ops after them on their qubits."""
+    tail_diagonal = [True] * num_qubits
+    keep = [True] * len(ops)
+    for i in range(len(ops) - 1, -1, -1):
+        name, qubits, matrix = ops[i]
+        diagonal = name == "cz" or (matrix is not None and _is_diagonal(matrix))
+        if diagonal and all(tail_diagonal[q] for q in qubits):
+            keep[i] = False
+        elif not diagonal:
+            for q in qubits:
+                tail_diagonal[q] = False
+    return [op for op, k in zip(ops, keep) if k]
+
+
+def evolve(gates: list[dict], num_qubits: int) -> tuple[_Statevector, dict[int, int]]:
+    """
+    Apply the circuit's unitary part to |0...0>. Trailing diagonal gates are
+    skipped, so only the outcome probabilities (not the phases) are exact.
+
+    Returns:
+        (statevector, {clbit: qubit})
+    """
+    ops, measured = parse_gates(gates, num_qubits)
+    return _evolve_ops(ops, num_qubits), measured
+
+
+def _evolve_ops(ops: list[tuple], num_qubits: int) -> _Statevector:
+    if num_qubits > MAX_QUBITS:
+        raise ValueError(f"local_simulator statevector supports at most {MAX_QUBITS} qubits, got {num_qubits}")
+
+    ops = _drop_trailing_diagonals(ops, num_qubits)
+
+    # Single-qubit prefix of each qubit -> product state factors
+    factors = [np.array([1, 0], dtype=complex) for _ in range(num_qubits)]
+    entangled = [False] * num_qubits
+    body = []
+    for op in ops:
+        name, qubits, matrix = op
+        if matrix is not None and not entangled[qubits[0]]:
+            factor = factors[qubits[0]]
+            if matrix.ndim == 2 and factor.ndim == 1:
+                factors[qubits[0]] = matrix @ factor
+            else:
+                factors[qubits[0]] = np.einsum("...ij,...j->...i", matrix, factor)
+            continue
+        for q in qubits:
+            entangled[q] = True
+        body.append(op)
+
+    sv = _Statevector.product(factors)
+
+    # Fuse consecutive single-qubit ops per qubit; flush before any two-qubit op touching it
+    pending: dict[int, np.ndarray] = {}
+    for name, qubits, matrix in body:
+        if matrix is not None:
+            q = qubits[0]
+            pending[q] = matrix @ pending[q] if q in pending else matrix
+            continue
+        for q in qubits:
+            if q in pending:
+                sv.apply_1q(pending.pop(q), q)
+        getattr(sv, name)(*qubits)
+    for q, matrix in pending.items():
+        sv.apply_1q(matrix, q)
+
+    return sv
+
+
+def sample_counts(probabilities: np.ndarray, measured: dict[int, int], num_clbits: int, shots: int, rng: np.random.Generator) -> dict[str, int]:
+    """
+    Draw all shots at once from a 2^n probability vector (inverse-CDF sampling, i.e.
+    one multinomial draw) and marginalize onto the classical bits.
+    """
+    cdf = np.cumsum(probabilities)
+    outcomes = np.searchsorted(cdf, rng.random(shots) * cdf[-1], side="right")
+    np.minimum(outcomes, len(probabilities) - 1, out=outcomes)
+
+    keys = np.zeros(outcomes.shape, dtype=np.int64)
+    for clbit, qubit in measured.items():
+        keys |= ((outcomes >> qubit) & 1) << clbit
+
+    unique, totals = np.unique(keys, return_counts=True)
+    return {format(int(k), f"0{num_clbits}b"): int(n) for k, n in zip(unique, totals)}
+
+
+def get_local_results(gates: list[dict], num_qubits: int, num_clbits: int, shots: int = 1000, seed: int = None, method: str = None):
+    """
+    Simulate the gate list locally and return the unified result dict.
+
+    Args:
+        method: 'stabilizer' or 'statevector'; by default Clifford-only circuits
+                use the stabilizer tableau and everything else the statevector
+    """
+    start = time.perf_counter()
+    ops, measured = parse_gates(gates, num_qubits, num_clbits=num_clbits)
+    rng = np.random.default_rng(seed)
+    if method is None:
+        method = "stabilizer" if is_clifford(gates) else "statevector"
+    if method == "stabilizer":
+        if not is_clifford(gates):
+            raise ValueError("The stabilizer method only supports Clifford gates")
+        counts = sample_clifford(ops, measured, num_qubits, num_clbits, shots, rng)
+    elif method == "statevector":
+        sv = _evolve_ops(ops, num_qubits)
+        counts = sample_counts(sv.probabilities()[0], measured, num_clbits, shots, rng)
+    else:
+        raise ValueError(f"Unknown local simulation method '{method}'")
+
+    return {
+        "provider": "local",
+        "backend_name": LOCAL_SIMULATOR,
+        "simulation_method": method,
+        "simulation_time_s": time.perf_counter() - start,
+        "shots": shots,
+        "n_qubits": num_qubits,
+        "counts": counts,
+        "probabilities": {k: v / shots for k, v in counts.items()},
+    }
+
+
+def get_local_sweep_results(gates: list[dict], num_qubits: int, num_clbits: int, shots: int, parameters: dict[str, list[float]], seed: int = None):
+    """
+    Simulate every point of a sweep on the statevector batch axis.
+
+    Args:
+        parameters: Values of each named parameter, all lists the same length (one per point)
+
+    Returns:
+        One unified result dict per point
+    """
+    start = time.perf_counter()
+    values = {name: np.asarray(v, dtype=float) for name, v in parameters.items()}
+    num_points = len(next(iter(values.values()))) if values else 1
+    # Points evolved together are capped at the memory of one MAX_QUBITS state
+    chunk = max(1, (1 << MAX_QUBITS) >> num_qubits)
+    rng = np.random.default_rng(seed)
+
+    counts = []
+    for lo in range(0, num_points, chunk):
+        ops, measured = parse_gates(gates, num_qubits, {name: v[lo:lo + chunk] for name, v in values.items()}, num_clbits)
+        probabilities = _evolve_ops(ops, num_qubits).probabilities()
+        size = min(chunk, num_points - lo)
+        for i in range(size):
+            counts.append(sample_counts(probabilities[i if len(probabilities) > 1 else 0], measured, num_clbits, shots, rng))
+
+    elapsed = time.perf_counter() - start
+    return [
+        {
+            "provider": "local",
+            "backend_name": LOCAL_SIMULATOR,
+            "simulation_method": "statevector",
+            "simulation_time_s": elapsed,
+            "shots": shots,
+            "n_qubits": num_qubits,
+            "counts": point_counts,
+            "probabilities": {k: v / shots for k, v in point_counts.items()},
+        }
+        for point_counts in counts
+    ]
@@ -0,0 +1,102 @@
+"""
+Small thread-safe LRU cache with optional TTL, shared by the backend's caches.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Args:
+        max_entries: Least recently used entries are evicted beyond this size
+        ttl_s: Default time-to-live for entries (None = never expire)
+        max_bytes: Also evict beyond this total size (None = no limit)
+        sizeof: Size of a value in bytes, used with max_bytes
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_s: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = len,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof if max_bytes is not None else (lambda value: 0)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at, size = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.bytes -= size
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, ttl_s: Optional[float] = None):
+        """Insert or refresh key. ttl_s overrides the cache's default TTL for this entry."""
+        ttl = self.ttl_s if ttl_s is None else ttl_s
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Never worth evicting everything else for one oversized value
+                return
+            self._data[key] = (value, expires_at, size)
+            self.bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self.bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, hit/miss/eviction counters and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
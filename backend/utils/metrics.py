@@ -0,0 +1,152 @@
+"""
+Per-stage timing of runs and Prometheus-style histograms served from GET /metrics.
+
+send_circuit opens a record_stages() scope; code anywhere below it (provider
+helpers, transpile cache, compile pool calls) wraps its work in stage(name) and
+the time is added to the run's timings. Nothing is recorded outside a scope, so
+the helpers can be called on their own as before. The timings are stored on the
+run_results document as stage_timings_s and observed into STAGE_SECONDS,
+labeled by stage, provider and backend. Histograms are per process.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Stages, in pipeline order
+USER_INFO = "user_info"
+OPTIMIZE = "optimize"
+CREATE_CIRCUIT = "create_circuit"
+TRANSPILE = "transpile"
+PROVIDER_SUBMIT = "provider_submit"
+PROVIDER_QUEUE = "provider_queue"
+PROVIDER_EXECUTION = "provider_execution"
+# Queue + execution, for providers that don't report how long the job ran
+PROVIDER_WAIT = "provider_wait"
+NORMALIZE = "normalize"
+STORAGE_WRITE = "storage_write"
+
+# From a fast Firestore write to a long provider queue
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600)
+
+_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def record_stages() -> Iterator[Dict[str, float]]:
+    """Collect stage durations (seconds, summed per stage) for the code run inside the block."""
+    timings: Dict[str, float] = {}
+    token = _stages.set(timings)
+    try:
+        yield timings
+    finally:
+        _stages.reset(token)
+
+
+def add_stage(name: str, seconds: float):
+    timings = _stages.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage(name, time.perf_counter() - start)
+
+
+def add_provider_wait(wait_s: float, execution_s: Optional[float]):
+    """
+    Split the wait for a provider job's result into queue and execution time, using
+    the execution time reported by the provider (None or not finite if unknown).
+    """
+    if execution_s is None or not math.isfinite(execution_s) or execution_s < 0:
+        add_stage(PROVIDER_WAIT, wait_s)
+        return
+    execution_s = min(execution_s, wait_s)
+    add_stage(PROVIDER_QUEUE, wait_s - execution_s)
+    add_stage(PROVIDER_EXECUTION, execution_s)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(float(value))
+
+
+class Histogram:
+    """
+    Args:
+        name: Metric name
+        help: Description shown in /metrics
+        label_names: Names of the labels every observation carries
+        buckets: Upper bounds in ascending order (+Inf is added)
+    """
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        # labels -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            counts, total, n = self._series.get(labels) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._series[labels] = (counts, total + value, n + 1)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """[{'labels': {...}, 'count': n, 'sum': seconds}] for every label set observed."""
+        with self._lock:
+            series = sorted((labels, s, n) for labels, (_, s, n) in self._series.items())
+        return [{"labels": dict(zip(self.label_names, labels)), "count": n, "sum": s} for labels, s, n in series]
+
+    def render(self) -> List[str]:
+        """Prometheus text exposition lines."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(c), s, n)) for labels, (c, s, n) in self._series.items())
+        for labels, (counts, total, n) in series:
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_str},le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_str}}} {total!r}")
+            lines.append(f"{self.name}_count{{{label_str}}} {n}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "qubi_run_stage_seconds",
+    "Time spent in each stage of a run.",
+    ("stage", "provider", "backend"),
+)
+RUN_SECONDS = Histogram(
+    "qubi_run_seconds",
+    "Time from the start of execution to the stored result.",
+    ("provider", "backend", "success"),
+)
+
+
+def observe_run(timings: Dict[str, float], elapsed_s: float, provider: str, backend: str, success: bool):
+    for name, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, name, provider, backend)
+    RUN_SECONDS.observe(elapsed_s, provider, backend, "true" if success else "false")
+
+
+def render_metrics() -> str:
+    return "\n".join(STAGE_SECONDS.render() + RUN_SECONDS.render()) + "\n"
@@ -0,0 +1,226 @@
+"""
+Gate list optimizer run before a circuit is built and sent to a provider.
+
+Users' circuits often contain gates that cancel (h h, x x, cx cx, t tdg),
+rotations that can be merged (rz rz) and gates whose result is never measured.
+Each one costs provider time, and on IonQ money. optimize_gates() removes them
+without changing the measured distribution:
+
+  - A forward pass keeps, for every qubit, a stack of the kept gates acting on
+    it. A gate is compared with the top of its qubits' stacks only: a
+    self-inverse gate on the same qubits cancels it, and diagonal phase gates
+    (z, s, sdg, t, tdg, rz) or same-axis rotations (rx, ry) on the same qubit
+    merge into one gate. Removing a gate exposes the one below it, so nested
+    pairs like h x x h cancel completely.
+  - A backward sweep drops gates after which none of their qubits is measured
+    (directly or through a later gate), e.g. everything after the final
+    measurement. Circuits without any measurement are left alone, since some
+    providers then measure every qubit.
+
+Both passes are linear in the number of gates. Results are equal up to global
+phase. Measurements are barriers, and gates the optimizer doesn't know or
+whose params are names bound later (sweeps) are kept as they are. A rotation
+angle that isn't a finite real number, bools included (JSON true + true would
+merge into rz(2)), leaves the whole list unchanged for create_circuit() to reject.
+"""
+import math
+import numbers
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from utils.canonical_circuit import normalize_qubits
+
+load_dotenv()
+
+# Set OPTIMIZE_CIRCUITS=0 to send circuits exactly as submitted
+ENABLED = os.getenv("OPTIMIZE_CIRCUITS", "1") != "0"
+
+SELF_INVERSE = {"h", "x", "y", "z", "cx", "cz", "swap", "ccx"}
+
+# Diagonal gates as Z rotations, up to global phase
+PHASE_ANGLES = {"z": math.pi, "s": math.pi / 2, "sdg": -math.pi / 2, "t": math.pi / 4, "tdg": -math.pi / 4}
+_NAMED_PHASES = sorted(PHASE_ANGLES.items(), key=lambda item: item[1])
+ROTATIONS = {"rx", "ry", "rz"}
+
+_EPS = 1e-9
+
+
+def _normalize(angle: float) -> float:
+    """angle in (-pi, pi]."""
+    angle = math.remainder(angle, 2 * math.pi)
+    return math.pi if angle <= -math.pi + _EPS else angle
+
+
+def _angle(param: Any) -> float:
+    if isinstance(param, bool) or not isinstance(param, numbers.Real) or not math.isfinite(param):
+        raise ValueError(f"Invalid rotation angle {param!r}")
+    return param
+
+
+def _phase_angle(gate: Dict[str, Any]) -> Optional[float]:
+    name = gate["name"]
+    if name == "rz":
+        return gate["params"][0]
+    return PHASE_ANGLES.get(name)
+
+
+def _phase_gate(qubit: int, angle: float) -> Optional[Dict[str, Any]]:
+    """The simplest gate rotating qubit by angle about Z (None for the identity)."""
+    angle = _normalize(angle)
+    if abs(angle) < _EPS:
+        return None
+    for name, named in _NAMED_PHASES:
+        if abs(angle - named) < _EPS:
+            return {"name": name, "qubits": [qubit]}
+    return {"name": "rz", "qubits": [qubit], "params": [angle]}
+
+
+def _symbolic(gate: Dict[str, Any]) -> bool:
+    return any(type(p) is str for p in gate.get("params") or ())
+
+
+def _same_qubits(name: str, a: List[int], b: List[int]) -> bool:
+    return a == b or normalize_qubits(name, a) == normalize_qubits(name, b)
+
+
+def _advance(levels: List[int], wires: List[int]) -> int:
+    """Place one instruction on wires; returns its layer (1-based)."""
+    if len(wires) == 1:
+        level = levels[wires[0]] + 1
+        levels[wires[0]] = level
+        return level
+    level = max([levels[w] for w in wires]) + 1
+    for w in wires:
+        levels[w] = level
+    return level
+
+
+def _measure_layers(levels: List[int], gate: Dict[str, Any], num_qubits: int) -> Tuple[int, int]:
+    """Place a measure's (qubit, clbit) pairs; returns (instructions, deepest layer)."""
+    depth = 0
+    for q, c in zip(gate["qubits"], gate["clbits"]):
+        depth = max(depth, _advance(levels, [q, num_qubits + c]))
+    return len(gate["qubits"]), depth
+
+
+def count_and_depth(gates: List[Dict[str, Any]], num_qubits: int, num_clbits: int) -> Tuple[int, int]:
+    """
+    Instruction count and depth as qiskit reports them for the built circuit
+    (a measure over k qubits counts as k instructions).
+    """
+    levels = [0] * (num_qubits + num_clbits)
+    size = depth = 0
+    for gate in gates:
+        if gate["name"] == "measure":
+            count, level = _measure_layers(levels, gate, num_qubits)
+            size += count
+        else:
+            level = _advance(levels, gate["qubits"])
+            size += 1
+        if level > depth:
+            depth = level
+    return size, depth
+
+
+def _cancel_and_merge(gates: List[Dict[str, Any]], num_qubits: int) -> List[Optional[Dict[str, Any]]]:
+    out: List[Optional[Dict[str, Any]]] = []
+    stacks: List[List[int]] = [[] for _ in range(num_qubits)]
+
+    def push(gate):
+        for q in gate["qubits"]:
+            stacks[q].append(len(out))
+        out.append(gate)
+
+    def pop(i):
+        for q in out[i]["qubits"]:
+            stacks[q].pop()
+        out[i] = None
+
+    for gate in gates:
+        name, qubits = gate["name"], gate["qubits"]
+        for q in qubits:
+            if type(q) is not int or not 0 <= q < num_qubits:
+                raise ValueError(f"Invalid qubit {q}")
+        if name == "measure":
+            push(gate)
+            continue
+        if name in ROTATIONS and not _symbolic(gate):
+            _angle(gate["params"][0])
+
+        if len(qubits) == 1:
+            stack = stacks[qubits[0]]
+            prev_i = stack[-1] if stack else None
+        else:
+            tops = {stacks[q][-1] if stacks[q] else None for q in qubits}
+            prev_i = tops.pop() if len(tops) == 1 else None
+        if prev_i is None:
+            push(gate)
+            continue
+        prev = out[prev_i]
+        prev_name = prev["name"]
+        if len(prev["qubits"]) != len(qubits) or _symbolic(gate) or _symbolic(prev):
+            push(gate)
+            continue
+
+        if len(qubits) == 1 and (name in PHASE_ANGLES or name == "rz") and (prev_name in PHASE_ANGLES or prev_name == "rz"):
+            merged = _phase_gate(qubits[0], _phase_angle(prev) + _phase_angle(gate))
+            pop(prev_i)
+            if merged is not None:
+                push(merged)
+        elif name == prev_name and name in ROTATIONS:
+            pop(prev_i)
+            angle = _normalize(prev["params"][0] + gate["params"][0])
+            if abs(angle) >= _EPS:
+                push({"name": name, "qubits": list(qubits), "params": [angle]})
+        elif name == prev_name and name in SELF_INVERSE and _same_qubits(name, prev["qubits"], qubits):
+            pop(prev_i)
+        else:
+            push(gate)
+    return out
+
+
+def _drop_unmeasured(out: List[Optional[Dict[str, Any]]], num_qubits: int):
+    """Remove, in place, gates that nothing measured afterwards depends on."""
+    live = [False] * num_qubits
+    for i in range(len(out) - 1, -1, -1):
+        gate = out[i]
+        if gate is None:
+            continue
+        qubits = gate["qubits"]
+        if gate["name"] == "measure":
+            for q in qubits:
+                live[q] = True
+        elif len(qubits) == 1:
+            if not live[qubits[0]]:
+                out[i] = None
+        elif any([live[q] for q in qubits]):
+            for q in qubits:
+                live[q] = True
+        else:
+            out[i] = None
+
+
+def optimize_gates(gates: List[Dict[str, Any]], num_qubits: int, num_clbits: int) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, int]]]:
+    """
+    Returns:
+        (optimized gate list, {'gates_before', 'gates_after', 'depth_before', 'depth_after'}).
+        A gate list the optimizer can't read is returned unchanged with None,
+        for create_circuit() to report.
+    """
+    try:
+        size_before, depth_before = count_and_depth(gates, num_qubits, num_clbits)
+        out = _cancel_and_merge(gates, num_qubits)
+        if any(gate is not None and gate["name"] == "measure" for gate in out):
+            _drop_unmeasured(out, num_qubits)
+        optimized = [gate for gate in out if gate is not None]
+        size_after, depth_after = count_and_depth(optimized, num_qubits, num_clbits)
+    except (KeyError, IndexError, TypeError, ValueError):
+        return gates, None
+    return optimized, {
+        "gates_before": size_before,
+        "gates_after": size_after,
+        "depth_before": depth_before,
+        "depth_after": depth_after,
+    }
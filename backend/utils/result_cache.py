@@ -0,0 +1,137 @@
+"""
+Opt-in result cache for simulator runs, keyed by (circuit_id, quantum_computer, shots).
+
+Two tiers: an in-process LRU in front of a persistent SQLite table, both with
+a TTL. Only quantum_computers listed in RESULT_CACHE_BACKENDS are cached, and
+a result is only stored if the backend that produced it is a simulator, so
+results from real QPUs are never reused.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from dotenv import load_dotenv
+
+from utils.lru import LRUCache
+
+load_dotenv()
+
+DEFAULT_TTL_S = 3600.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_ROWS = 50000
+
+# Purge expired/overflowing persistent rows once every this many writes
+_PURGE_EVERY = 100
+
+
+def is_simulator(backend_name: str) -> bool:
+    return "simulator" in (backend_name or "").lower()
+
+
+class ResultCache:
+    """
+    Args:
+        backends: quantum_computer names (e.g. 'ionq', 'ionq_simulator') that may be served from cache
+        path: SQLite file for the persistent tier (None = in-process only)
+        ttl_s: How long a cached result stays valid
+        max_entries: Size of the in-process LRU tier
+        max_rows: Size limit of the persistent tier
+    """
+
+    def __init__(
+        self,
+        backends: Iterable[str],
+        path: Optional[str] = None,
+        ttl_s: float = DEFAULT_TTL_S,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_rows: int = DEFAULT_MAX_ROWS,
+    ):
+        self.backends = set(backends)
+        self.ttl_s = ttl_s
+        self.max_rows = max_rows
+        self._memory = LRUCache(max_entries=max_entries, ttl_s=ttl_s)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.disk_hits = 0
+        self._conn = None
+        if path and self.backends:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """
+        Build a cache from RESULT_CACHE_BACKENDS (comma separated, empty = disabled),
+        RESULT_CACHE_PATH, RESULT_CACHE_TTL_S and RESULT_CACHE_MAX_ENTRIES.
+        """
+        backends = [b.strip() for b in os.getenv("RESULT_CACHE_BACKENDS", "").split(",") if b.strip()]
+        return cls(
+            backends,
+            path=os.getenv("RESULT_CACHE_PATH", "result_cache.sqlite3"),
+            ttl_s=float(os.getenv("RESULT_CACHE_TTL_S", DEFAULT_TTL_S)),
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        )
+
+    def enabled_for(self, quantum_computer: str) -> bool:
+        return quantum_computer in self.backends
+
+    @staticmethod
+    def _key(circuit_id: str, quantum_computer: str, shots: int) -> str:
+        return f"{circuit_id}:{quantum_computer}:{shots}"
+
+    def get(self, circuit_id: str, quantum_computer: str, shots: int) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached provider result, or None."""
+        if not self.enabled_for(quantum_computer):
+            return None
+        key = self._key(circuit_id, quantum_computer, shots)
+        value = self._memory.get(key)
+        if value is None and self._conn is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None and row[1] > time.time():
+                value = row[0]
+                self._memory.put(key, value, ttl_s=row[1] - time.time())
+                self.disk_hits += 1
+        return json.loads(value) if value is not None else None
+
+    def put(self, circuit_id: str, quantum_computer: str, shots: int, result: Dict[str, Any]):
+        """
+        Store a provider result (the unified dict from get_circuit_results).
+        Results whose backend_name is not a simulator are never stored.
+        """
+        if not self.enabled_for(quantum_computer) or not is_simulator(result.get("backend_name")):
+            return
+        key = self._key(circuit_id, quantum_computer, shots)
+        value = json.dumps(result)
+        self._memory.put(key, value)
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl_s),
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                self._purge()
+
+    def _purge(self):
+        self._conn.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._memory.stats()
+        stats.update({"backends": sorted(self.backends), "disk_hits": self.disk_hits})
+        return stats
@@ -0,0 +1,139 @@
+"""
+In-process pub/sub of run_request status transitions (PENDING -> RUNNING -> COMPLETED or FAILED).
+
+Writers (main.py, quantum.py, firebase_rw.add_results) publish every status they
+write to Firestore; GET /results/stream/{run_request_id} subscribes and pushes
+them to the client as Server-Sent Events, so waiting clients cost no Firestore
+reads. Publishing is thread-safe and may be called from the execution workers;
+subscribers live on the API's event loop.
+"""
+import asyncio
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from dotenv import load_dotenv
+
+from utils.lru import LRUCache
+
+load_dotenv()
+
+TERMINAL_STATUSES = {"COMPLETED", "FAILED", "REJECTED"}
+
+DEFAULT_KEEPALIVE_S = 15.0
+# Streams re-read Firestore this often in case the run executes in another process
+DEFAULT_RECHECK_S = 30.0
+
+
+class RunEventBus:
+    """
+    Args:
+        max_runs: How many runs' latest event is remembered for late subscribers
+        ttl_s: How long a run's latest event is remembered
+    """
+
+    def __init__(self, max_runs: int = 10000, ttl_s: float = 3600.0):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._latest = LRUCache(max_entries=max_runs, ttl_s=ttl_s)
+        self.published = 0
+        self.delivered = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Attach the event loop the subscribers run on (called at app startup)."""
+        self._loop = loop
+
+    def publish(self, run_request_id: str, status: str, **data: Any):
+        """Record and broadcast a status transition. Safe to call from any thread."""
+        event = {"run_request_id": run_request_id, "status": status, **data}
+        self._latest.put(run_request_id, event)
+        with self._lock:
+            self.published += 1
+            queues = list(self._subscribers.get(run_request_id, ()))
+            self.delivered += len(queues)
+        if not queues or self._loop is None or self._loop.is_closed():
+            return
+        for queue in queues:
+            self._loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def latest(self, run_request_id: str) -> Optional[Dict[str, Any]]:
+        return self._latest.get(run_request_id)
+
+    def subscribe(self, run_request_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(run_request_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, run_request_id: str, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(run_request_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[run_request_id]
+
+    async def stream(
+        self,
+        run_request_id: str,
+        load_state: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        keepalive_s: float = DEFAULT_KEEPALIVE_S,
+        recheck_s: float = DEFAULT_RECHECK_S,
+    ) -> AsyncIterator[str]:
+        """
+        Server-Sent Events for one run, ending after a terminal status.
+
+        Args:
+            load_state: Async read of the run's current event from Firestore (None if it doesn't exist);
+                        used only when this process hasn't seen the run, and every recheck_s
+        """
+        queue = self.subscribe(run_request_id)
+        try:
+            event = self.latest(run_request_id)
+            if event is None:
+                event = await load_state()
+                if event is None:
+                    yield _sse("error", {"run_request_id": run_request_id, "status": "NOT_FOUND"})
+                    return
+            last_status = event["status"]
+            yield _sse("status", event)
+
+            loop = asyncio.get_running_loop()
+            last_check = loop.time()
+            while last_status not in TERMINAL_STATUSES:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive_s)
+                except asyncio.TimeoutError:
+                    if loop.time() - last_check < recheck_s:
+                        yield ": keep-alive\n\n"
+                        continue
+                    last_check = loop.time()
+                    event = await load_state()
+                    if event is None or event["status"] == last_status:
+                        yield ": keep-alive\n\n"
+                        continue
+                if event["status"] == last_status:
+                    continue
+                last_status = event["status"]
+                yield _sse("status", event)
+        finally:
+            self.unsubscribe(run_request_id, queue)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "streams": sum(len(q) for q in self._subscribers.values()),
+                "published": self.published,
+                "delivered": self.delivered,
+            }
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+run_events = RunEventBus(
+    max_runs=int(os.getenv("RUN_EVENTS_MAX_RUNS", 10000)),
+)
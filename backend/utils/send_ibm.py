@@ -1,19 +1,29 @@
 import os
+import time
+from datetime import datetime
+import numpy as np
 from dotenv import load_dotenv
-from qiskit import QuantumCircuit, transpile
+from qiskit import QuantumCircuit
 from qiskit_ibm_runtime import QiskitRuntimeService, SamplerV2 as Sampler
 from qiskit_ibm_runtime.accounts.exceptions import AccountAlreadyExistsError
 
+from utils.metrics import NORMALIZE, PROVIDER_SUBMIT, TRANSPILE, add_provider_wait, stage
+from utils.transpile_cache import TranspileCache
+
 load_dotenv()
 
+# Transpiled circuits are reused across requests, see TRANSPILE_CACHE_DIR
+transpile_cache = TranspileCache.from_env()
+
 
-def get_ibm_results(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "simulator_stabilizer", api_token: str = None):
+def get_ibm_results(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "simulator_stabilizer", api_token: str = None, backend=None):
 
     try:
-        result, backend_name_final = send_to_ibm(circuit, shots, backend_name, api_token)
+        result, backend_name_final = send_to_ibm(circuit, shots, backend_name, api_token, backend=backend)
         
-        counts = get_counts_from_primitive_result(result)
-        probabilities = {k: v / shots for k, v in counts.items()}
+        with stage(NORMALIZE):
+            counts = get_counts_from_primitive_result(result)
+            probabilities = {k: v / shots for k, v in counts.items()}
         
         print(f"\nResults from IBM {backend_name} ({shots} shots):")
         print("=" * 50)
@@ -36,8 +46,10 @@ def get_ibm_results(circuit: QuantumCircuit, shots: int = 1000, backend_name: st
         print(f"Error sending circuit to IBM: {e}")
         return None
 
-def send_to_ibm(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "default", api_token: str = None):
-
+def get_ibm_backend(api_token: str = None):
+    """
+    Connect to IBM Quantum with api_token and return the least busy operational backend.
+    """
     try:
         if not api_token:
             raise Exception("IBM_API_TOKEN environment variable not set. Please set it in your .env file.")
@@ -51,30 +63,139 @@ def send_to_ibm(circuit: QuantumCircuit, shots: int = 1000, backend_name: str =
     
     # may be the cause of the error:
     # Error sending circuit to IBM: 'No matching instances found for the following filters: .'
-    backend = service.least_busy(operational=True, simulator=False)
-    transpiled_qc = transpile(circuit, backend=backend, optimization_level=3)
+    return service.least_busy(operational=True, simulator=False)
 
-    sampler = Sampler(backend)
-    job = sampler.run([transpiled_qc])
+def send_to_ibm(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "default", api_token: str = None, backend=None):
+    """
+    Args:
+        backend: Backend to run on (e.g. from the client pool in utils/send_qc.py);
+                 looked up with get_ibm_backend(api_token) if not given
+    """
+    if backend is None:
+        backend = get_ibm_backend(api_token)
+    with stage(TRANSPILE):
+        transpiled_qc = transpile_cache.transpile([circuit], backend, optimization_level=3)[0]
 
-    result = job.result()
+    result = _run_sampler_job(backend, [transpiled_qc])
 
     return result, backend.name
 
-def get_counts_from_primitive_result(result):
-    pub_result = result[0]
+def _run_sampler_job(backend, pubs):
+    """Submit a Sampler job and wait for its result, timing submission, queueing and execution."""
+    with stage(PROVIDER_SUBMIT):
+        job = Sampler(backend).run(pubs)
+    wait_start = time.perf_counter()
+    result = job.result()
+    add_provider_wait(time.perf_counter() - wait_start, _execution_seconds(job))
+    return result
+
+def _execution_seconds(job):
+    """Seconds the job ran on the backend, from its running/finished timestamps (None if unavailable)."""
+    try:
+        timestamps = job.metrics().get("timestamps") or {}
+        running = datetime.fromisoformat(timestamps["running"].replace("Z", "+00:00"))
+        finished = datetime.fromisoformat(timestamps["finished"].replace("Z", "+00:00"))
+        return (finished - running).total_seconds()
+    except Exception:
+        return None
+
+def get_ibm_results_batch(circuits: list[QuantumCircuit], shots: list[int], backend_name: str = "simulator_stabilizer", api_token: str = None, backend=None):
+    """
+    Run several circuits as one Sampler job (one PUB per circuit).
+
+    Args:
+        circuits: Circuits to run
+        shots: Shots for each circuit (same length as circuits)
+        backend: Backend to run on; looked up with get_ibm_backend(api_token) if not given
+
+    Returns:
+        A list with one unified result dict per circuit, or None if the job failed
+    """
+    try:
+        if backend is None:
+            backend = get_ibm_backend(api_token)
+        with stage(TRANSPILE):
+            transpiled = transpile_cache.transpile(circuits, backend, optimization_level=3)
+
+        result = _run_sampler_job(backend, [(qc, None, n) for qc, n in zip(transpiled, shots)])
+
+        unified = []
+        with stage(NORMALIZE):
+            for i, (circuit, n) in enumerate(zip(circuits, shots)):
+                counts = get_counts_from_primitive_result(result, i)
+                unified.append({
+                    "provider": "ibm",
+                    "backend_name": backend.name,
+                    "shots": n,
+                    "n_qubits": circuit.num_qubits,
+                    "counts": counts,
+                    "probabilities": {k: v / n for k, v in counts.items()},
+                })
+        return unified
+
+    except Exception as e:
+        print(f"Error sending circuit batch to IBM: {e}")
+        return None
+
+def get_ibm_sweep_results(circuit: QuantumCircuit, parameters: dict[str, list[float]], shots: int = 1000, backend_name: str = "simulator_stabilizer", api_token: str = None, backend=None):
+    """
+    Run every point of a sweep as one Sampler job: the parameterized circuit is
+    transpiled once and sent as a single PUB with one row of values per point.
+
+    Args:
+        circuit: Circuit with qiskit Parameters named like the keys of parameters
+        parameters: Values of each parameter, all lists the same length
+
+    Returns:
+        A list with one unified result dict per point, or None if the job failed
+    """
+    try:
+        if backend is None:
+            backend = get_ibm_backend(api_token)
+        with stage(TRANSPILE):
+            transpiled = transpile_cache.transpile([circuit], backend, optimization_level=3)[0]
+
+        num_points = len(next(iter(parameters.values())))
+        # Columns in the order of transpiled.parameters; parameters the transpiler removed are dropped
+        values = np.array([parameters[p.name] for p in transpiled.parameters], dtype=float).reshape(-1, num_points).T
+        result = _run_sampler_job(backend, [(transpiled, values, shots)])
+
+        unified = []
+        with stage(NORMALIZE):
+            for i in range(num_points):
+                counts = get_counts_from_primitive_result(result, 0, loc=i)
+                unified.append({
+                    "provider": "ibm",
+                    "backend_name": backend.name,
+                    "shots": shots,
+                    "n_qubits": circuit.num_qubits,
+                    "counts": counts,
+                    "probabilities": {k: v / shots for k, v in counts.items()},
+                })
+        return unified
+
+    except Exception as e:
+        print(f"Error sending sweep to IBM: {e}")
+        return None
+
+def get_counts_from_primitive_result(result, index: int = 0, loc: int = None):
+    """
+    Args:
+        loc: Point of a swept PUB to read (None for an unswept PUB)
+    """
+    pub_result = result[index]
     data = pub_result.data
 
     counts = None
     for reg_name in ('c', 'meas'):
         if hasattr(data, reg_name):
-            counts = getattr(data, reg_name).get_counts()
+            counts = getattr(data, reg_name).get_counts(loc)
             break
     else:
         for attr_name in (a for a in dir(data) if not a.startswith('_')):
             attr = getattr(data, attr_name)
             if hasattr(attr, 'get_counts'):
-                counts = attr.get_counts()
+                counts = attr.get_counts(loc)
                 break
 
     if counts is None:
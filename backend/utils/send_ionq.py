@@ -1,4 +1,5 @@
 import os
+import time
 import warnings
 from dotenv import load_dotenv
 
@@ -6,26 +7,29 @@ from qiskit import QuantumCircuit
 from qiskit_ionq import IonQProvider
 from qiskit_ionq.exceptions import IonQTranspileLevelWarning
 
+from utils.metrics import NORMALIZE, PROVIDER_SUBMIT, add_provider_wait, stage
+
 load_dotenv()
 
 warnings.filterwarnings('ignore', category=IonQTranspileLevelWarning)
 
-def get_ionq_results(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "ionq_simulator", api_token: str = None):
+def get_ionq_results(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "ionq_simulator", api_token: str = None, backend=None):
     try:
-        result = send_to_ionq(circuit, shots, backend_name, api_token)
-        counts = result.get_counts()
-        probabilities = result.get_probabilities()
-        quantum_computer_type = 'ionq'
-        quantum_computer_name = backend_name
-
-        unified = {
-            "provider": quantum_computer_type,
-            "backend_name": quantum_computer_name,
-            "shots": shots,
-            "n_qubits": circuit.num_qubits,
-            "counts": counts,
-            "probabilities": probabilities,
-        }
+        result = send_to_ionq(circuit, shots, backend_name, api_token, backend=backend)
+        with stage(NORMALIZE):
+            counts = result.get_counts()
+            probabilities = result.get_probabilities()
+            quantum_computer_type = 'ionq'
+            quantum_computer_name = backend_name
+
+            unified = {
+                "provider": quantum_computer_type,
+                "backend_name": quantum_computer_name,
+                "shots": shots,
+                "n_qubits": circuit.num_qubits,
+                "counts": counts,
+                "probabilities": probabilities,
+            }
 
         return unified
 
@@ -33,16 +37,64 @@ def get_ionq_results(circuit: QuantumCircuit, shots: int = 1000, backend_name: s
         print(f"Error sending circuit to IonQ: {e}")
         return None
 
-def send_to_ionq(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "ionq_simulator", api_token: str = None):
+def get_ionq_results_batch(circuits: list[QuantumCircuit], shots: int = 1000, backend_name: str = "ionq_simulator", api_token: str = None, backend=None):
+    """
+    Run several circuits with the same shot count as one IonQ multi-circuit job.
+
+    Args:
+        backend: Backend to run on; built from api_token and backend_name if not given
+
+    Returns:
+        A list with one unified result dict per circuit, or None if the job failed
+    """
+    try:
+        if backend is None:
+            backend = get_ionq_backend(backend_name, api_token)
+        result = _run_ionq_job(backend, circuits, shots)
+
+        unified = []
+        with stage(NORMALIZE):
+            for i, circuit in enumerate(circuits):
+                unified.append({
+                    "provider": "ionq",
+                    "backend_name": backend_name,
+                    "shots": shots,
+                    "n_qubits": circuit.num_qubits,
+                    "counts": result.get_counts(i),
+                    "probabilities": result.get_probabilities(i),
+                })
+        return unified
+
+    except Exception as e:
+        print(f"Error sending circuit batch to IonQ: {e}")
+        return None
+
+def _run_ionq_job(backend, circuits, shots: int):
+    """Submit a job and wait for its result, timing submission, queueing and execution."""
+    with stage(PROVIDER_SUBMIT):
+        job = backend.run(circuits, shots=shots)
+    wait_start = time.perf_counter()
+    result = job.result()
+    # The Result's time_taken is the execution time IonQ reports (inf if it gave none)
+    add_provider_wait(time.perf_counter() - wait_start, getattr(result, "time_taken", None))
+    return result
 
+def get_ionq_backend(backend_name: str = "ionq_simulator", api_token: str = None):
     if not api_token:
         raise ValueError("IONQ_API_TOKEN environment variable not set. Please set it in your .env file.")
-    
+
     provider = IonQProvider(token=api_token)
-    backend = provider.get_backend(backend_name)
-    job = backend.run(circuit, shots=shots)
+    return provider.get_backend(backend_name)
 
-    result = job.result()
+def send_to_ionq(circuit: QuantumCircuit, shots: int = 1000, backend_name: str = "ionq_simulator", api_token: str = None, backend=None):
+    """
+    Args:
+        backend: Backend to run on (e.g. from the client pool in utils/send_qc.py);
+                 built from api_token and backend_name if not given
+    """
+    if backend is None:
+        backend = get_ionq_backend(backend_name, api_token)
+    result = _run_ionq_job(backend, circuit, shots)
  
     print(f"\nResults from IonQ {backend_name} ({shots} shots):")
     print("=" * 50)
@@ -1,6 +1,18 @@
-from utils.send_ionq import get_ionq_results
-from utils.send_ibm import get_ibm_results
+import hashlib
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, List
+
+from dotenv import load_dotenv
+from utils.send_ionq import get_ionq_results, get_ionq_results_batch
+from utils.send_ibm import get_ibm_results, get_ibm_results_batch, get_ibm_sweep_results
+from utils.lru import LRUCache
+from utils.execution_engine import RetryableError
 from qiskit import QuantumCircuit
+from qiskit_ibm_runtime import QiskitRuntimeService
+from qiskit_ionq import IonQProvider
+
+load_dotenv()
 
 # circuit -> shots -> backend_name -> job results to send to firebase
 
@@ -14,14 +26,211 @@ from qiskit import QuantumCircuit
 # counts: {state: count}
 # probabilities: {state: probability}
 
+DEFAULT_CLIENT_TTL_S = 3600.0
+DEFAULT_BACKEND_TTL_S = 60.0
+
+# Locks per cache that concurrent lookups of the same key serialize on, shared by hash(key)
+LOCK_STRIPES = 64
+
+
+class ProviderClientPool:
+    """
+    Provider clients and backend handles shared across jobs, keyed by (provider, token hash).
+
+    Building a QiskitRuntimeService or IonQProvider and looking up a backend each cost
+    network round-trips, and save_account() wrote the IBM token to disk on every job.
+    Clients are kept for client_ttl_s; backend handles, including IBM's least-busy
+    choice, only for backend_ttl_s so the selection follows the queues.
+    """
+
+    def __init__(self, client_ttl_s: float = DEFAULT_CLIENT_TTL_S, backend_ttl_s: float = DEFAULT_BACKEND_TTL_S):
+        self._clients = LRUCache(max_entries=256, ttl_s=client_ttl_s)
+        self._backends = LRUCache(max_entries=1024, ttl_s=backend_ttl_s)
+        # Separate stripes per cache: a backend lookup builds its client under its own lock
+        self._client_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._backend_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    @classmethod
+    def from_env(cls) -> "ProviderClientPool":
+        """Build a pool from PROVIDER_CLIENT_TTL_S and PROVIDER_BACKEND_TTL_S."""
+        return cls(
+            client_ttl_s=float(os.getenv("PROVIDER_CLIENT_TTL_S", DEFAULT_CLIENT_TTL_S)),
+            backend_ttl_s=float(os.getenv("PROVIDER_BACKEND_TTL_S", DEFAULT_BACKEND_TTL_S)),
+        )
+
+    @staticmethod
+    def _key(provider: str, api_token: str) -> tuple:
+        # Tokens are only kept as hashes in the cache keys
+        return (provider, hashlib.sha256(api_token.encode()).hexdigest())
+
+    def _get_or_create(self, cache: LRUCache, locks: List[threading.Lock], key: Hashable, create: Callable[[], Any]) -> Any:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        # Concurrent jobs for the same token wait for a single lookup; a fixed set
+        # of locks, so one per token ever seen is never kept
+        with locks[hash(key) % len(locks)]:
+            value = cache.get(key)
+            if value is None:
+                value = create()
+                cache.put(key, value)
+        return value
+
+    @staticmethod
+    def _lookup(what: str, create: Callable[[], Any]) -> Callable[[], Any]:
+        """
+        Wrap a client or backend lookup so network and provider service errors raise
+        RetryableError and the engine retries the job. ValueErrors (bad input) pass through.
+        """
+        def lookup():
+            try:
+                return create()
+            except (ValueError, RetryableError):
+                raise
+            except Exception as e:
+                raise RetryableError(f"{what} failed: {e}") from e
+        return lookup
+
+    def client(self, provider: str, api_token: str):
+        """
+        Raises:
+            RetryableError: if the client can't be built, e.g. the provider is unreachable
+        """
+        if not api_token:
+            raise ValueError(f"No {provider} API token set for this user")
+        key = self._key(provider, api_token)
+        if provider == "ibm":
+            create = lambda: QiskitRuntimeService(channel="ibm_quantum_platform", token=api_token)
+        elif provider == "ionq":
+            create = lambda: IonQProvider(token=api_token)
+        else:
+            raise ValueError("Invalid quantum computer type")
+        return self._get_or_create(self._clients, self._client_locks, key, self._lookup(f"Connecting to {provider}", create))
+
+    def ibm_backend(self, api_token: str):
+        """
+        Least busy operational IBM QPU for this token.
+
+        Raises:
+            RetryableError: if the lookup fails, e.g. the service is unreachable
+        """
+        key = self._key("ibm", api_token) + ("least_busy",)
+        return self._get_or_create(
+            self._backends, self._backend_locks, key,
+            self._lookup("IBM least_busy", lambda: self.client("ibm", api_token).least_busy(operational=True, simulator=False)),
+        )
+
+    def ionq_backend(self, backend_name: str, api_token: str):
+        """
+        Raises:
+            RetryableError: if the lookup fails, e.g. the service is unreachable
+        """
+        key = self._key("ionq", api_token) + (backend_name,)
+        return self._get_or_create(
+            self._backends, self._backend_locks, key,
+            self._lookup(f"IonQ get_backend({backend_name})", lambda: self.client("ionq", api_token).get_backend(backend_name)),
+        )
+
+    def invalidate(self, provider: str, api_token: str, backend_name: str = "least_busy"):
+        """Drop a token's client and backend handle, e.g. after a failed job."""
+        if not api_token:
+            return
+        key = self._key(provider, api_token)
+        self._clients.invalidate(key)
+        self._backends.invalidate(key + (backend_name,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"clients": self._clients.stats(), "backends": self._backends.stats()}
+
+
+client_pool = ProviderClientPool.from_env()
+
+
 def get_circuit_results(circuit: QuantumCircuit, shots: int = 1000, quantum_computer_type: str = "ionq", backend_name: str = "ionq_simulator", user_info: dict[str, any] = None):
     if quantum_computer_type == 'ionq':
         print("++++++++++++++++++++++++++++++++++++++++++++++++++++")
-        result = get_ionq_results(circuit, shots, backend_name = backend_name, api_token = user_info['ionq_api_tok'])
+        api_token = user_info['ionq_api_tok']
+        backend = client_pool.ionq_backend(backend_name, api_token)
+        result = get_ionq_results(circuit, shots, backend_name = backend_name, api_token = api_token, backend = backend)
     elif quantum_computer_type == 'ibm':
         print("++++++++++++++++++++++++++++++++++++++++++++++++++++")
-        result = get_ibm_results(circuit, shots, backend_name = backend_name, api_token = user_info['ibm_api_tok'])
+        api_token = user_info['ibm_api_tok']
+        backend = client_pool.ibm_backend(api_token)
+        result = get_ibm_results(circuit, shots, backend_name = backend_name, api_token = api_token, backend = backend)
     else:
         raise ValueError("Invalid quantum computer type")
 
+    if result is None:
+        # The cached client or backend may be stale (revoked token, backend offline)
+        client_pool.invalidate(quantum_computer_type, api_token, backend_name if quantum_computer_type == 'ionq' else "least_busy")
     return result
+
+
+def get_circuit_results_batch(circuits: list[QuantumCircuit], shots: list[int], quantum_computer_type: str = "ionq", backend_name: str = "ionq_simulator", user_info: dict[str, any] = None):
+    """
+    Run many circuits for one user on one provider with as few provider jobs as possible.
+
+    IBM takes a shot count per PUB, so the whole batch is one Sampler job. IonQ takes
+    one shot count per job, so circuits are grouped into one job per distinct shot count.
+
+    Returns:
+        A list of unified results in the same order as circuits (None for circuits whose job failed)
+    """
+    if quantum_computer_type == 'ionq':
+        api_token = user_info['ionq_api_tok']
+        backend = client_pool.ionq_backend(backend_name, api_token)
+        results = [None] * len(circuits)
+        by_shots: dict[int, list[int]] = {}
+        for i, n in enumerate(shots):
+            by_shots.setdefault(n, []).append(i)
+        for n, indices in by_shots.items():
+            group = get_ionq_results_batch([circuits[i] for i in indices], n, backend_name = backend_name, api_token = api_token, backend = backend)
+            for i, res in zip(indices, group or [None] * len(indices)):
+                results[i] = res
+    elif quantum_computer_type == 'ibm':
+        api_token = user_info['ibm_api_tok']
+        backend = client_pool.ibm_backend(api_token)
+        results = get_ibm_results_batch(circuits, shots, backend_name = backend_name, api_token = api_token, backend = backend)
+        if results is None:
+            results = [None] * len(circuits)
+    else:
+        raise ValueError("Invalid quantum computer type")
+
+    if all(res is None for res in results):
+        client_pool.invalidate(quantum_computer_type, api_token, backend_name if quantum_computer_type == 'ionq' else "least_busy")
+    return results
+
+
+def bind_sweep(circuit: QuantumCircuit, parameters: dict[str, list[float]]) -> list[QuantumCircuit]:
+    """One bound copy of circuit per sweep point."""
+    num_points = len(next(iter(parameters.values())))
+    return [
+        circuit.assign_parameters({p: parameters[p.name][i] for p in circuit.parameters})
+        for i in range(num_points)
+    ]
+
+
+def get_circuit_results_sweep(circuit: QuantumCircuit, parameters: dict[str, list[float]], shots: int = 1000, quantum_computer_type: str = "ionq", backend_name: str = "ionq_simulator", user_info: dict[str, any] = None):
+    """
+    Run a parameterized circuit at every point of a sweep as one provider job.
+
+    IBM binds the values in the Sampler (one PUB, transpiled once). IonQ takes no
+    unbound parameters, so the bound circuits go out as one multi-circuit job.
+
+    Returns:
+        A list of unified results, one per point, or None if the job failed
+    """
+    if quantum_computer_type == 'ionq':
+        api_token = user_info['ionq_api_tok']
+        backend = client_pool.ionq_backend(backend_name, api_token)
+        results = get_ionq_results_batch(bind_sweep(circuit, parameters), shots, backend_name = backend_name, api_token = api_token, backend = backend)
+    elif quantum_computer_type == 'ibm':
+        api_token = user_info['ibm_api_tok']
+        backend = client_pool.ibm_backend(api_token)
+        results = get_ibm_sweep_results(circuit, parameters, shots, backend_name = backend_name, api_token = api_token, backend = backend)
+    else:
+        raise ValueError("Invalid quantum computer type")
+
+    if results is None:
+        client_pool.invalidate(quantum_computer_type, api_token, backend_name if quantum_computer_type == 'ionq' else "least_busy")
+    return results
@@ -0,0 +1,77 @@
+"""
+Single-flight call coalescing.
+
+Concurrent calls with the same key share one execution: the first caller (the
+leader) runs the function, later callers wait for it and receive their own
+copy of its result.
+"""
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn() once for all concurrent callers with the same key.
+
+        Returns:
+            (deep copy of fn's result, True if this call was coalesced onto another)
+
+        Raises:
+            Whatever fn raised, in every caller that shared the execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.followers += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result), not leader
+
+    def stats(self) -> Dict[str, Any]:
+        """Leader/follower counts and the share of calls that were coalesced."""
+        with self._lock:
+            total = self.leaders + self.followers
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "followers": self.followers,
+                "coalescing_ratio": self.followers / total if total else 0.0,
+            }
@@ -0,0 +1,230 @@
+"""
+Stabilizer tableau sampler for Clifford-only circuits.
+
+Tracks the n stabilizer generators of the state as bit-packed NumPy rows (one
+bit per qubit for the X part and the Z part, plus a sign bit), so each gate is
+a handful of vectorized bit operations and the cost grows polynomially in the
+number of qubits instead of as 2^n.
+
+Sampling does not measure shot by shot: for a stabilizer state the final
+Z-basis outcomes on the measured qubits are uniform over an affine subspace.
+Gaussian elimination on the tableau yields that subspace as parity
+constraints, and all shots are drawn from it at once.
+"""
+from collections import Counter
+
+import numpy as np
+
+# Gates this module can simulate (utils/local_simulator.py routes circuits here)
+CLIFFORD_GATES = {"h", "x", "y", "z", "cx", "cz", "measure"}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def is_clifford(gates: list[dict]) -> bool:
+    """True if every gate in the gate list is one the tableau simulator handles."""
+    return all(gate.get("name") in CLIFFORD_GATES for gate in gates)
+
+
+class Tableau:
+    """
+    Stabilizer generators of an n-qubit state, starting from |0...0> (generators Z_i).
+
+    x, z: (n, ceil(n / 8)) uint8, bit q of row i (little-endian within each byte)
+    r: (n,) uint8 sign bits (1 = -1)
+    """
+
+    def __init__(self, num_qubits: int):
+        self.n = num_qubits
+        self.x = np.zeros((num_qubits, (num_qubits + 7) // 8), dtype=np.uint8)
+        self.z = np.packbits(np.eye(num_qubits, dtype=np.uint8), axis=1, bitorder="little")
+        self.r = np.zeros(num_qubits, dtype=np.uint8)
+
+    @staticmethod
+    def _col(m: np.ndarray, q: int) -> np.ndarray:
+        return (m[:, q >> 3] >> (q & 7)) & 1
+
+    @staticmethod
+    def _flip(m: np.ndarray, q: int, bits: np.ndarray):
+        m[:, q >> 3] ^= bits << (q & 7)
+
+    def h(self, a: int):
+        xa, za = self._col(self.x, a), self._col(self.z, a)
+        self.r ^= xa & za
+        d = xa ^ za
+        self._flip(self.x, a, d)
+        self._flip(self.z, a, d)
+
+    def x_gate(self, a: int):
+        self.r ^= self._col(self.z, a)
+
+    def y_gate(self, a: int):
+        self.r ^= self._col(self.x, a) ^ self._col(self.z, a)
+
+    def z_gate(self, a: int):
+        self.r ^= self._col(self.x, a)
+
+    def cx(self, a: int, b: int):
+        xa, za = self._col(self.x, a), self._col(self.z, a)
+        xb, zb = self._col(self.x, b), self._col(self.z, b)
+        self.r ^= xa & zb & (xb ^ za ^ 1)
+        self._flip(self.x, b, xa)
+        self._flip(self.z, a, zb)
+
+    def cz(self, a: int, b: int):
+        xa, za = self._col(self.x, a), self._col(self.z, a)
+        xb, zb = self._col(self.x, b), self._col(self.z, b)
+        self.r ^= xa & xb & (za ^ zb)
+        self._flip(self.z, a, xb)
+        self._flip(self.z, b, xa)
+
+    def apply(self, name: str, qubits: list[int]):
+        if name == "h":
+            self.h(qubits[0])
+        elif name == "x":
+            self.x_gate(qubits[0])
+        elif name == "y":
+            self.y_gate(qubits[0])
+        elif name == "z":
+            self.z_gate(qubits[0])
+        elif name == "cx":
+            self.cx(qubits[0], qubits[1])
+        elif name == "cz":
+            self.cz(qubits[0], qubits[1])
+        else:
+            raise ValueError(f"Gate '{name}' is not supported by the stabilizer simulator")
+
+    def _multiply_into(self, targets: np.ndarray, pivot: int):
+        """Replace rows[targets] with rows[pivot] * rows[targets], tracking the sign."""
+        x1, z1 = self.x[pivot], self.z[pivot]
+        x2, z2 = self.x[targets], self.z[targets]
+        # Per-qubit factors of i from the single-qubit Pauli products: XY, YZ, ZX give +i; the reverse -i
+        plus = (x1 & z1 & ~x2 & z2) | (x1 & ~z1 & x2 & z2) | (~x1 & z1 & x2 & ~z2)
+        minus = (x1 & z1 & x2 & ~z2) | (x1 & ~z1 & ~x2 & z2) | (~x1 & z1 & x2 & z2)
+        phase = 2 * self.r[pivot] + 2 * self.r[targets].astype(np.int64)
+        phase += _POPCOUNT[plus].sum(axis=1) - _POPCOUNT[minus].sum(axis=1)
+        self.r[targets] = (phase % 4) // 2
+        self.x[targets] = x2 ^ x1
+        self.z[targets] = z2 ^ z1
+
+    def z_type_generators(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Generators of the subgroup of stabilizers with no X/Y component.
+
+        Returns:
+            (z rows, signs), as packed (k, ceil(n / 8)) uint8 rows and (k,) uint8
+        """
+        used = np.zeros(self.n, dtype=bool)
+        for q in range(self.n):
+            has_bit = self._col(self.x, q).astype(bool)
+            candidates = np.flatnonzero(has_bit & ~used)
+            if candidates.size == 0:
+                continue
+            pivot = candidates[0]
+            used[pivot] = True
+            targets = np.flatnonzero(has_bit)
+            targets = targets[targets != pivot]
+            if targets.size:
+                self._multiply_into(targets, pivot)
+        rows = np.flatnonzero(~used)
+        return self.z[rows], self.r[rows].copy()
+
+
+def _pack(bits: np.ndarray) -> np.ndarray:
+    return np.packbits(bits, axis=1, bitorder="little")
+
+
+def _unpack(packed: np.ndarray, count: int) -> np.ndarray:
+    return np.unpackbits(packed, axis=1, count=count, bitorder="little")
+
+
+def _eliminate(packed: np.ndarray, rhs: np.ndarray, columns) -> list[tuple[int, int]]:
+    """
+    In-place GF(2) row reduction of (packed rows | rhs) on the given columns.
+
+    Returns:
+        (row, column) pivots, in order
+    """
+    pivots = []
+    row = 0
+    for col in columns:
+        if row == packed.shape[0]:
+            break
+        bits = Tableau._col(packed, col)
+        candidates = np.flatnonzero(bits[row:])
+        if candidates.size == 0:
+            continue
+        p = candidates[0] + row
+        if p != row:
+            packed[[row, p]] = packed[[p, row]]
+            rhs[[row, p]] = rhs[[p, row]]
+            bits[[row, p]] = bits[[p, row]]
+        others = np.flatnonzero(bits)
+        others = others[others != row]
+        if others.size:
+            packed[others] ^= packed[row]
+            rhs[others] ^= rhs[row]
+        pivots.append((row, col))
+        row += 1
+    return pivots
+
+
+def sample_clifford(ops: list[tuple], measured: dict[int, int], num_qubits: int, num_clbits: int, shots: int, rng: np.random.Generator) -> dict[str, int]:
+    """
+    Sample a Clifford circuit.
+
+    Args:
+        ops: (name, qubits, ...) unitary ops in order, as produced by local_simulator.parse_gates
+        measured: {clbit: qubit} final measurements
+
+    Returns:
+        counts keyed by classical bitstring (clbit 0 rightmost)
+    """
+    tableau = Tableau(num_qubits)
+    for op in ops:
+        tableau.apply(op[0], op[1])
+
+    qubits = sorted(set(measured.values()))
+    measured_set = set(qubits)
+    if qubits:
+        z_rows, signs = tableau.z_type_generators()
+
+        # Drop generators that involve unmeasured qubits: they don't constrain the measured ones
+        unmeasured = [q for q in range(num_qubits) if q not in measured_set]
+        pivots = _eliminate(z_rows, signs, unmeasured)
+        keep = np.ones(z_rows.shape[0], dtype=bool)
+        keep[[row for row, _ in pivots]] = False
+        constraints = _pack(_unpack(z_rows[keep], num_qubits)[:, qubits])
+        rhs = signs[keep]
+
+        # Outcomes b satisfy constraints @ b = rhs (mod 2); free bits are uniform
+        pivots = _eliminate(constraints, rhs, range(len(qubits)))
+        pivot_rows = [row for row, _ in pivots]
+        pivot_cols = [col for _, col in pivots]
+        pivot_set = set(pivot_cols)
+        free_cols = [c for c in range(len(qubits)) if c not in pivot_set]
+
+        outcomes = np.zeros((shots, len(qubits)), dtype=np.uint8)
+        if free_cols:
+            outcomes[:, free_cols] = rng.integers(0, 2, size=(shots, len(free_cols)), dtype=np.uint8)
+        if pivot_cols:
+            reduced = _unpack(constraints[pivot_rows], len(qubits))[:, free_cols].astype(np.int64)
+            parity = (outcomes[:, free_cols].astype(np.int64) @ reduced.T) & 1
+            outcomes[:, pivot_cols] = parity.astype(np.uint8) ^ rhs[pivot_rows][None, :]
+        column_of = {q: i for i, q in enumerate(qubits)}
+    else:
+        outcomes = np.zeros((shots, 0), dtype=np.uint8)
+        column_of = {}
+
+    bits = np.zeros((shots, num_clbits), dtype=np.uint8)
+    for clbit, qubit in measured.items():
+        bits[:, clbit] = outcomes[:, column_of[qubit]]
+
+    # Count identical shots on their packed bytes, then spell out each distinct outcome once
+    tally = Counter(row.tobytes() for row in _pack(bits))
+    counts = {}
+    for key, n in tally.items():
+        clbits = _unpack(np.frombuffer(key, dtype=np.uint8)[None, :], num_clbits)[0]
+        # Bitstrings are written with the highest clbit first
+        counts["".join("1" if b else "0" for b in clbits[::-1])] = n
+    return counts
@@ -0,0 +1,546 @@
+"""
+Storage layer for circuits, run_requests, run_results, users, user run summaries and chapters.
+
+Everything the backend persists goes through a Storage:
+    - FirestoreStorage: the production database. Connects on first use, so
+      importing the backend needs no credentials.
+    - LocalStorage: SQLite (a file, or ":memory:") with the same behavior, for
+      running and benchmarking the whole pipeline with no network or credentials.
+
+STORAGE_BACKEND picks one ('firestore' by default, or 'local' with STORAGE_PATH).
+Timestamps are returned as timezone-aware datetimes by both.
+"""
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+FIRESTORE = "firestore"
+LOCAL = "local"
+
+DEFAULT_CREDENTIALS_PATH = "service-account-key.json"
+DEFAULT_LOCAL_PATH = ":memory:"
+
+CIRCUITS = "circuits"
+RUN_REQUESTS = "run_requests"
+RUN_RESULTS = "run_results"
+USERS = "Users"
+USER_SUMMARIES = "user_run_summaries"
+CHAPTERS = "chapters"
+
+
+class Storage(ABC):
+    """
+    Interface implemented by FirestoreStorage and LocalStorage.
+
+    Documents are plain dicts; created_at/updated_at fields are set by the storage.
+    """
+
+    name = ""
+
+    def connect(self):
+        """Open the connection now instead of on first use (e.g. to fail fast at startup)."""
+
+    # circuits/{circuit_id}
+    @abstractmethod
+    def get_circuit(self, circuit_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def create_circuit(self, circuit_id: str, circuit: Dict[str, Any]) -> bool:
+        """Create-if-absent. Returns False if the circuit already existed."""
+
+    # run_requests/{run_request_id}
+    @abstractmethod
+    def create_run_requests(self, requests: Sequence[Dict[str, Any]]) -> List[str]:
+        """Create run_requests in one write, stamping created_at. Returns their ids, in order."""
+
+    @abstractmethod
+    def get_run_request(self, run_request_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def set_run_request_status(self, run_request_ids: Sequence[str], status: str):
+        ...
+
+    # run_results/{run_request_id}
+    @abstractmethod
+    def get_run_result(self, run_request_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def complete_run(
+        self,
+        run_request_id: str,
+        result: Dict[str, Any],
+        user_id: Optional[str] = None,
+        summary_entry: Optional[Dict[str, Any]] = None,
+        last_shake: Optional[Dict[str, Any]] = None,
+        max_recent: Optional[int] = None,
+    ) -> datetime:
+        """
+        In one atomic write: store the result, mark the run_request COMPLETED and,
+        if user_id is given, add summary_entry to the user's summary document
+        (keeping its newest max_recent entries, see updated_summary()) and replace
+        its last_shake (when not None). The result, the summary entry and
+        last_shake get the same created_at, so a history cursor taken from the
+        summary is exact.
+
+        Returns:
+            The created_at stamped on the result
+        """
+
+    @abstractmethod
+    def list_run_results(
+        self,
+        user_id: str,
+        limit: int,
+        after: Optional[Dict[str, Any]] = None,
+        fields: Optional[Sequence[str]] = None,
+        success: Optional[bool] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        A user's run_results, newest first (ties broken by id, descending).
+
+        Args:
+            after: Cursor {'id': ..., 'created_at': ...} of the last run of the previous page;
+                   without created_at the run is looked up (ValueError if it doesn't exist)
+            fields: Only return these fields
+            success: Only return runs with this success value
+        Returns:
+            (run_request_id, document) pairs
+        """
+
+    # user_run_summaries/{user_id}
+    @abstractmethod
+    def get_user_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    # Users/{user_id}
+    @abstractmethod
+    def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def put_user(self, user_id: str, user: Dict[str, Any]):
+        ...
+
+    # chapters/{chapter_id}
+    @abstractmethod
+    def list_chapters(self) -> List[Tuple[str, Dict[str, Any]]]:
+        ...
+
+    @abstractmethod
+    def get_chapter(self, chapter_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def add_chapter(self, chapter: Dict[str, Any]) -> str:
+        """Store a chapter under a new id and return the id."""
+
+    @abstractmethod
+    def set_chapter(self, chapter_id: str, chapter: Dict[str, Any], merge: bool = False):
+        ...
+
+
+def updated_summary(
+    summary: Optional[Dict[str, Any]],
+    user_id: str,
+    summary_entry: Optional[Dict[str, Any]],
+    last_shake: Optional[Dict[str, Any]],
+    max_recent: Optional[int],
+    created_at: datetime,
+    has_runs: Callable[[], bool],
+) -> Dict[str, Any]:
+    """
+    The user's summary document after one more completed run, for complete_run().
+
+    'recent' holds at most max_recent entries, newest first, one per run (a retried
+    write replaces its entry). 'complete' is True while 'recent' holds every run of
+    the user: set when the document is created for a user with no earlier runs
+    (has_runs() is only called then), and cleared once an entry is dropped.
+    """
+    if summary is None:
+        summary = {"recent": [], "complete": not has_runs()}
+    else:
+        summary = dict(summary)
+    summary.update({"user_id": user_id, "updated_at": created_at})
+    recent = list(summary.get("recent", []))
+    if summary_entry is not None:
+        run_request_id = summary_entry.get("run_request_id")
+        recent = [entry for entry in recent if entry.get("run_request_id") != run_request_id]
+        recent.append(dict(summary_entry, created_at=created_at))
+    recent.sort(key=lambda entry: entry.get("created_at") or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+    if max_recent is not None and len(recent) > max_recent:
+        recent = recent[:max_recent]
+        summary["complete"] = False
+    summary["recent"] = recent
+    if last_shake is not None:
+        summary["last_shake"] = dict(last_shake, created_at=created_at)
+    return summary
+
+
+class FirestoreStorage(Storage):
+    """
+    Args:
+        credentials_path: Service account file, used when FIREBASE_CREDENTIALS isn't set
+    """
+
+    name = FIRESTORE
+
+    def __init__(self, credentials_path: str = DEFAULT_CREDENTIALS_PATH):
+        self.credentials_path = credentials_path
+        self._lock = threading.Lock()
+        self._db = None
+
+    def connect(self):
+        if self._db is not None:
+            return self._db
+        with self._lock:
+            if self._db is None:
+                import firebase_admin
+                from firebase_admin import credentials, firestore
+                from google.api_core.exceptions import AlreadyExists
+
+                if not firebase_admin._apps:
+                    firebase_creds = os.getenv("FIREBASE_CREDENTIALS")
+                    cred = credentials.Certificate(json.loads(firebase_creds) if firebase_creds else self.credentials_path)
+                    firebase_admin.initialize_app(cred)
+                self._firestore = firestore
+                self._already_exists = AlreadyExists
+                self._db = firestore.client()
+        return self._db
+
+    def _doc(self, collection: str, doc_id: str):
+        return self.connect().collection(collection).document(doc_id)
+
+    def _get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        snap = self._doc(collection, doc_id).get()
+        return snap.to_dict() if snap.exists else None
+
+    def get_circuit(self, circuit_id):
+        return self._get(CIRCUITS, circuit_id)
+
+    def create_circuit(self, circuit_id, circuit):
+        ref = self._doc(CIRCUITS, circuit_id)
+        try:
+            ref.create(circuit)
+        except self._already_exists:
+            return False
+        return True
+
+    def create_run_requests(self, requests):
+        db = self.connect()
+        batch = db.batch()
+        refs = []
+        for request in requests:
+            ref = db.collection(RUN_REQUESTS).document()
+            batch.set(ref, dict(request, created_at=self._firestore.SERVER_TIMESTAMP))
+            refs.append(ref)
+        batch.commit()
+        return [ref.id for ref in refs]
+
+    def get_run_request(self, run_request_id):
+        return self._get(RUN_REQUESTS, run_request_id)
+
+    def set_run_request_status(self, run_request_ids, status):
+        batch = self.connect().batch()
+        for run_request_id in run_request_ids:
+            batch.update(self._doc(RUN_REQUESTS, run_request_id), {"status": status})
+        batch.commit()
+
+    def get_run_result(self, run_request_id):
+        return self._get(RUN_RESULTS, run_request_id)
+
+    def complete_run(self, run_request_id, result, user_id=None, summary_entry=None, last_shake=None, max_recent=None):
+        db = self.connect()
+        # Writer's clock rather than SERVER_TIMESTAMP: summary entries live in an
+        # array, which can't hold a server timestamp, and must match the result's
+        created_at = datetime.now(timezone.utc)
+        summary_ref = self._doc(USER_SUMMARIES, user_id) if user_id else None
+
+        @self._firestore.transactional
+        def write(transaction):
+            # Reads first, as Firestore transactions require
+            if summary_ref is not None:
+                snap = summary_ref.get(transaction=transaction)
+                earlier = db.collection(RUN_RESULTS).where("user_id", "==", user_id).limit(1)
+                summary = updated_summary(
+                    snap.to_dict() if snap.exists else None, user_id, summary_entry, last_shake, max_recent, created_at,
+                    lambda: any(True for _ in transaction.get(earlier)),
+                )
+            transaction.set(self._doc(RUN_RESULTS, run_request_id), dict(result, created_at=created_at))
+            transaction.update(self._doc(RUN_REQUESTS, run_request_id), {"status": "COMPLETED"})
+            if summary_ref is not None:
+                transaction.set(summary_ref, summary)
+
+        write(db.transaction())
+        return created_at
+
+    def list_run_results(self, user_id, limit, after=None, fields=None, success=None):
+        q = self.connect().collection(RUN_RESULTS).where("user_id", "==", user_id)
+        Query = self._firestore.Query
+        if success is not None:
+            q = q.where("success", "==", success)
+        q = q.order_by("created_at", direction=Query.DESCENDING)
+        # Tie-breaker so the cursor is exact when runs share a created_at
+        q = q.order_by("__name__", direction=Query.DESCENDING)
+        if fields is not None:
+            q = q.select(list(fields))
+        if after is not None:
+            if after.get("created_at") is not None:
+                q = q.start_after({"created_at": after["created_at"], "__name__": after["id"]})
+            else:
+                snap = self._doc(RUN_RESULTS, after["id"]).get()
+                if not snap.exists:
+                    raise ValueError(f"run_result {after['id']} does not exist")
+                q = q.start_after(snap)
+        return [(doc.id, doc.to_dict() or {}) for doc in q.limit(limit).stream()]
+
+    def get_user_summary(self, user_id):
+        return self._get(USER_SUMMARIES, user_id)
+
+    def get_user(self, user_id):
+        return self._get(USERS, user_id)
+
+    def put_user(self, user_id, user):
+        self._doc(USERS, user_id).set(user)
+
+    def list_chapters(self):
+        return [(doc.id, doc.to_dict() or {}) for doc in self.connect().collection(CHAPTERS).stream()]
+
+    def get_chapter(self, chapter_id):
+        return self._get(CHAPTERS, chapter_id)
+
+    def add_chapter(self, chapter):
+        ref = self.connect().collection(CHAPTERS).document()
+        ref.set(chapter)
+        return ref.id
+
+    def set_chapter(self, chapter_id, chapter, merge=False):
+        self._doc(CHAPTERS, chapter_id).set(chapter, merge=merge)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    user_id TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+CREATE INDEX IF NOT EXISTS documents_by_user ON documents (collection, user_id, created_at, id);
+"""
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _sort_key(created_at: Optional[datetime]) -> Optional[str]:
+    # Fixed-width UTC text, so SQLite orders created_at correctly as a string
+    if created_at is None:
+        return None
+    return created_at.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+class LocalStorage(Storage):
+    """
+    Args:
+        path: SQLite file (":memory:" for a throwaway database)
+    """
+
+    name = LOCAL
+
+    def __init__(self, path: str = DEFAULT_LOCAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _new_id() -> str:
+        return uuid.uuid4().hex[:20]
+
+    def _get(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._get_locked(collection, doc_id)
+
+    # _get_locked and _put expect the caller to hold self._lock
+    def _get_locked(self, collection: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row else None
+
+    def _put(self, collection: str, doc_id: str, data: Dict[str, Any]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (collection, id, user_id, created_at, data) VALUES (?, ?, ?, ?, ?)",
+            (collection, doc_id, data.get("user_id"), _sort_key(data.get("created_at")), json.dumps(data, default=_encode)),
+        )
+
+    def _write(self, fn):
+        """Run fn() in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return out
+
+    def get_circuit(self, circuit_id):
+        return self._get(CIRCUITS, circuit_id)
+
+    def create_circuit(self, circuit_id, circuit):
+        data = json.dumps(circuit, default=_encode)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO documents (collection, id, data) VALUES (?, ?, ?)", (CIRCUITS, circuit_id, data)
+            )
+        return cur.rowcount == 1
+
+    def create_run_requests(self, requests):
+        now = datetime.now(timezone.utc)
+        ids = [self._new_id() for _ in requests]
+
+        def write():
+            for run_request_id, request in zip(ids, requests):
+                self._put(RUN_REQUESTS, run_request_id, dict(request, created_at=now))
+        self._write(write)
+        return ids
+
+    def get_run_request(self, run_request_id):
+        return self._get(RUN_REQUESTS, run_request_id)
+
+    def set_run_request_status(self, run_request_ids, status):
+        def write():
+            for run_request_id in run_request_ids:
+                request = self._get_locked(RUN_REQUESTS, run_request_id)
+                if request is None:
+                    raise KeyError(f"run_request {run_request_id} does not exist")
+                request["status"] = status
+                self._put(RUN_REQUESTS, run_request_id, request)
+        self._write(write)
+
+    def get_run_result(self, run_request_id):
+        return self._get(RUN_RESULTS, run_request_id)
+
+    def complete_run(self, run_request_id, result, user_id=None, summary_entry=None, last_shake=None, max_recent=None):
+        now = datetime.now(timezone.utc)
+
+        def write():
+            request = self._get_locked(RUN_REQUESTS, run_request_id)
+            if request is None:
+                raise KeyError(f"run_request {run_request_id} does not exist")
+            if user_id:
+                summary = updated_summary(
+                    self._get_locked(USER_SUMMARIES, user_id), user_id, summary_entry, last_shake, max_recent, now,
+                    lambda: self._conn.execute(
+                        "SELECT 1 FROM documents WHERE collection = ? AND user_id = ? LIMIT 1", (RUN_RESULTS, user_id)
+                    ).fetchone() is not None,
+                )
+                self._put(USER_SUMMARIES, user_id, summary)
+            self._put(RUN_RESULTS, run_request_id, dict(result, created_at=now))
+            self._put(RUN_REQUESTS, run_request_id, dict(request, status="COMPLETED"))
+        self._write(write)
+        return now
+
+    def list_run_results(self, user_id, limit, after=None, fields=None, success=None):
+        sql = "SELECT id, data FROM documents WHERE collection = ? AND user_id = ?"
+        args: List[Any] = [RUN_RESULTS, user_id]
+        if success is not None:
+            sql += " AND json_extract(data, '$.success') = ?"
+            args.append(1 if success else 0)
+        if after is not None:
+            created_at = after.get("created_at")
+            if created_at is None:
+                run = self._get(RUN_RESULTS, after["id"])
+                if run is None:
+                    raise ValueError(f"run_result {after['id']} does not exist")
+                created_at = run.get("created_at")
+            key = _sort_key(created_at)
+            sql += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+            args += [key, key, after["id"]]
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        out = []
+        for doc_id, data in rows:
+            doc = json.loads(data, object_hook=_decode)
+            if fields is not None:
+                doc = {field: doc[field] for field in fields if field in doc}
+            out.append((doc_id, doc))
+        return out
+
+    def get_user_summary(self, user_id):
+        return self._get(USER_SUMMARIES, user_id)
+
+    def get_user(self, user_id):
+        return self._get(USERS, user_id)
+
+    def put_user(self, user_id, user):
+        self._write(lambda: self._put(USERS, user_id, user))
+
+    def list_chapters(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id, data FROM documents WHERE collection = ?", (CHAPTERS,)).fetchall()
+        return [(doc_id, json.loads(data, object_hook=_decode)) for doc_id, data in rows]
+
+    def get_chapter(self, chapter_id):
+        return self._get(CHAPTERS, chapter_id)
+
+    def add_chapter(self, chapter):
+        chapter_id = self._new_id()
+        self._write(lambda: self._put(CHAPTERS, chapter_id, chapter))
+        return chapter_id
+
+    def set_chapter(self, chapter_id, chapter, merge=False):
+        def write():
+            data = dict(self._get_locked(CHAPTERS, chapter_id) or {}) if merge else {}
+            data.update(chapter)
+            self._put(CHAPTERS, chapter_id, data)
+        self._write(write)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def storage_from_env(credentials_path: str = DEFAULT_CREDENTIALS_PATH) -> Storage:
+    """
+    Build the storage selected by STORAGE_BACKEND ('firestore' or 'local'; STORAGE_PATH
+    is the SQLite file for 'local', default in-memory).
+    """
+    backend = os.getenv("STORAGE_BACKEND", FIRESTORE).lower()
+    if backend == LOCAL:
+        return LocalStorage(os.getenv("STORAGE_PATH", DEFAULT_LOCAL_PATH))
+    if backend == FIRESTORE:
+        return FirestoreStorage(credentials_path=credentials_path)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected '{FIRESTORE}' or '{LOCAL}'")
+
+
+# Shared by main.py, quantum.py and utils/firebase_rw.py
+storage = storage_from_env()
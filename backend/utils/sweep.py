@@ -0,0 +1,77 @@
+"""
+Parameter sweeps (POST /make_sweep): one circuit whose gates may name a
+parameter instead of giving its value, run once per point of a list of values.
+
+A sweep is one run_request and one provider job: the circuit is built (and on
+IBM transpiled) once with qiskit Parameters, every point is bound in the
+provider job or on the local simulator's batch axis, and the result is a
+single run_results document whose 'sweep' field holds the counts per point.
+"""
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from utils.create_circuit import parameter_names
+
+load_dotenv()
+
+MAX_SWEEP_POINTS = int(os.getenv("MAX_SWEEP_POINTS", 1000))
+
+
+def check_sweep(circuit: Dict[str, Any], parameters: Dict[str, List[float]]) -> int:
+    """
+    Check that parameters gives every parameter named by the circuit's gates,
+    and nothing else, the same number of finite values.
+
+    Returns:
+        The number of points
+
+    Raises:
+        ValueError: describing the first problem found
+    """
+    gates = circuit.get("gates")
+    if not isinstance(gates, list) or not all(isinstance(gate, dict) for gate in gates):
+        raise ValueError("Sweeps take a JSON circuit with a 'gates' list")
+    names = parameter_names(gates)
+    missing = sorted(set(names) - set(parameters))
+    if missing:
+        raise ValueError(f"No values for parameters {missing}")
+    unused = sorted(set(parameters) - set(names))
+    if unused:
+        raise ValueError(f"Parameters {unused} are not used by the circuit")
+    if not names:
+        raise ValueError("The circuit has no named parameters to sweep")
+
+    lengths = {len(values) for values in parameters.values()}
+    if len(lengths) != 1:
+        raise ValueError("Every parameter needs the same number of values")
+    num_points = lengths.pop()
+    if not 1 <= num_points <= MAX_SWEEP_POINTS:
+        raise ValueError(f"A sweep has 1 to {MAX_SWEEP_POINTS} points, got {num_points}")
+    for name, values in parameters.items():
+        if not all(math.isfinite(v) for v in values):
+            raise ValueError(f"Parameter '{name}' has a non-finite value")
+    return num_points
+
+
+def sweep_document(parameters: Dict[str, List[float]], results: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Fold one unified result per point into one result: the provider fields of
+    the first point, plus 'sweep' with the parameters and the counts of every
+    point (probabilities are left out; they are counts / shots).
+
+    Returns:
+        None if any point failed
+    """
+    if not results or any(res is None for res in results):
+        return None
+    first = results[0]
+    doc = {k: v for k, v in first.items() if k not in ("counts", "probabilities")}
+    doc["sweep"] = {
+        "parameters": parameters,
+        "points": len(results),
+        "counts": [res["counts"] for res in results],
+    }
+    return doc
@@ -0,0 +1,171 @@
+"""
+Cache of transpiled circuits, keyed by (circuit content, backend, backend version, optimization level).
+
+Transpiling at optimization_level=3 costs hundreds of milliseconds or more per
+circuit, while the same tutorial circuits are sent to the same few backends
+over and over. Entries live in an in-process LRU and, if TRANSPILE_CACHE_DIR
+is set, are also spilled to disk as QPY files so they survive restarts.
+"""
+import hashlib
+import io
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from qiskit import QuantumCircuit, qpy
+
+from utils.compile_pool import compile_pool
+from utils.lru import LRUCache
+
+load_dotenv()
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_OPTIMIZATION_LEVEL = 3
+# backend.properties() is a remote call on IBM; calibrations change far less often
+DEFAULT_VERSION_TTL_S = 300.0
+
+
+def circuit_fingerprint(circuit: QuantumCircuit) -> str:
+    """
+    sha256 of the circuit's content: register sizes and every instruction with its
+    operands and parameters. The circuit's name and metadata are ignored, so two
+    circuits built from the same gate list share a fingerprint.
+    """
+    h = hashlib.sha256()
+    h.update(f"{circuit.num_qubits}:{circuit.num_clbits}|".encode())
+    for instruction in circuit.data:
+        qubits = ",".join(str(circuit.find_bit(q).index) for q in instruction.qubits)
+        clbits = ",".join(str(circuit.find_bit(c).index) for c in instruction.clbits)
+        params = ",".join(repr(p) for p in instruction.operation.params)
+        h.update(f"{instruction.operation.name}({params})[{qubits}][{clbits}];".encode())
+    return h.hexdigest()
+
+
+def backend_version(backend) -> str:
+    """
+    Identify the backend's current target: its version plus the last calibration
+    date when the backend reports one, so recalibrated backends miss the cache.
+    """
+    version = str(getattr(backend, "backend_version", ""))
+    try:
+        properties = backend.properties()
+        if properties is not None:
+            version += f"@{properties.last_update_date.isoformat()}"
+    except Exception:
+        pass
+    return version
+
+
+class TranspileCache:
+    """
+    Args:
+        max_entries: Size of the in-process LRU
+        path: Directory for QPY spill files (None = in-process only)
+        version_ttl_s: How long a backend's backend_version() is reused
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path: Optional[str] = None, version_ttl_s: float = DEFAULT_VERSION_TTL_S):
+        self._memory = LRUCache(max_entries=max_entries)
+        self._versions = LRUCache(max_entries=256, ttl_s=version_ttl_s)
+        self.path = path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "TranspileCache":
+        """Build a cache from TRANSPILE_CACHE_MAX_ENTRIES, TRANSPILE_CACHE_DIR and TRANSPILE_CACHE_VERSION_TTL_S."""
+        return cls(
+            max_entries=int(os.getenv("TRANSPILE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            path=os.getenv("TRANSPILE_CACHE_DIR") or None,
+            version_ttl_s=float(os.getenv("TRANSPILE_CACHE_VERSION_TTL_S", DEFAULT_VERSION_TTL_S)),
+        )
+
+    @staticmethod
+    def key(circuit: QuantumCircuit, target_key: str, optimization_level: int) -> str:
+        raw = f"{circuit_fingerprint(circuit)}|{target_key}|{optimization_level}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def target_key(self, backend) -> str:
+        """backend name and backend_version(), looked up once per version_ttl_s per backend."""
+        target_key = self._versions.get(backend.name)
+        if target_key is None:
+            target_key = f"{backend.name}|{backend_version(backend)}"
+            self._versions.put(backend.name, target_key)
+        return target_key
+
+    def _load(self, key: str) -> Optional[QuantumCircuit]:
+        if not self.path:
+            return None
+        try:
+            with open(os.path.join(self.path, f"{key}.qpy"), "rb") as f:
+                return qpy.load(f)[0]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable transpile cache entry {key}: {e}")
+            return None
+
+    def _store(self, key: str, circuit: QuantumCircuit):
+        self._memory.put(key, circuit)
+        if not self.path:
+            return
+        buffer = io.BytesIO()
+        qpy.dump(circuit, buffer)
+        # Write then rename so a concurrent reader never sees a partial file
+        tmp = os.path.join(self.path, f"{key}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, os.path.join(self.path, f"{key}.qpy"))
+
+    def transpile(self, circuits: List[QuantumCircuit], backend, optimization_level: int = DEFAULT_OPTIMIZATION_LEVEL) -> List[QuantumCircuit]:
+        """
+        transpile() with caching. Cached circuits are returned as is; all misses
+        are transpiled together in one call on the compile pool.
+
+        Returns:
+            Transpiled circuits, in the order of circuits
+        """
+        target_key = self.target_key(backend)
+        keys = [self.key(qc, target_key, optimization_level) for qc in circuits]
+        out: List[Optional[QuantumCircuit]] = []
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self._memory.get(key)
+            if cached is None:
+                cached = self._load(key)
+                if cached is not None:
+                    self._memory.put(key, cached)
+                    with self._lock:
+                        self.disk_hits += 1
+            if cached is None:
+                missing.append(i)
+            out.append(cached)
+
+        with self._lock:
+            self.hits += len(circuits) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            fresh = compile_pool.transpile([circuits[i] for i in missing], backend, optimization_level, target_key)
+            for i, qc in zip(missing, fresh):
+                self._store(keys[i], qc)
+                out[i] = qc
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self._memory.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self._memory.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
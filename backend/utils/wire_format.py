@@ -0,0 +1,205 @@
+"""
+Compact binary encoding of circuits, accepted by POST /make_request with
+Content-Type: application/x-qubi-circuit.
+
+A JSON circuit spends tens of bytes per gate on '{"name": ..., "qubits": [...]}'
+objects, and every request is parsed into dicts, validated and re-serialized
+with sort_keys just to be hashed. The packed layout is three flat arrays
+(opcodes, operands, params) behind a fixed header, all little-endian:
+
+    header    b"QBC1", u32 num_qubits, u32 num_clbits, u32 num_gates
+    opcodes   u8[num_gates]        index into OPCODES
+    operands  u32[...]             each gate's qubits in order; measure is (qubit, clbit)
+    params    f64[...]             each parameterized gate's params in order
+
+Every array length follows from the opcodes. The API checks the bytes with
+NumPy and stores them (base64) in the circuit document; the execution worker
+decodes them into the gate list create_circuit takes. The circuit_id is the
+canonical hash of that gate list (utils/canonical_circuit.py), so a circuit
+has one id and one result-cache entry however it was sent.
+"""
+import base64
+import struct
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from utils.canonical_circuit import canonicalize_and_hash
+from utils.create_circuit import check_register_sizes
+
+CONTENT_TYPE = "application/x-qubi-circuit"
+
+# Value of 'format' in circuit documents holding a packed circuit
+PACKED_FORMAT = "qbc1"
+
+MAGIC = b"QBC1"
+_HEADER = struct.Struct("<4sIII")
+
+# (name, qubits, params). Append only: an opcode's meaning never changes
+OPCODES: Tuple[Tuple[str, int, int], ...] = (
+    ("measure", 1, 0),
+    ("h", 1, 0),
+    ("x", 1, 0),
+    ("y", 1, 0),
+    ("z", 1, 0),
+    ("s", 1, 0),
+    ("sdg", 1, 0),
+    ("t", 1, 0),
+    ("tdg", 1, 0),
+    ("rx", 1, 1),
+    ("ry", 1, 1),
+    ("rz", 1, 1),
+    ("cx", 2, 0),
+    ("cz", 2, 0),
+    ("swap", 2, 0),
+    ("ccx", 3, 0),
+)
+MEASURE = 0
+_OPCODE_BY_NAME = {name: i for i, (name, _, _) in enumerate(OPCODES)}
+# Operands per opcode: measure also carries its clbit
+_OPERANDS = np.array([q + (i == MEASURE) for i, (_, q, _) in enumerate(OPCODES)], dtype=np.int64)
+_PARAMS = np.array([p for _, _, p in OPCODES], dtype=np.int64)
+
+
+class PackedCircuit(NamedTuple):
+    num_qubits: int
+    num_clbits: int
+    opcodes: np.ndarray
+    operands: np.ndarray
+    params: np.ndarray
+
+
+def pack_circuit(circuit: Dict[str, Any]) -> bytes:
+    """
+    Encode a JSON circuit ({'gates', 'num_qubits', 'num_clbits'}). A measure over
+    several qubits becomes one measure per (qubit, clbit) pair.
+    """
+    opcodes: List[int] = []
+    operands: List[int] = []
+    params: List[float] = []
+    for i, gate in enumerate(circuit["gates"]):
+        name = gate.get("name")
+        opcode = _OPCODE_BY_NAME.get(name)
+        if opcode is None:
+            raise ValueError(f"Gate '{name}' at index {i} has no opcode")
+        if opcode == MEASURE:
+            if len(gate["qubits"]) != len(gate.get("clbits", ())):
+                raise ValueError(f"Measure gate at index {i} needs matching 'qubits' and 'clbits' lists")
+            for qubit, clbit in zip(gate["qubits"], gate["clbits"]):
+                opcodes.append(MEASURE)
+                operands += (qubit, clbit)
+            continue
+        _, num_qubits, num_params = OPCODES[opcode]
+        if len(gate["qubits"]) != num_qubits or len(gate.get("params", ())) < num_params:
+            raise ValueError(f"Gate at index {i} ('{name}') needs {num_qubits} qubit(s) and {num_params} param(s)")
+        opcodes.append(opcode)
+        operands += gate["qubits"]
+        params += gate.get("params", ())[:num_params]
+
+    return b"".join((
+        _HEADER.pack(MAGIC, circuit["num_qubits"], circuit["num_clbits"], len(opcodes)),
+        np.array(opcodes, dtype="<u1").tobytes(),
+        np.array(operands, dtype="<u4").tobytes(),
+        np.array(params, dtype="<f8").tobytes(),
+    ))
+
+
+def read_packed(data: bytes) -> PackedCircuit:
+    """
+    Parse and check packed bytes: register sizes within MAX_CIRCUIT_QUBITS, exact
+    length, known opcodes, qubits and clbits in range, distinct qubits within a
+    gate and finite params.
+
+    Raises:
+        ValueError: if the bytes are not a valid packed circuit
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Packed circuit is shorter than its header")
+    magic, num_qubits, num_clbits, num_gates = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"Packed circuit has unknown magic {magic!r}")
+    check_register_sizes(num_qubits, num_clbits)
+
+    offset = _HEADER.size
+    if len(data) < offset + num_gates:
+        raise ValueError("Packed circuit is truncated in its opcodes")
+    opcodes = np.frombuffer(data, dtype="<u1", count=num_gates, offset=offset)
+    if num_gates and int(opcodes.max()) >= len(OPCODES):
+        raise ValueError(f"Packed circuit has unknown opcode {int(opcodes.max())}")
+    offset += num_gates
+
+    operand_counts = _OPERANDS[opcodes]
+    num_operands = int(operand_counts.sum())
+    num_params = int(_PARAMS[opcodes].sum())
+    if len(data) != offset + 4 * num_operands + 8 * num_params:
+        raise ValueError(f"Packed circuit is {len(data)} bytes, expected {offset + 4 * num_operands + 8 * num_params}")
+    operands = np.frombuffer(data, dtype="<u4", count=num_operands, offset=offset)
+    params = np.frombuffer(data, dtype="<f8", count=num_params, offset=offset + 4 * num_operands)
+
+    # Column k of every gate's operands, per opcode arity
+    starts = np.cumsum(operand_counts) - operand_counts
+    measured = opcodes == MEASURE
+    if (operands[starts[measured] + 1] >= num_clbits).any():
+        raise ValueError(f"Packed circuit measures into a clbit outside its {num_clbits} classical bits")
+    is_qubit = np.ones(num_operands, dtype=bool)
+    is_qubit[starts[measured] + 1] = False
+    if (operands[is_qubit] >= num_qubits).any():
+        raise ValueError(f"Packed circuit uses a qubit outside its {num_qubits} qubits")
+    for arity in range(2, int(_OPERANDS.max()) + 1):
+        first = starts[(operand_counts == arity) & ~measured]
+        columns = [operands[first + k] for k in range(arity)]
+        if any((columns[a] == columns[b]).any() for a in range(arity) for b in range(a + 1, arity)):
+            raise ValueError("Packed circuit repeats a qubit within a gate")
+    if not np.isfinite(params).all():
+        raise ValueError("Packed circuit has a non-finite parameter")
+
+    return PackedCircuit(num_qubits, num_clbits, opcodes, operands, params)
+
+
+def packed_to_gates(packed: PackedCircuit) -> List[Dict[str, Any]]:
+    """The gate list create_circuit() and the local simulator take."""
+    operands = packed.operands.tolist()
+    params = packed.params.tolist()
+    gates = []
+    append = gates.append
+    o = p = 0
+    for opcode in packed.opcodes.tolist():
+        name, num_qubits, num_params = OPCODES[opcode]
+        if opcode == MEASURE:
+            append({"name": name, "qubits": [operands[o]], "clbits": [operands[o + 1]]})
+            o += 2
+        elif num_params:
+            append({"name": name, "qubits": operands[o:o + num_qubits], "params": params[p:p + num_params]})
+            o += num_qubits
+            p += num_params
+        else:
+            append({"name": name, "qubits": operands[o:o + num_qubits]})
+            o += num_qubits
+    return gates
+
+
+def hash_packed(packed: PackedCircuit) -> str:
+    """circuit_id of a packed circuit: the same id the circuit gets when sent as JSON."""
+    return canonicalize_and_hash({"gates": packed_to_gates(packed), "num_qubits": packed.num_qubits, "num_clbits": packed.num_clbits})
+
+
+def packed_document(data: bytes, packed: PackedCircuit) -> Dict[str, Any]:
+    """circuits/{circuit_id} document (and job payload) for a packed circuit, JSON-safe."""
+    return {
+        "format": PACKED_FORMAT,
+        "num_qubits": packed.num_qubits,
+        "num_clbits": packed.num_clbits,
+        "num_gates": len(packed.opcodes),
+        "data": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def unpack_circuit(circuit: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return circuit with its 'gates' list, decoding it if it is a packed document.
+    JSON circuits are returned unchanged.
+    """
+    if circuit.get("format") != PACKED_FORMAT:
+        return circuit
+    packed = read_packed(base64.b64decode(circuit["data"]))
+    return {"gates": packed_to_gates(packed), "num_qubits": packed.num_qubits, "num_clbits": packed.num_clbits}